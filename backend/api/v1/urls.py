@@ -38,4 +38,5 @@ urlpatterns = [
     path("bookings/", include("apps.bookings.urls")),
     path("payments/", include("apps.payments.urls")),
     path("reviews/", include("apps.reviews.urls")),
+    path("dashboard/", include("apps.dashboard.urls")),
 ]
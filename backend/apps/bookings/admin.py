@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.utils.html import format_html
 from .models import Booking
+from .travelers import sync_travelers
 
 
 @admin.register(Booking)
@@ -62,4 +63,9 @@ class BookingAdmin(admin.ModelAdmin):
     def get_queryset(self, request):
         return super().get_queryset(request).select_related(
             'user', 'tour', 'package'
-        )
\ No newline at end of file
+        )
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if not change or 'traveler_details' in form.changed_data:
+            sync_travelers([obj], replace=change)
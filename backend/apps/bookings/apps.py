@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class BookingsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.bookings'
+    verbose_name = 'Bookings'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,105 @@
+"""
+Seats on tour departures
+A departure is a tour on one travel date. It has the tour's max_capacity
+seats, held by its PENDING and CONFIRMED bookings; a package is limited
+to its max_participants of them. shortfalls() is the capacity check of
+every booking path; callers run it and insert their bookings in one
+transaction, so the lock it takes on the tour and package rows keeps
+concurrent reservations from overbooking a departure.
+"""
+
+from django.db.models import OuterRef, Subquery, Sum
+from django.utils import timezone
+
+from apps.tours.models import Tour, TourPackage
+
+from .models import Booking
+
+HOLDING_STATUSES = ('PENDING', 'CONFIRMED')
+
+
+def held_seats(departures, relation='tour'):
+    """
+    {(tour or package id, travel date): seats held} for ``departures`` of
+    the given ``relation``, with one query
+    """
+    departures = set(departures)
+    if not departures:
+        return {}
+    rows = (
+        Booking.objects.filter(
+            **{f'{relation}_id__in': {related_id for related_id, _ in departures}},
+            travel_date__in={travel_date for _, travel_date in departures},
+            status__in=HOLDING_STATUSES,
+        )
+        .order_by()
+        .values(f'{relation}_id', 'travel_date')
+        .annotate(seats=Sum('travelers_count'))
+    )
+    held = {(row[f'{relation}_id'], row['travel_date']): row['seats'] for row in rows}
+    return {departure: seats for departure, seats in held.items() if departure in departures}
+
+
+def _shortfalls(relation, requested, limits):
+    held = held_seats(requested, relation)
+    return [
+        {
+            relation: related_id,
+            'travel_date': travel_date,
+            'requested': seats,
+            'available': max(0, limits[related_id] - held.get((related_id, travel_date), 0)),
+        }
+        for (related_id, travel_date), seats in requested.items()
+        if held.get((related_id, travel_date), 0) + seats > limits[related_id]
+    ]
+
+
+def shortfalls(requested, packages=None):
+    """
+    Check ``{(tour id, travel date): seats}``, and ``packages``
+    ``{(package id, travel date): seats}``, against the seats left on
+    each departure; returns the departures that cannot take their seats.
+    Must run inside the transaction that creates the bookings: the tour
+    and package rows stay locked until it ends.
+    """
+    packages = packages or {}
+    tour_limits = dict(
+        Tour.objects.select_for_update()
+        .filter(pk__in={tour_id for tour_id, _ in requested})
+        .values_list('id', 'max_capacity')
+    )
+    package_limits = dict(
+        TourPackage.objects.select_for_update()
+        .filter(pk__in={package_id for package_id, _ in packages})
+        .values_list('id', 'max_participants')
+    ) if packages else {}
+    return [
+        *_shortfalls('tour', requested, tour_limits),
+        *_shortfalls('package', packages, package_limits),
+    ]
+
+
+def _upcoming(relation, value):
+    return (
+        Booking.objects.filter(
+            **{relation: value},
+            status__in=HOLDING_STATUSES,
+            travel_date__gte=timezone.localdate(),
+        )
+        .order_by()
+        .values('travel_date')
+        .annotate(seats=Sum('travelers_count'))
+    )
+
+
+def busiest_departure_seats(relation):
+    """
+    Subquery of the seats held on the busiest upcoming departure of the
+    tour or package (``relation``) of the outer row
+    """
+    return Subquery(_upcoming(relation, OuterRef('pk')).order_by('-seats').values('seats')[:1])
+
+
+def busiest_departure(relation, value):
+    """Seats held on the busiest upcoming departure of one tour or package"""
+    return _upcoming(relation, value).order_by('-seats').values_list('seats', flat=True).first() or 0
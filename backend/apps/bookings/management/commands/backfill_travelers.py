@@ -0,0 +1,66 @@
+"""
+Management command to populate the Traveler table from
+Booking.traveler_details for bookings created before it existed
+
+Bookings are read in keyset order by id in fixed-size chunks; each chunk's
+travelers are written in one transaction, so the command can be stopped
+and re-run at any point.
+"""
+
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.bookings.models import Booking
+from apps.bookings.travelers import sync_travelers
+
+logger = logging.getLogger('apps.bookings')
+
+
+class Command(BaseCommand):
+    help = 'Backfill Traveler rows from Booking.traveler_details'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Bookings per chunk / transaction',
+        )
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Rewrite travelers for every booking, not only bookings without any',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        chunk_size = options['chunk_size']
+        rebuild = options['rebuild']
+
+        queryset = Booking.objects.exclude(traveler_details=[])
+        if not rebuild:
+            queryset = queryset.filter(travelers__isnull=True)
+        queryset = queryset.only('id', 'traveler_details').order_by('id')
+
+        bookings_done = travelers_written = 0
+        last_id = None
+        while True:
+            chunk = queryset.filter(id__gt=last_id) if last_id else queryset
+            chunk = list(chunk[:chunk_size])
+            if not chunk:
+                break
+
+            with transaction.atomic():
+                travelers_written += sync_travelers(chunk, replace=rebuild)
+            bookings_done += len(chunk)
+            last_id = chunk[-1].id
+            self.stdout.write(f'  {bookings_done:,} bookings, {travelers_written:,} travelers')
+
+        elapsed = time.monotonic() - started
+        logger.info(f"backfill_travelers: {bookings_done} bookings, {travelers_written} travelers in {elapsed:.2f}s")
+        self.stdout.write(self.style.SUCCESS(
+            f'Backfilled {travelers_written:,} travelers for {bookings_done:,} bookings in {elapsed:.2f}s'
+        ))
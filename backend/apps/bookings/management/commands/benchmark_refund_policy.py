@@ -0,0 +1,95 @@
+"""
+Management command to benchmark the vectorized refund policy evaluator
+against Booking.calculate_refund_amount on synthetic bookings
+"""
+
+import datetime
+import time
+from decimal import Decimal
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.bookings.models import Booking
+from apps.bookings import refund_policy
+
+
+class Command(BaseCommand):
+    help = 'Benchmark vectorized refund evaluation on synthetic bookings (no database access)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=1_000_000,
+            help='Number of synthetic bookings',
+        )
+        parser.add_argument(
+            '--python-sample',
+            type=int,
+            default=50_000,
+            help='Rows evaluated with Booking.calculate_refund_amount for timing and verification',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Random seed for the synthetic data',
+        )
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        sample = min(options['python_sample'], rows)
+        rng = np.random.default_rng(options['seed'])
+        now = timezone.now().replace(microsecond=0)
+        now_us = refund_policy.to_epoch_us(now)
+
+        # Booked between 90 days ago and now, travelling -5..120 days from today,
+        # with a share of boundary cases around the 24h / 5 / 10 day cut-offs
+        booking_us = now_us - rng.integers(0, 90 * refund_policy._US_PER_DAY, rows, dtype=np.int64)
+        boundary = rng.random(rows) < 0.1
+        booking_us[boundary] = now_us - 86_400_000_000 + rng.integers(-2_000_000, 2_000_000, boundary.sum())
+        today = np.datetime64(now.date(), 'D')
+        travel_days = today + rng.integers(-5, 120, rows).astype('timedelta64[D]')
+        travel_days[rng.random(rows) < 0.01] = np.datetime64('NaT')
+        prices = np.round(rng.uniform(5_000, 250_000, rows), 2)
+
+        self.stdout.write(f'Evaluating {rows:,} synthetic bookings...')
+        started = time.perf_counter()
+        tiers, refunds, _ = refund_policy.evaluate(booking_us, travel_days, prices, now=now)
+        vectorized_seconds = time.perf_counter() - started
+
+        # Reference path: one unsaved Booking per row through the model method
+        epoch = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+        bookings = [
+            Booking(
+                booking_date=epoch + datetime.timedelta(microseconds=int(booking_us[i])),
+                travel_date=None if np.isnat(travel_days[i]) else travel_days[i].astype(datetime.date),
+                total_price=Decimal(str(prices[i])),
+            )
+            for i in range(sample)
+        ]
+        started = time.perf_counter()
+        expected = [booking.calculate_refund_amount(now=now)[0] for booking in bookings]
+        python_seconds = time.perf_counter() - started
+
+        mismatches = sum(
+            1 for i, amount in enumerate(expected) if float(amount) != float(refunds[i])
+        )
+
+        per_row_python = python_seconds / sample if sample else 0
+        self.stdout.write(f'Vectorized: {vectorized_seconds:.3f}s for {rows:,} rows '
+                          f'({rows / vectorized_seconds:,.0f} rows/s)')
+        if sample:
+            self.stdout.write(f'Per-booking: {python_seconds:.3f}s for {sample:,} rows '
+                              f'(~{per_row_python * rows:.1f}s extrapolated to {rows:,}, '
+                              f'{per_row_python * rows / vectorized_seconds:,.0f}x slower)')
+        for value, code, _ in refund_policy.TIER_CHOICES:
+            mask = tiers == value
+            self.stdout.write(f'  {code:<18} {int(mask.sum()):>10,}  ₹{refunds[mask].sum():,.2f}')
+
+        if mismatches:
+            self.stdout.write(self.style.ERROR(f'{mismatches} of {sample:,} sampled rows differ from the model method'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'All {sample:,} sampled rows match Booking.calculate_refund_amount'))
@@ -0,0 +1,84 @@
+"""
+Management command to export departure manifests as CSV, JSON or PDF
+Rows are streamed from a server-side cursor straight to the output file,
+so a whole season can be exported with constant memory.
+"""
+
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.bookings import manifest
+from apps.bookings.serializers import ManifestQuerySerializer
+
+
+class Command(BaseCommand):
+    help = 'Export the manifest for a departure or a range of travel dates'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tour', type=str, default=None, help='Tour id')
+        parser.add_argument('--date', type=str, default=None, help='Travel date (YYYY-MM-DD)')
+        parser.add_argument('--from', dest='date_from', type=str, default=None, help='First travel date')
+        parser.add_argument('--to', dest='date_to', type=str, default=None, help='Last travel date')
+        parser.add_argument(
+            '--status',
+            type=str,
+            default='CONFIRMED',
+            help='Comma-separated booking statuses to include',
+        )
+        parser.add_argument(
+            '--format',
+            dest='output',
+            choices=ManifestQuerySerializer.OUTPUT_CHOICES,
+            default='csv',
+        )
+        parser.add_argument(
+            '--output',
+            dest='path',
+            type=str,
+            default='-',
+            help='Output file (default: stdout)',
+        )
+
+    def handle(self, *args, **options):
+        params = {
+            key: value for key, value in {
+                'tour': options['tour'],
+                'travel_date': options['date'],
+                'date_from': options['date_from'],
+                'date_to': options['date_to'],
+                'status': options['status'],
+                'output': options['output'],
+            }.items() if value
+        }
+        serializer = ManifestQuerySerializer(data=params)
+        if not serializer.is_valid():
+            raise CommandError(f"Invalid filters: {serializer.errors}")
+
+        filters = serializer.get_filters()
+        rows = manifest.manifest_rows(manifest.manifest_queryset(**filters))
+        output = serializer.validated_data['output']
+        if output == 'json':
+            chunks = manifest.stream_json(rows, filters)
+        elif output == 'pdf':
+            chunks = manifest.stream_pdf(rows)
+        else:
+            chunks = manifest.stream_csv(rows)
+
+        started = time.monotonic()
+        written = 0
+        target = sys.stdout.buffer if options['path'] == '-' else open(options['path'], 'wb')
+        try:
+            for chunk in chunks:
+                data = chunk.encode() if isinstance(chunk, str) else chunk
+                target.write(data)
+                written += len(data)
+        finally:
+            if target is not sys.stdout.buffer:
+                target.close()
+
+        if options['path'] != '-':
+            self.stdout.write(self.style.SUCCESS(
+                f"Wrote {written:,} bytes to {options['path']} in {time.monotonic() - started:.2f}s"
+            ))
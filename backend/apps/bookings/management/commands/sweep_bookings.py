@@ -0,0 +1,135 @@
+"""
+Management command that advances booking lifecycles:
+- CONFIRMED bookings whose travel date has passed become COMPLETED
+- PENDING bookings with no successful payment expire after a window
+
+Rows are claimed in bounded batches with SELECT ... FOR UPDATE SKIP LOCKED
+and updated with set-based UPDATEs, so several nodes can run the sweep at
+the same time without double-processing or blocking each other.
+"""
+
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from apps.bookings.models import Booking
+from apps.bookings.summary import invalidate_for_bookings
+from apps.dashboard import counters
+from apps.payments.models import Payment, Invoice
+
+logger = logging.getLogger('apps.bookings')
+
+
+class Command(BaseCommand):
+    help = 'Complete past CONFIRMED bookings and expire unpaid PENDING bookings'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pending-hours',
+            type=int,
+            default=settings.BOOKING_PENDING_EXPIRY_HOURS,
+            help='Expire unpaid PENDING bookings older than this many hours',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.BOOKING_SWEEP_BATCH_SIZE,
+            help='Maximum rows updated per transaction',
+        )
+        parser.add_argument(
+            '--skip-complete',
+            action='store_true',
+            help='Do not move past CONFIRMED bookings to COMPLETED',
+        )
+        parser.add_argument(
+            '--skip-expire',
+            action='store_true',
+            help='Do not expire unpaid PENDING bookings',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        now = timezone.now()
+        batch_size = options['batch_size']
+        metrics = {'completed': 0, 'expired': 0, 'invoices_cancelled': 0, 'batches': 0}
+
+        if not options['skip_complete']:
+            completable = Booking.objects.filter(
+                status='CONFIRMED',
+                travel_date__lt=now.date(),
+            )
+            metrics['completed'] = self._sweep(
+                completable, batch_size, metrics,
+                status='COMPLETED',
+            )
+
+        if not options['skip_expire']:
+            cutoff = now - timedelta(hours=options['pending_hours'])
+            expirable = Booking.objects.filter(
+                status='PENDING',
+                booking_date__lt=cutoff,
+            ).exclude(
+                Exists(Payment.objects.filter(booking=OuterRef('pk'), status='SUCCESS'))
+            )
+            # Capacity is derived from booking status, so leaving PENDING
+            # releases whatever the booking was holding
+            metrics['expired'] = self._sweep(
+                expirable, batch_size, metrics,
+                status='CANCELLED',
+                cancellation_reason=f"Expired: no payment received within {options['pending_hours']} hours",
+                cancel_invoices=True,
+                counter='pending_bookings',
+            )
+
+        metrics['duration_ms'] = round((time.monotonic() - started) * 1000, 1)
+        logger.info(f"sweep_bookings metrics: {metrics}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Completed {metrics['completed']} bookings, expired {metrics['expired']} "
+            f"({metrics['invoices_cancelled']} invoices cancelled) in {metrics['batches']} batches, "
+            f"{metrics['duration_ms']}ms"
+        ))
+
+    def _sweep(self, queryset, batch_size, metrics, status, cancellation_reason=None, cancel_invoices=False,
+               counter=None):
+        """
+        Claim and update matching bookings batch by batch; returns rows
+        updated. ``counter`` names the status counter the rows leave.
+        """
+        updated_total = 0
+        while True:
+            with transaction.atomic():
+                ids = list(
+                    queryset.select_for_update(skip_locked=True)
+                    .order_by()
+                    .values_list('id', flat=True)[:batch_size]
+                )
+                if not ids:
+                    break
+
+                now = timezone.now()
+                changes = {'status': status, 'updated_at': now}
+                if cancellation_reason:
+                    changes['cancellation_reason'] = cancellation_reason
+                # Re-apply the filter so rows changed since the claim are left alone
+                updated = queryset.filter(id__in=ids).update(**changes)
+                invalidate_for_bookings(ids)
+                if counter:
+                    counters.adjust({counter: -updated})
+
+                if cancel_invoices:
+                    metrics['invoices_cancelled'] += Invoice.objects.filter(
+                        booking_id__in=ids,
+                        booking__status=status,
+                    ).exclude(status__in=['PAID', 'CANCELLED']).update(status='CANCELLED', updated_at=now)
+
+            updated_total += updated
+            metrics['batches'] += 1
+            if len(ids) < batch_size:
+                break
+        return updated_total
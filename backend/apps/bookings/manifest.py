@@ -0,0 +1,180 @@
+"""
+Departure manifests
+One row per traveler (or one per booking without traveler rows) for the
+bookings on a departure or a range of departures, read with a single
+query over the (tour, travel_date) / (status, travel_date) indexes and
+iterated with a server-side cursor, then streamed as CSV, JSON or PDF
+"""
+
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from apps.core.pdf import PDFWriter
+from .models import Booking
+
+ITERATOR_CHUNK_SIZE = 2000
+
+COLUMNS = [
+    ('travel_date', 'Travel date'),
+    ('tour_name', 'Tour'),
+    ('package_name', 'Package'),
+    ('booking_id', 'Booking'),
+    ('booking_status', 'Status'),
+    ('travelers_count', 'Travelers'),
+    ('customer_name', 'Booked by'),
+    ('customer_email', 'Email'),
+    ('contact_number', 'Contact'),
+    ('emergency_contact', 'Emergency contact'),
+    ('traveler_number', 'No.'),
+    ('traveler_name', 'Traveler'),
+    ('traveler_age', 'Age'),
+    ('traveler_category', 'Category'),
+    ('special_requests', 'Special requests'),
+]
+
+_VALUES = {
+    'travel_date': 'travel_date',
+    'tour_id': 'tour_id',
+    'tour_name': 'tour__name',
+    'package_name': 'package__name',
+    'booking_id': 'id',
+    'booking_status': 'status',
+    'travelers_count': 'travelers_count',
+    'first_name': 'user__first_name',
+    'last_name': 'user__last_name',
+    'customer_email': 'user__email',
+    'contact_number': 'contact_number',
+    'emergency_contact': 'emergency_contact',
+    'traveler_position': 'travelers__position',
+    'traveler_name': 'travelers__name',
+    'traveler_age': 'travelers__age',
+    'traveler_category': 'travelers__category',
+    'special_requests': 'special_requests',
+}
+
+
+def manifest_queryset(statuses=('CONFIRMED',), tour=None, travel_date=None, date_from=None, date_to=None):
+    """Bookings LEFT JOIN travelers, ordered by departure, booking and traveler"""
+    queryset = Booking.objects.filter(status__in=statuses, travel_date__isnull=False)
+    if tour:
+        queryset = queryset.filter(tour_id=tour)
+    if travel_date:
+        queryset = queryset.filter(travel_date=travel_date)
+    if date_from:
+        queryset = queryset.filter(travel_date__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(travel_date__lte=date_to)
+    return (
+        queryset.order_by('travel_date', 'tour__name', 'tour_id', 'id', 'travelers__position')
+        .values_list(*_VALUES.values())
+    )
+
+
+def manifest_rows(queryset):
+    """Manifest rows as dicts, fetched ITERATOR_CHUNK_SIZE at a time"""
+    keys = list(_VALUES)
+    for values in queryset.iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+        row = dict(zip(keys, values))
+        position = row.pop('traveler_position')
+        yield {
+            'travel_date': row['travel_date'],
+            'tour_id': row['tour_id'],
+            'tour_name': row['tour_name'],
+            'package_name': row['package_name'] or '',
+            'booking_id': row['booking_id'],
+            'booking_status': row['booking_status'],
+            'travelers_count': row['travelers_count'],
+            'customer_name': f"{row['first_name']} {row['last_name']}".strip(),
+            'customer_email': row['customer_email'],
+            'contact_number': row['contact_number'],
+            'emergency_contact': row['emergency_contact'],
+            'traveler_number': position + 1 if position is not None else None,
+            'traveler_name': row['traveler_name'] or '',
+            'traveler_age': row['traveler_age'],
+            'traveler_category': row['traveler_category'] or '',
+            'special_requests': row['special_requests'] or '',
+        }
+
+
+class _Echo:
+    """File-like object whose write() returns the value, for csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow([label for _, label in COLUMNS])
+    for row in rows:
+        yield writer.writerow(['' if row[key] is None else row[key] for key, _ in COLUMNS])
+
+
+def stream_json(rows, filters):
+    """A JSON object {"filters": ..., "rows": [...], "count": n} written incrementally"""
+    yield '{"filters": ' + json.dumps(filters, cls=DjangoJSONEncoder) + ', "rows": ['
+    count = 0
+    for row in rows:
+        yield (',' if count else '') + json.dumps(row, cls=DjangoJSONEncoder)
+        count += 1
+    yield f'], "count": {count}}}'
+
+
+PDF_COLUMNS = [
+    # (key, label, width fraction)
+    ('traveler_number', '#', 0.04),
+    ('traveler_name', 'Traveler', 0.22),
+    ('traveler_age', 'Age', 0.06),
+    ('traveler_category', 'Category', 0.09),
+    ('customer_name', 'Booked by', 0.17),
+    ('contact_number', 'Contact', 0.13),
+    ('emergency_contact', 'Emergency', 0.15),
+    ('package_name', 'Package', 0.14),
+]
+
+
+def stream_pdf(rows, title='Departure manifest'):
+    """Printable manifest, one section (starting on a new page) per departure"""
+    pdf = PDFWriter(title=title, footer=title)
+    widths = [width for _, _, width in PDF_COLUMNS]
+    header = [label for _, label, _ in PDF_COLUMNS]
+    departure = None
+    booking = None
+    travelers = 0
+
+    def departure_total():
+        pdf.spacer(4)
+        pdf.paragraph(f"Total travelers: {travelers}", size=9, bold=True)
+
+    for row in rows:
+        key = (row['travel_date'], row['tour_id'])
+        if key != departure:
+            if departure is not None:
+                departure_total()
+                pdf.new_page()
+            departure, booking, travelers = key, None, 0
+            pdf.heading(f"{row['tour_name']} - {row['travel_date']:%d %b %Y}")
+            pdf.table_row(header, widths, bold=True)
+            pdf.line()
+        if row['booking_id'] != booking:
+            booking = row['booking_id']
+            pdf.spacer(2)
+            pdf.paragraph(
+                f"Booking {row['booking_id']} ({row['booking_status']}, {row['travelers_count']} travelers)"
+                + (f" - {row['special_requests']}" if row['special_requests'] else ''),
+                size=8, bold=True
+            )
+        travelers += 1 if row['traveler_name'] else row['travelers_count']
+        pdf.table_row(['' if row[key] is None else row[key] for key, _, _ in PDF_COLUMNS], widths)
+
+        data = pdf.drain()
+        if data:
+            yield data
+
+    if departure is None:
+        pdf.paragraph('No bookings match these filters.')
+    else:
+        departure_total()
+    yield pdf.finish()
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:36
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0006_booking_applied_offer_id_booking_base_amount_and_more'),
+        ('tours', '0003_inquiry_anonymous_token'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['status', 'travel_date'], name='bookings_bo_status_e47cc0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['status', 'booking_date'], name='bookings_bo_status_dfd677_idx'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:51
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0007_booking_status_indexes'),
+        ('tours', '0003_inquiry_anonymous_token'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Traveler',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, help_text='Unique identifier for this record', primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='Timestamp when this record was created')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='Timestamp when this record was last updated')),
+                ('position', models.PositiveSmallIntegerField(default=0)),
+                ('name', models.CharField(max_length=200)),
+                ('age', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('category', models.CharField(choices=[('ADULT', 'Adult'), ('CHILD', 'Child')], default='ADULT', max_length=10)),
+            ],
+            options={
+                'db_table': 'bookings_traveler',
+                'ordering': ['booking', 'position'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['tour', 'travel_date'], name='bookings_bo_tour_id_1d7723_idx'),
+        ),
+        migrations.AddField(
+            model_name='traveler',
+            name='booking',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='travelers', to='bookings.booking'),
+        ),
+        migrations.AddIndex(
+            model_name='traveler',
+            index=models.Index(fields=['category', 'age'], name='bookings_tr_categor_71b893_idx'),
+        ),
+    ]
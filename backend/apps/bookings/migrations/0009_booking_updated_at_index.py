@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0008_traveler'),
+        ('tours', '0003_inquiry_anonymous_token'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['updated_at'], name='bookings_bo_updated_e5c31b_idx'),
+        ),
+    ]
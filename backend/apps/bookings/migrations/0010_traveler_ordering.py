@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:51
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0009_booking_updated_at_index'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='traveler',
+            options={'ordering': ['booking_id', 'position']},
+        ),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models
 from django.conf import settings
 from apps.core.models import BaseModel
+from apps.core.planner import requires
 from apps.tours.models import Tour, TourPackage
 
 class Booking(BaseModel):
@@ -60,27 +61,41 @@ class Booking(BaseModel):
     class Meta:
         db_table = 'bookings_booking'
         ordering = ['-created_at']
+        indexes = [
+            # Used by the sweep_bookings lifecycle command
+            models.Index(fields=['status', 'travel_date']),
+            models.Index(fields=['status', 'booking_date']),
+            # Departure lookups (traveler counts, manifests)
+            models.Index(fields=['tour', 'travel_date']),
+            # Change scan of the dashboard rollups
+            models.Index(fields=['updated_at']),
+        ]
 
     def __str__(self):
         return f"Booking {self.id} for {self.user.email}"
 
     @property
+    @requires('status')
     def can_review(self):
         """Check if booking is eligible for review"""
         return self.status == 'COMPLETED'
 
     @property
+    @requires('status')
     def can_cancel(self):
         """Check if booking can be cancelled"""
         return self.status in ['PENDING', 'CONFIRMED']
 
-    def calculate_refund_amount(self):
+    def calculate_refund_amount(self, now=None):
         """
         Calculate refund amount based on cancellation policy:
         - Within 24 hours of booking: 100% refund
         - 10+ days before tour start: 50% refund  
         - 5-9 days before tour start: 0% refund
         - Less than 5 days: 0% refund
+
+        The same rules are evaluated in bulk by apps.bookings.refund_policy;
+        keep both in sync.
         """
         from django.utils import timezone
         from datetime import timedelta
@@ -88,7 +103,7 @@ class Booking(BaseModel):
         if not self.travel_date:
             return 0, "No travel date set"
         
-        now = timezone.now()
+        now = now or timezone.now()
         booking_time = self.booking_date
         travel_date = timezone.datetime.combine(self.travel_date, timezone.datetime.min.time())
         travel_date = timezone.make_aware(travel_date) if timezone.is_naive(travel_date) else travel_date
@@ -119,3 +134,38 @@ class Booking(BaseModel):
             'reason': reason,
             'can_get_refund': refund_amount > 0
         }
+
+
+class Traveler(BaseModel):
+    """
+    One traveler on a booking, kept in sync with Booking.traveler_details
+    so departures can be counted and listed with SQL instead of parsing JSON
+    """
+    CATEGORY_CHOICES = [
+        ('ADULT', 'Adult'),
+        ('CHILD', 'Child'),
+    ]
+
+    booking = models.ForeignKey(
+        Booking,
+        on_delete=models.CASCADE,
+        related_name='travelers'
+    )
+    position = models.PositiveSmallIntegerField(default=0)
+    name = models.CharField(max_length=200)
+    age = models.PositiveSmallIntegerField(null=True, blank=True)
+    category = models.CharField(
+        max_length=10,
+        choices=CATEGORY_CHOICES,
+        default='ADULT'
+    )
+
+    class Meta:
+        db_table = 'bookings_traveler'
+        ordering = ['booking_id', 'position']
+        indexes = [
+            models.Index(fields=['category', 'age']),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.age}) - booking {self.booking_id}"
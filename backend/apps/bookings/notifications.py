@@ -0,0 +1,45 @@
+"""
+Customer notifications for bookings
+Functions here run as background jobs (see apps.core.jobs) and receive the
+job payload dict
+"""
+
+import logging
+
+from django.conf import settings
+from django.core.mail import send_mail
+
+from .models import Booking
+
+logger = logging.getLogger(__name__)
+
+
+def send_departure_cancelled(payload):
+    """Tell a customer that the operator cancelled their departure"""
+    booking = Booking.objects.select_related('user', 'tour').filter(id=payload['booking_id']).first()
+    if not booking:
+        logger.warning(f"Departure cancellation notice skipped: booking {payload['booking_id']} not found")
+        return
+
+    refund_amount = payload.get('refund_amount')
+    lines = [
+        f"Dear {booking.user.get_full_name() or booking.user.username},",
+        "",
+        f"We are sorry to inform you that the {booking.tour.name} departure on "
+        f"{booking.travel_date.strftime('%d %B, %Y')} has been cancelled.",
+        f"Reason: {payload.get('reason') or 'Operational reasons'}",
+        "",
+    ]
+    if refund_amount:
+        lines.append(f"A full refund of ₹{refund_amount} has been initiated to your original payment method.")
+    else:
+        lines.append("No payment was received for this booking, so no refund is due.")
+    lines += ["", "Tours & Travels"]
+
+    send_mail(
+        subject=f"Your {booking.tour.name} departure has been cancelled",
+        message="\n".join(lines),
+        from_email=getattr(settings, 'DEFAULT_FROM_EMAIL', None),
+        recipient_list=[booking.user.email],
+    )
+    logger.info(f"Departure cancellation notice sent for booking {booking.id}")
@@ -0,0 +1,151 @@
+"""
+Booking price calculation
+Shared by BookingViewSet.perform_create and the group booking endpoint;
+seasonal_prices() resolves the season and tour pricing for any number of
+(tour, travel date) pairs with two queries
+"""
+
+import logging
+from decimal import Decimal, ROUND_HALF_UP
+
+from apps.core import metrics
+from apps.tours.models import Season, TourPricing
+
+logger = logging.getLogger(__name__)
+
+DURATION = metrics.Histogram(
+    'pricing_duration_seconds', 'Pricing engine call duration by operation', ['operation'],
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+)
+
+CHILD_AGE_LIMIT = 12
+GST_RATE = Decimal('0.05')
+CENT = Decimal('0.01')
+
+
+def _quantize(value):
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def count_travelers(traveler_details, travelers_count):
+    """Split travelers into (adults, children) from their ages; children are under 12"""
+    adult_count = 0
+    child_count = 0
+
+    if traveler_details and isinstance(traveler_details, list):
+        for traveler in traveler_details:
+            age = int(traveler.get('age', 25))
+            if age < CHILD_AGE_LIMIT:
+                child_count += 1
+            else:
+                adult_count += 1
+        if adult_count + child_count != travelers_count:
+            if adult_count == 0 and child_count == 0:
+                adult_count = travelers_count
+    else:
+        adult_count = travelers_count
+
+    return adult_count, child_count
+
+
+@DURATION.labels('seasonal_prices').time()
+def seasonal_prices(pairs):
+    """
+    Map each (tour_id, travel_date) pair to its (season, TourPricing) when
+    an active season covers the date and the tour has pricing for it.
+    Pairs without seasonal pricing are left out.
+    """
+    pairs = {(tour_id, travel_date) for tour_id, travel_date in pairs if travel_date}
+    if not pairs:
+        return {}
+
+    dates = [travel_date for _, travel_date in pairs]
+    seasons = list(Season.objects.filter(
+        start_date__lte=max(dates),
+        end_date__gte=min(dates),
+        is_active=True
+    ))
+
+    season_for_date = {}
+    for travel_date in set(dates):
+        season_for_date[travel_date] = next(
+            (season for season in seasons if season.start_date <= travel_date <= season.end_date),
+            None
+        )
+
+    season_ids = {season.id for season in season_for_date.values() if season}
+    if not season_ids:
+        return {}
+    pricings = {
+        (pricing.tour_id, pricing.season_id): pricing
+        for pricing in TourPricing.objects.filter(
+            tour_id__in={tour_id for tour_id, _ in pairs},
+            season_id__in=season_ids
+        )
+    }
+
+    result = {}
+    for tour_id, travel_date in pairs:
+        season = season_for_date[travel_date]
+        pricing = season and pricings.get((tour_id, season.id))
+        if pricing:
+            result[(tour_id, travel_date)] = (season, pricing)
+    return result
+
+
+@DURATION.labels('quote').time()
+def quote(tour, package, adult_count, child_count, seasonal=None):
+    """
+    Price a booking; ``seasonal`` is the (season, TourPricing) entry from
+    seasonal_prices(), if any. Returns (adult_price, child_price, total).
+    """
+    adult_price = tour.base_price or 0
+    child_price = tour.child_price or 0
+
+    if seasonal:
+        season, pricing = seasonal
+        adult_price = pricing.two_sharing_price or pricing.price or adult_price
+        child_price = pricing.child_price or child_price
+        logger.info(f"Applied seasonal pricing '{season.name}' for booking")
+
+    if package:
+        adult_price += package.price_modifier
+        child_price += package.price_modifier
+
+    total = (Decimal(adult_count) * Decimal(adult_price)) + (Decimal(child_count) * Decimal(child_price))
+    return adult_price, child_price, total
+
+
+@DURATION.labels('apply_offer').time()
+def apply_offer(calculated_total, applied_offer_id=None, base_amount=0, discount_amount=0):
+    """
+    Accept the client's offer pricing only when its base amount matches
+    the calculated total. Returns (final_total, base_amount,
+    discount_amount, applied_offer_id), rounded to paise.
+    """
+    base_amount = Decimal(str(base_amount or 0))
+    discount_amount = Decimal(str(discount_amount or 0))
+
+    if applied_offer_id and base_amount > 0:
+        # Allow small rounding differences
+        if abs(calculated_total - base_amount) < CENT:
+            final_total = base_amount - discount_amount
+            logger.info(f"Applied offer {applied_offer_id}: Base {base_amount}, Discount {discount_amount}, Final {final_total}")
+        else:
+            final_total = calculated_total
+            base_amount = calculated_total
+            discount_amount = Decimal('0')
+            applied_offer_id = None
+            logger.warning(f"Price mismatch detected. Using calculated price: {calculated_total}")
+    else:
+        final_total = calculated_total
+        base_amount = calculated_total
+        discount_amount = Decimal('0')
+
+    return _quantize(final_total), _quantize(base_amount), _quantize(discount_amount), applied_offer_id
+
+
+def invoice_amounts(final_total):
+    """(tax_amount, total_amount) for a booking total, with 5% GST"""
+    tax_amount = _quantize(final_total * GST_RATE)
+    return tax_amount, _quantize(final_total + tax_amount)
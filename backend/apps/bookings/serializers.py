@@ -1,8 +1,53 @@
 from rest_framework import serializers
+from apps.core.fragments import FragmentCacheMixin, FragmentListSerializer
+from apps.core.planner import requires
+from apps.core.sideload import SideloadMixin
 from .models import Booking
+from apps.tours.models import Tour, TourPackage
 from apps.tours.serializers import TourListSerializer, TourPackageSerializer
 
-class BookingSerializer(serializers.ModelSerializer):
+
+def _validate_traveler_details(value):
+    import json
+
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            raise serializers.ValidationError("Invalid JSON format for traveler_details")
+
+    if not isinstance(value, list):
+        raise serializers.ValidationError("Traveler details must be a list")
+
+    for traveler in value:
+        if not isinstance(traveler, dict):
+            raise serializers.ValidationError("Each traveler must be an object")
+
+        required_fields = ['name', 'age']
+        for field in required_fields:
+            if field not in traveler:
+                raise serializers.ValidationError(f"Traveler missing required field: {field}")
+
+    return value
+
+
+def _validate_travel_date(value):
+    if value:
+        from django.utils import timezone
+        from datetime import timedelta
+
+        min_date = timezone.now().date() + timedelta(days=10)
+        if value < min_date:
+            raise serializers.ValidationError("Bookings must be made at least 15 days in advance.")
+    return value
+
+
+class BookingSerializer(FragmentCacheMixin, SideloadMixin, serializers.ModelSerializer):
+    # tour_details is served from the tour card's own fragment; package
+    # capacity, users and payments change without touching the booking
+    fragment_related = ('tour',)
+    fragment_volatile = ('user_details', 'tour_details', 'package_details', 'payment_details')
+    sideload_fields = {'tour_details': 'tours', 'user_details': ('users', 'user')}
     tour_details = TourListSerializer(source='tour', read_only=True)
     package_details = TourPackageSerializer(source='package', read_only=True)
     tour_name = serializers.CharField(source='tour.name', read_only=True)
@@ -23,7 +68,9 @@ class BookingSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'user', 'booking_date', 'created_at', 'updated_at']
+        list_serializer_class = FragmentListSerializer
 
+    @requires('user')
     def get_user_details(self, obj):
         if obj.user:
             return {
@@ -36,9 +83,13 @@ class BookingSerializer(serializers.ModelSerializer):
             }
         return None
 
+    @requires('payments')
     def get_payment_details(self, obj):
         # Get the latest payment for this booking
-        payment = obj.payments.order_by('-created_at').first()
+        if 'payments' in getattr(obj, '_prefetched_objects_cache', {}):
+            payment = max(obj.payments.all(), key=lambda item: item.created_at, default=None)
+        else:
+            payment = obj.payments.order_by('-created_at').first()
         if payment:
             return {
                 'id': payment.id,
@@ -60,35 +111,142 @@ class BookingSerializer(serializers.ModelSerializer):
 
     def validate_traveler_details(self, value):
         """Validate traveler details format. Handles JSON string from multipart form."""
-        import json
-        
-        if isinstance(value, str):
-            try:
-                value = json.loads(value)
-            except json.JSONDecodeError:
-                raise serializers.ValidationError("Invalid JSON format for traveler_details")
-
-        if not isinstance(value, list):
-            raise serializers.ValidationError("Traveler details must be a list")
-        
-        for traveler in value:
-            if not isinstance(traveler, dict):
-                raise serializers.ValidationError("Each traveler must be an object")
-            
-            required_fields = ['name', 'age']
-            for field in required_fields:
-                if field not in traveler:
-                    raise serializers.ValidationError(f"Traveler missing required field: {field}")
-        
-        return value
+        return _validate_traveler_details(value)
 
     def validate_travel_date(self, value):
         """Validate travel date is at least 15 days in the future"""
-        if value:
-            from django.utils import timezone
-            from datetime import timedelta
-            
-            min_date = timezone.now().date() + timedelta(days=10)
-            if value < min_date:
-                raise serializers.ValidationError("Bookings must be made at least 15 days in advance.")
-        return value
+        return _validate_travel_date(value)
+
+
+class DepartureCancellationSerializer(serializers.Serializer):
+    """Input for operator-initiated cancellation of a whole departure"""
+    tour = serializers.UUIDField()
+    travel_date = serializers.DateField()
+    reason = serializers.CharField(max_length=500)
+    dry_run = serializers.BooleanField(required=False, default=False)
+
+
+class GroupBookingEntrySerializer(serializers.Serializer):
+    """One booking within a group booking request"""
+    tour = serializers.UUIDField()
+    package = serializers.UUIDField(required=False, allow_null=True)
+    travel_date = serializers.DateField()
+    travelers_count = serializers.IntegerField(min_value=1, default=1)
+    traveler_details = serializers.JSONField(required=False, default=list)
+    special_requests = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    contact_number = serializers.CharField(max_length=20, required=False, allow_blank=True, default='')
+    emergency_contact = serializers.CharField(max_length=100, required=False, allow_blank=True, default='')
+    applied_offer_id = serializers.CharField(max_length=100, required=False, allow_blank=True, allow_null=True)
+    base_amount = serializers.DecimalField(max_digits=12, decimal_places=2, required=False, default=0)
+    discount_amount = serializers.DecimalField(max_digits=12, decimal_places=2, required=False, default=0)
+
+    def validate_traveler_details(self, value):
+        return _validate_traveler_details(value)
+
+    def validate_travel_date(self, value):
+        return _validate_travel_date(value)
+
+
+class GroupBookingSerializer(serializers.Serializer):
+    """
+    Input for booking several parties at once (travel agents, corporate groups).
+    Tours and packages for all entries are resolved with one query each.
+    """
+    bookings = GroupBookingEntrySerializer(many=True, allow_empty=False)
+
+    def validate_bookings(self, entries):
+        from django.conf import settings
+
+        max_size = getattr(settings, 'GROUP_BOOKING_MAX_SIZE', 100)
+        if len(entries) > max_size:
+            raise serializers.ValidationError(f"A group booking can contain at most {max_size} bookings")
+
+        tours = Tour.objects.in_bulk({entry['tour'] for entry in entries})
+        packages = TourPackage.objects.in_bulk({entry['package'] for entry in entries if entry.get('package')})
+
+        errors = []
+        for entry in entries:
+            entry_errors = {}
+            tour = tours.get(entry['tour'])
+            if tour is None or not tour.is_active:
+                entry_errors['tour'] = ["Tour not found or inactive"]
+            package = packages.get(entry.get('package')) if entry.get('package') else None
+            if entry.get('package') and (package is None or package.tour_id != entry['tour']):
+                entry_errors['package'] = ["Package not found for this tour"]
+            entry['tour'] = tour
+            entry['package'] = package
+            errors.append(entry_errors)
+
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return entries
+
+
+class TravelerQuerySerializer(serializers.Serializer):
+    """Query parameters for the traveler count and list endpoints"""
+    tour = serializers.UUIDField(required=False)
+    travel_date = serializers.DateField(required=False)
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    status = serializers.CharField(required=False)
+    category = serializers.ChoiceField(choices=['ADULT', 'CHILD'], required=False)
+    min_age = serializers.IntegerField(min_value=0, required=False)
+    max_age = serializers.IntegerField(min_value=0, required=False)
+
+    def validate_status(self, value):
+        statuses = [item.strip().upper() for item in value.split(',') if item.strip()]
+        valid = {code for code, _ in Booking.STATUS_CHOICES}
+        unknown = [item for item in statuses if item not in valid]
+        if unknown:
+            raise serializers.ValidationError(f"Unknown booking status: {', '.join(unknown)}")
+        return statuses
+
+    def get_filters(self):
+        """Traveler queryset filters for the validated parameters"""
+        data = self.validated_data
+        filters = {'booking__status__in': data.get('status') or ['PENDING', 'CONFIRMED']}
+        lookups = {
+            'tour': 'booking__tour_id',
+            'travel_date': 'booking__travel_date',
+            'date_from': 'booking__travel_date__gte',
+            'date_to': 'booking__travel_date__lte',
+            'category': 'category',
+            'min_age': 'age__gte',
+            'max_age': 'age__lte',
+        }
+        for field, lookup in lookups.items():
+            if data.get(field) is not None:
+                filters[lookup] = data[field]
+        return filters
+
+
+class ManifestQuerySerializer(serializers.Serializer):
+    """Filters for departure manifests: one departure or a travel date range"""
+    OUTPUT_CHOICES = ['csv', 'json', 'pdf']
+
+    tour = serializers.UUIDField(required=False)
+    travel_date = serializers.DateField(required=False)
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    status = serializers.CharField(required=False, default='CONFIRMED')
+    output = serializers.ChoiceField(choices=OUTPUT_CHOICES, required=False, default='csv')
+
+    def validate_status(self, value):
+        return TravelerQuerySerializer().validate_status(value)
+
+    def validate(self, attrs):
+        if not attrs.get('travel_date') and not (attrs.get('date_from') and attrs.get('date_to')):
+            raise serializers.ValidationError("Provide travel_date, or both date_from and date_to")
+        if attrs.get('date_from') and attrs.get('date_to') and attrs['date_from'] > attrs['date_to']:
+            raise serializers.ValidationError("date_from must be on or before date_to")
+        return attrs
+
+    def get_filters(self):
+        data = self.validated_data
+        return {
+            'statuses': data['status'],
+            'tour': data.get('tour'),
+            'travel_date': data.get('travel_date'),
+            'date_from': data.get('date_from'),
+            'date_to': data.get('date_to'),
+        }
@@ -0,0 +1,29 @@
+"""
+Signal handlers for bookings, payments and refunds
+Single-row saves and deletes invalidate the owner's cached booking
+summary; bulk writes (bulk_create/bulk_update/update) send no signals and
+invalidate explicitly.
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.payments.models import Payment, Refund
+from .models import Booking
+from .summary import invalidate_for_bookings, invalidate_summaries
+
+
+@receiver([post_save, post_delete], sender=Booking)
+def booking_changed(sender, instance, **kwargs):
+    invalidate_summaries([instance.user_id])
+
+
+@receiver([post_save, post_delete], sender=Payment)
+@receiver([post_save, post_delete], sender=Refund)
+def booking_money_changed(sender, instance, **kwargs):
+    if not instance.booking_id:
+        return
+    if sender.booking.is_cached(instance):
+        invalidate_summaries([instance.booking.user_id])
+    else:
+        invalidate_for_bookings([instance.booking_id])
@@ -0,0 +1,138 @@
+"""
+Per-customer booking history summary
+Trip counts, spend and refund totals for the customer dashboard header,
+computed with one aggregate query over the user's bookings plus scalar
+subqueries for payments and refunds, and cached per user.
+
+Each user's cached summary lives under a version token. Writes to the
+user's bookings, payments or refunds delete the token once the transaction
+commits (see signals.py for single-row saves; bulk code paths call
+invalidate_summaries / invalidate_for_bookings themselves), so the next
+read computes under a fresh token and a summary computed concurrently
+with a write is never served afterwards.
+"""
+
+import uuid
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, DecimalField, IntegerField, Min, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Booking
+
+UPCOMING_STATUSES = ['PENDING', 'CONFIRMED']
+CANCELLED_STATUSES = ['CANCELLED', 'CANCELLED_REFUNDED', 'CANCELLED_NOT_REFUNDED', 'REFUND_PENDING']
+# REFUNDED payments were collected before being refunded; refunds are subtracted separately
+PAID_STATUSES = ['SUCCESS', 'REFUNDED']
+OPEN_REFUND_STATUSES = ['PENDING', 'APPROVED']
+
+_VERSION_KEY = 'booking-summary:version:{user_id}'
+_SUMMARY_KEY = 'booking-summary:{user_id}:{version}:{day}'
+
+ZERO = Decimal('0.00')
+
+
+def _money():
+    return DecimalField(max_digits=14, decimal_places=2)
+
+
+def _per_user(queryset, aggregate, output_field):
+    """Scalar subquery: ``aggregate`` over ``queryset`` rows of the outer user's bookings"""
+    return Coalesce(
+        Subquery(
+            queryset.filter(booking__user=OuterRef('pk'))
+            .order_by()
+            .values('booking__user')
+            .annotate(value=aggregate)
+            .values('value'),
+            output_field=output_field,
+        ),
+        Value(0, output_field=output_field),
+    )
+
+
+def compute_summary(user):
+    """The summary for ``user``, read from the database with one query"""
+    from apps.payments.models import Payment, Refund
+
+    today = timezone.localdate()
+    upcoming = Q(bookings__status__in=UPCOMING_STATUSES, bookings__travel_date__gte=today)
+    open_refunds = Refund.objects.filter(status__in=OPEN_REFUND_STATUSES)
+
+    row = (
+        get_user_model().objects.filter(pk=user.pk)
+        .annotate(
+            total_bookings=Count('bookings'),
+            trips_taken=Count('bookings', filter=Q(bookings__status='COMPLETED')),
+            upcoming_trips=Count('bookings', filter=upcoming),
+            pending_bookings=Count('bookings', filter=Q(bookings__status='PENDING')),
+            cancelled_bookings=Count('bookings', filter=Q(bookings__status__in=CANCELLED_STATUSES)),
+            next_trip_date=Min('bookings__travel_date', filter=upcoming),
+            total_paid=_per_user(Payment.objects.filter(status__in=PAID_STATUSES), Sum('amount'), _money()),
+            total_refunded=_per_user(Refund.objects.filter(status='PROCESSED'), Sum('amount'), _money()),
+            pending_refunds=_per_user(open_refunds, Count('id'), IntegerField()),
+            pending_refund_amount=_per_user(open_refunds, Sum('amount'), _money()),
+        )
+        .values(
+            'total_bookings', 'trips_taken', 'upcoming_trips', 'pending_bookings', 'cancelled_bookings',
+            'next_trip_date', 'total_paid', 'total_refunded', 'pending_refunds', 'pending_refund_amount',
+        )
+        .get()
+    )
+
+    total_paid = Decimal(row['total_paid'] or 0).quantize(ZERO)
+    total_refunded = Decimal(row['total_refunded'] or 0).quantize(ZERO)
+    return {
+        'total_bookings': row['total_bookings'],
+        'trips_taken': row['trips_taken'],
+        'upcoming_trips': row['upcoming_trips'],
+        'pending_bookings': row['pending_bookings'],
+        'cancelled_bookings': row['cancelled_bookings'],
+        'next_trip_date': row['next_trip_date'],
+        'total_paid': str(total_paid),
+        'total_refunded': str(total_refunded),
+        'total_spent': str(total_paid - total_refunded),
+        'pending_refunds': row['pending_refunds'],
+        'pending_refund_amount': str(Decimal(row['pending_refund_amount'] or 0).quantize(ZERO)),
+    }
+
+
+def _version(user_id):
+    key = _VERSION_KEY.format(user_id=user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex[:12], timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def booking_summary(user):
+    """The cached summary for ``user``, computed on a miss"""
+    # The day is part of the key because "upcoming" moves with it
+    key = _SUMMARY_KEY.format(user_id=user.pk, version=_version(user.pk), day=timezone.localdate())
+    data = cache.get(key)
+    if data is None:
+        data = compute_summary(user)
+        cache.set(key, data, timeout=getattr(settings, 'BOOKING_SUMMARY_CACHE_TIMEOUT', 600))
+    return data
+
+
+def invalidate_summaries(user_ids):
+    """Drop the cached summaries of ``user_ids`` when the current transaction commits"""
+    keys = [_VERSION_KEY.format(user_id=user_id) for user_id in set(user_ids) if user_id]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def invalidate_for_bookings(booking_ids):
+    """Drop the cached summaries of the users who own ``booking_ids``"""
+    booking_ids = list(booking_ids)
+    if booking_ids:
+        invalidate_summaries(
+            Booking.objects.filter(pk__in=booking_ids).values_list('user_id', flat=True).distinct()
+        )
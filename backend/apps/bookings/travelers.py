@@ -0,0 +1,80 @@
+"""
+Traveler rows derived from Booking.traveler_details
+traveler_details stays the API representation; the Traveler table is
+rewritten from it in bulk whenever bookings are created or their traveler
+list changes, and backs the age-band counts and traveler lists
+"""
+
+from django.db.models import Count, Q
+
+from .models import Traveler
+from .pricing import CHILD_AGE_LIMIT
+
+# (key, label, min age inclusive, max age exclusive)
+AGE_BANDS = [
+    ('under_5', 'Under 5', 0, 5),
+    ('age_5_11', '5-11', 5, CHILD_AGE_LIMIT),
+    ('age_12_17', '12-17', CHILD_AGE_LIMIT, 18),
+    ('age_18_59', '18-59', 18, 60),
+    ('age_60_plus', '60+', 60, None),
+]
+
+
+def _parse_age(value):
+    try:
+        age = int(value)
+    except (TypeError, ValueError):
+        return None
+    return age if 0 <= age <= 150 else None
+
+
+def build_travelers(booking):
+    """Unsaved Traveler rows for a booking's traveler_details"""
+    details = booking.traveler_details if isinstance(booking.traveler_details, list) else []
+    travelers = []
+    for position, traveler in enumerate(details):
+        if not isinstance(traveler, dict):
+            continue
+        age = _parse_age(traveler.get('age'))
+        travelers.append(Traveler(
+            booking_id=booking.pk,
+            position=position,
+            name=str(traveler.get('name') or '')[:200],
+            age=age,
+            # Same rule as pricing.count_travelers: missing ages count as adults
+            category='CHILD' if age is not None and age < CHILD_AGE_LIMIT else 'ADULT',
+        ))
+    return travelers
+
+
+def sync_travelers(bookings, replace=True):
+    """
+    Rewrite the Traveler rows of ``bookings`` from their traveler_details
+    with one DELETE and batched INSERTs. Pass replace=False for bookings
+    that are known to have no rows yet. Returns the number of rows written.
+    """
+    bookings = list(bookings)
+    if not bookings:
+        return 0
+    if replace:
+        Traveler.objects.filter(booking_id__in=[booking.pk for booking in bookings]).delete()
+
+    travelers = [traveler for booking in bookings for traveler in build_travelers(booking)]
+    Traveler.objects.bulk_create(travelers, batch_size=1000)
+    return len(travelers)
+
+
+def age_band_aggregates():
+    """Conditional Count() expressions for each age band plus category totals"""
+    aggregates = {
+        'travelers': Count('id'),
+        'adults': Count('id', filter=Q(category='ADULT')),
+        'children': Count('id', filter=Q(category='CHILD')),
+        'age_unknown': Count('id', filter=Q(age__isnull=True)),
+    }
+    for key, _, min_age, max_age in AGE_BANDS:
+        condition = Q(age__gte=min_age)
+        if max_age is not None:
+            condition &= Q(age__lt=max_age)
+        aggregates[key] = Count('id', filter=condition)
+    return aggregates
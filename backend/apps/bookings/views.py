@@ -2,16 +2,34 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.db import transaction
+from django.utils import timezone
 from .models import Booking
-from .serializers import BookingSerializer
+from . import capacity, pricing, travelers
+from .summary import booking_summary, invalidate_for_bookings, invalidate_summaries
+from .serializers import (
+    BookingSerializer, DepartureCancellationSerializer, GroupBookingSerializer,
+    TravelerQuerySerializer, ManifestQuerySerializer
+)
+from apps.core import metrics
+from apps.core.idempotency import idempotent
+from apps.dashboard import counters
+from apps.core.permissions import IsAdminUser
 from apps.core.response import APIResponse
+from apps.core.planner import QueryPlanMixin
+from apps.core.sideload import SideloadViewMixin
 from apps.reviews.models import Review
 from apps.reviews.serializers import ReviewSerializer
 import logging
+import uuid
 
 logger = logging.getLogger(__name__)
 
-class BookingViewSet(viewsets.ModelViewSet):
+BOOKINGS_CREATED = metrics.Counter(
+    'bookings_created_total', 'Bookings created, by single or group booking', ['channel']
+)
+
+class BookingViewSet(QueryPlanMixin, SideloadViewMixin, viewsets.ModelViewSet):
     queryset = Booking.objects.all()
     serializer_class = BookingSerializer
     permission_classes = [IsAuthenticated]
@@ -22,123 +40,90 @@ class BookingViewSet(viewsets.ModelViewSet):
         return Booking.objects.filter(user=self.request.user).select_related('tour')
 
     def perform_create(self, serializer):
-        from apps.tours.models import Season, TourPricing
         from apps.payments.models import Invoice
-        from decimal import Decimal, ROUND_HALF_UP
         import datetime
 
-        # Enhanced price calculation logic
         tour = serializer.validated_data.get('tour')
         package = serializer.validated_data.get('package')
         travel_date = serializer.validated_data.get('travel_date')
         traveler_details = serializer.validated_data.get('traveler_details', [])
-        
-        # Get offer information from request data
-        applied_offer_id = self.request.data.get('applied_offer_id')
-        discount_amount = Decimal(str(self.request.data.get('discount_amount', 0)))
-        base_amount = Decimal(str(self.request.data.get('base_amount', 0)))
-        
+
         # 1. Count Adults & Children
-        adult_count = 0
-        child_count = 0
-        
-        if traveler_details and isinstance(traveler_details, list):
-            for traveler in traveler_details:
-                age = int(traveler.get('age', 25))
-                if age < 12:
-                    child_count += 1
-                else:
-                    adult_count += 1
-            total_travelers = serializer.validated_data.get('travelers_count', 1)
-            if adult_count + child_count != total_travelers:
-                if adult_count == 0 and child_count == 0:
-                    adult_count = total_travelers
-        else:
-            adult_count = serializer.validated_data.get('travelers_count', 1)
+        adult_count, child_count = pricing.count_travelers(
+            traveler_details, serializer.validated_data.get('travelers_count', 1)
+        )
+
+        # 2-4. Seasonal pricing, package modifier and total
+        seasonal = pricing.seasonal_prices([(tour.id, travel_date)]).get((tour.id, travel_date))
+        adult_price, child_price, calculated_total = pricing.quote(
+            tour, package, adult_count, child_count, seasonal
+        )
 
-        # 2. Determine Pricing
-        adult_price = tour.base_price or 0
-        child_price = tour.child_price or 0
-        
-        # Check Season
-        if travel_date:
-            active_season = Season.objects.filter(
-                start_date__lte=travel_date,
-                end_date__gte=travel_date,
-                is_active=True
-            ).first()
-            
-            if active_season:
-                seasonal_pricing = TourPricing.objects.filter(tour=tour, season=active_season).first()
-                if seasonal_pricing:
-                    adult_price = seasonal_pricing.two_sharing_price or seasonal_pricing.price or adult_price
-                    child_price = seasonal_pricing.child_price or child_price
-                    logger.info(f"Applied seasonal pricing '{active_season.name}' for booking")
-
-        # 3. Apply Package Modifier
-        if package:
-            adult_price += package.price_modifier
-            child_price += package.price_modifier
-            
-        # 4. Calculate total price
-        calculated_total = (Decimal(adult_count) * Decimal(adult_price)) + (Decimal(child_count) * Decimal(child_price))
-        
         # 5. Use frontend-calculated price if offer was applied, otherwise use calculated price
-        if applied_offer_id and base_amount > 0:
-            # Verify the calculation matches
-            if abs(calculated_total - base_amount) < Decimal('0.01'):  # Allow small rounding differences
-                final_total = base_amount - discount_amount
-                logger.info(f"Applied offer {applied_offer_id}: Base {base_amount}, Discount {discount_amount}, Final {final_total}")
-            else:
-                # Fallback to calculated price if mismatch
-                final_total = calculated_total
-                base_amount = calculated_total
-                discount_amount = Decimal('0')
-                applied_offer_id = None
-                logger.warning(f"Price mismatch detected. Using calculated price: {calculated_total}")
-        else:
-            final_total = calculated_total
-            base_amount = calculated_total
-            discount_amount = Decimal('0')
-        
-        # Ensure proper decimal precision
-        final_total = final_total.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-        base_amount = base_amount.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-        discount_amount = discount_amount.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-        
+        final_total, base_amount, discount_amount, applied_offer_id = pricing.apply_offer(
+            calculated_total,
+            applied_offer_id=self.request.data.get('applied_offer_id'),
+            base_amount=self.request.data.get('base_amount', 0),
+            discount_amount=self.request.data.get('discount_amount', 0),
+        )
+
         logger.info(f"Price Calc: {adult_count} Adults @ {adult_price}, {child_count} Children @ {child_price} = {final_total}")
-        
+
         # 6. Save Booking with offer information
         booking = serializer.save(
-            user=self.request.user, 
+            user=self.request.user,
             total_price=final_total,
             applied_offer_id=applied_offer_id,
             base_amount=base_amount,
             discount_amount=discount_amount
         )
-        
+        travelers.sync_travelers([booking], replace=False)
+        transaction.on_commit(BOOKINGS_CREATED.labels('single').inc)
+
         # 7. Generate Invoice Automatically
         try:
-            # Calculate tax (5% GST)
-            tax_amount = (final_total * Decimal('0.05')).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-            invoice_total = (final_total + tax_amount).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-            
-            Invoice.objects.create(
-                booking=booking,
-                amount=final_total,
-                tax_amount=tax_amount,
-                total_amount=invoice_total,
-                due_date=datetime.date.today() + datetime.timedelta(days=1),
-                status='DRAFT'
-            )
+            tax_amount, invoice_total = pricing.invoice_amounts(final_total)
+
+            with transaction.atomic():
+                Invoice.objects.create(
+                    booking=booking,
+                    amount=final_total,
+                    tax_amount=tax_amount,
+                    total_amount=invoice_total,
+                    due_date=datetime.date.today() + datetime.timedelta(days=1),
+                    status='DRAFT'
+                )
             logger.info(f"Auto-generated invoice for booking {booking.id}")
         except Exception as e:
             logger.error(f"Failed to auto-generate invoice: {e}")
 
+    def perform_update(self, serializer):
+        booking = serializer.save()
+        if 'traveler_details' in serializer.validated_data:
+            travelers.sync_travelers([booking])
+
+    @idempotent
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
-            self.perform_create(serializer)
+            data = serializer.validated_data
+            departure = data.get('travel_date')
+            seats = data.get('travelers_count', 1)
+            package = data.get('package')
+            with transaction.atomic():
+                # Same check as group bookings; holds the tour and package row
+                # locks until the booking is saved
+                shortfalls = capacity.shortfalls(
+                    {(data['tour'].id, departure): seats},
+                    {(package.id, departure): seats} if package else None,
+                )
+                if shortfalls:
+                    return APIResponse.error(
+                        message="Not enough seats available on this departure",
+                        errors={'departures': shortfalls},
+                        status_code=status.HTTP_409_CONFLICT
+                    )
+                self.perform_create(serializer)
             return APIResponse.success(
                 data=serializer.data,
                 message="Booking created successfully",
@@ -223,6 +208,271 @@ class BookingViewSet(viewsets.ModelViewSet):
             message=message
         )
 
+    @action(detail=False, methods=['post'], url_path='group')
+    @idempotent
+    def group(self, request):
+        """
+        Book several parties in one request (travel agents, corporate groups).
+        All entries are validated and priced together, seats on each
+        departure are reserved under a lock on the tour rows, and bookings
+        and invoices are bulk-created in one transaction: either every
+        entry is booked or none is.
+        """
+        from apps.payments.models import Invoice
+        import datetime
+
+        serializer = GroupBookingSerializer(data=request.data)
+        if not serializer.is_valid():
+            return APIResponse.error(
+                message="Group booking failed",
+                errors=serializer.errors,
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+
+        entries = serializer.validated_data['bookings']
+        seasonal = pricing.seasonal_prices(
+            (entry['tour'].id, entry['travel_date']) for entry in entries
+        )
+
+        requested, packages = {}, {}
+        for entry in entries:
+            key = (entry['tour'].id, entry['travel_date'])
+            requested[key] = requested.get(key, 0) + entry['travelers_count']
+            if entry['package']:
+                key = (entry['package'].id, entry['travel_date'])
+                packages[key] = packages.get(key, 0) + entry['travelers_count']
+
+        with transaction.atomic():
+            shortfalls = capacity.shortfalls(requested, packages)
+            if shortfalls:
+                return APIResponse.error(
+                    message="Not enough seats available for this group",
+                    errors={'departures': shortfalls},
+                    status_code=status.HTTP_409_CONFLICT
+                )
+
+            bookings = []
+            for entry in entries:
+                tour = entry['tour']
+                adult_count, child_count = pricing.count_travelers(
+                    entry.get('traveler_details'), entry['travelers_count']
+                )
+                _, _, calculated_total = pricing.quote(
+                    tour, entry['package'], adult_count, child_count,
+                    seasonal.get((tour.id, entry['travel_date']))
+                )
+                final_total, base_amount, discount_amount, applied_offer_id = pricing.apply_offer(
+                    calculated_total,
+                    applied_offer_id=entry.get('applied_offer_id'),
+                    base_amount=entry.get('base_amount'),
+                    discount_amount=entry.get('discount_amount'),
+                )
+                bookings.append(Booking(
+                    user=request.user,
+                    tour=tour,
+                    package=entry['package'],
+                    travel_date=entry['travel_date'],
+                    travelers_count=entry['travelers_count'],
+                    traveler_details=entry.get('traveler_details') or [],
+                    special_requests=entry.get('special_requests'),
+                    contact_number=entry.get('contact_number', ''),
+                    emergency_contact=entry.get('emergency_contact', ''),
+                    total_price=final_total,
+                    applied_offer_id=applied_offer_id,
+                    base_amount=base_amount,
+                    discount_amount=discount_amount,
+                ))
+            Booking.objects.bulk_create(bookings, batch_size=500)
+            travelers.sync_travelers(bookings, replace=False)
+            # Before allocate_numbers: a single booking updates the counter
+            # (post_save signal) before locking the invoice sequence, and both
+            # paths must take the two locks in the same order
+            counters.adjust({'pending_bookings': len(bookings)})
+
+            due_date = datetime.date.today() + datetime.timedelta(days=1)
+            invoices = []
+            for booking, invoice_number in zip(bookings, Invoice.allocate_numbers(len(bookings))):
+                tax_amount, invoice_total = pricing.invoice_amounts(booking.total_price)
+                invoices.append(Invoice(
+                    booking=booking,
+                    invoice_number=invoice_number,
+                    amount=booking.total_price,
+                    tax_amount=tax_amount,
+                    total_amount=invoice_total,
+                    due_date=due_date,
+                    status='DRAFT'
+                ))
+            Invoice.objects.bulk_create(invoices, batch_size=500)
+            invalidate_summaries([request.user.id])
+
+        BOOKINGS_CREATED.labels('group').inc(len(bookings))
+        logger.info(f"Group booking by {request.user.email}: {len(bookings)} bookings")
+        results = [
+            {
+                'index': index,
+                'booking_id': booking.id,
+                'tour': booking.tour_id,
+                'travel_date': booking.travel_date,
+                'travelers_count': booking.travelers_count,
+                'total_price': booking.total_price,
+                'status': booking.status,
+                'invoice_number': invoice.invoice_number,
+                'invoice_total': invoice.total_amount,
+            }
+            for index, (booking, invoice) in enumerate(zip(bookings, invoices))
+        ]
+        return APIResponse.success(
+            data={
+                'bookings': results,
+                'count': len(results),
+                'total_price': sum((booking.total_price for booking in bookings), 0),
+            },
+            message=f"{len(results)} bookings created",
+            status_code=status.HTTP_201_CREATED
+        )
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
+    def cancel_departure(self, request):
+        """
+        Operator cancellation of every open booking on a tour departure.
+        Customer cancellation tiers do not apply: each successful payment is
+        refunded in full, less what earlier refunds already cover. Refunds are bulk-created, booking and invoice
+        statuses are updated set-wise and customer notifications are queued,
+        all in one transaction.
+        """
+        from decimal import Decimal
+        from django.db.models import DecimalField, Q, Sum, Value
+        from django.db.models.functions import Coalesce
+        from apps.payments.models import Payment, Refund, Invoice
+        from apps.core.jobs import enqueue_many
+
+        serializer = DepartureCancellationSerializer(data=request.data)
+        if not serializer.is_valid():
+            return APIResponse.error(
+                message="Departure cancellation failed",
+                errors=serializer.errors,
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+
+        data = serializer.validated_data
+        reason = data['reason']
+        now = timezone.now()
+
+        with transaction.atomic():
+            booking_ids = list(
+                Booking.objects.select_for_update().filter(
+                    tour_id=data['tour'],
+                    travel_date=data['travel_date'],
+                    status__in=['PENDING', 'CONFIRMED'],
+                ).values_list('id', flat=True)
+            )
+            if not booking_ids:
+                return APIResponse.error(
+                    message="No open bookings found for this departure",
+                    status_code=status.HTTP_404_NOT_FOUND
+                )
+
+            # Successful payments are refunded whatever their active refunds
+            # (pending, approved or processed) have not covered yet
+            payments = [
+                (payment_id, booking_id, amount - refunded)
+                for payment_id, booking_id, amount, refunded in (
+                    Payment.objects.filter(booking_id__in=booking_ids, status='SUCCESS')
+                    .annotate(refunded=Coalesce(
+                        Sum('refunds__amount', filter=Q(refunds__status__in=['PENDING', 'APPROVED', 'PROCESSED'])),
+                        Value(Decimal('0')),
+                        output_field=DecimalField(max_digits=12, decimal_places=2),
+                    ))
+                    .values_list('id', 'booking_id', 'amount', 'refunded')
+                )
+                if amount > refunded
+            ]
+            refund_by_booking = {}
+            for _, booking_id, amount in payments:
+                refund_by_booking[booking_id] = refund_by_booking.get(booking_id, 0) + amount
+
+            refunded_ids = list(refund_by_booking)
+            unpaid_ids = [booking_id for booking_id in booking_ids if booking_id not in refund_by_booking]
+            summary = {
+                'tour': data['tour'],
+                'travel_date': data['travel_date'],
+                'bookings_cancelled': len(booking_ids),
+                'bookings_refund_pending': len(refunded_ids),
+                'bookings_cancelled_unpaid': len(unpaid_ids),
+                'refunds_created': len(payments),
+                'refund_total': sum(refund_by_booking.values(), 0),
+                'dry_run': data['dry_run'],
+            }
+            if data['dry_run']:
+                return APIResponse.success(
+                    data=summary,
+                    message="Dry run: no changes were made"
+                )
+
+            Refund.objects.bulk_create([
+                Refund(
+                    payment_id=payment_id,
+                    booking_id=booking_id,
+                    amount=amount,
+                    reason=f"Departure cancelled by operator: {reason}",
+                    status='APPROVED',  # Operator cancellations are always refunded in full
+                    processed_by=request.user,
+                    processed_at=now,
+                    created_at=now,
+                    updated_at=now,
+                )
+                for payment_id, booking_id, amount in payments
+            ], batch_size=500)
+
+            pending = Booking.objects.filter(id__in=booking_ids, status='PENDING').count()
+            Booking.objects.filter(id__in=refunded_ids).update(
+                status='REFUND_PENDING',
+                cancellation_reason=reason,
+                updated_at=now
+            )
+            Booking.objects.filter(id__in=unpaid_ids).update(
+                status='CANCELLED',
+                cancellation_reason=reason,
+                updated_at=now
+            )
+            invalidate_for_bookings(booking_ids)
+            counters.adjust({'pending_bookings': -pending})
+            summary['invoices_cancelled'] = Invoice.objects.filter(
+                booking_id__in=booking_ids
+            ).exclude(status='CANCELLED').update(status='CANCELLED', updated_at=now)
+
+            enqueue_many('apps.bookings.notifications.send_departure_cancelled', [
+                {
+                    'booking_id': str(booking_id),
+                    'refund_amount': str(refund_by_booking[booking_id]) if booking_id in refund_by_booking else None,
+                    'reason': reason,
+                }
+                for booking_id in booking_ids
+            ])
+            summary['notifications_queued'] = len(booking_ids)
+
+        logger.info(
+            f"Departure {data['tour']} on {data['travel_date']} cancelled by {request.user.email}: "
+            f"{summary['bookings_cancelled']} bookings, {summary['refunds_created']} refunds"
+        )
+
+        return APIResponse.success(
+            data=summary,
+            message=f"Departure cancelled. {summary['bookings_cancelled']} bookings cancelled and "
+                    f"{summary['refunds_created']} refunds created."
+        )
+
+    @action(detail=False, methods=['get'])
+    def summary(self, request):
+        """
+        Booking history totals for the current user (trips taken, upcoming
+        trips, amount spent, open refunds) without loading the booking list
+        """
+        return APIResponse.success(
+            data=booking_summary(request.user),
+            message="Booking summary retrieved successfully"
+        )
+
     @action(detail=True, methods=['get'])
     def refund_policy(self, request, pk=None):
         """Get refund policy information for a booking"""
@@ -241,6 +491,149 @@ class BookingViewSet(viewsets.ModelViewSet):
             message="Refund policy information retrieved successfully"
         )
 
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def refund_exposure(self, request):
+        """Refund exposure if every open booking were cancelled today"""
+        from .refund_policy import refund_exposure, OPEN_BOOKING_STATUSES
+
+        queryset = Booking.objects.filter(status__in=OPEN_BOOKING_STATUSES)
+        tour_id = request.query_params.get('tour')
+        if tour_id:
+            try:
+                queryset = queryset.filter(tour_id=uuid.UUID(tour_id))
+            except ValueError:
+                return APIResponse.error(
+                    message="Invalid tour id",
+                    status_code=status.HTTP_400_BAD_REQUEST
+                )
+
+        return APIResponse.success(
+            data=refund_exposure(queryset),
+            message="Refund exposure calculated successfully"
+        )
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser], url_path='travelers/age-bands')
+    def traveler_age_bands(self, request):
+        """Traveler counts by category and age band, overall and per departure"""
+        from .models import Traveler
+
+        params = TravelerQuerySerializer(data=request.query_params)
+        if not params.is_valid():
+            return APIResponse.error(
+                message="Invalid filters",
+                errors=params.errors,
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+
+        queryset = Traveler.objects.filter(**params.get_filters())
+        aggregates = travelers.age_band_aggregates()
+        departures = (
+            queryset.values('booking__tour_id', 'booking__tour__name', 'booking__travel_date')
+            .annotate(**aggregates)
+            .order_by('booking__travel_date', 'booking__tour__name')
+        )
+
+        return APIResponse.success(
+            data={
+                'bands': [
+                    {'key': key, 'label': label, 'min_age': min_age, 'max_age': max_age}
+                    for key, label, min_age, max_age in travelers.AGE_BANDS
+                ],
+                'totals': queryset.aggregate(**aggregates),
+                'departures': [
+                    {
+                        'tour': row.pop('booking__tour_id'),
+                        'tour_name': row.pop('booking__tour__name'),
+                        'travel_date': row.pop('booking__travel_date'),
+                        **row,
+                    }
+                    for row in departures
+                ],
+            },
+            message="Traveler counts retrieved successfully"
+        )
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser], url_path='travelers')
+    def traveler_list(self, request):
+        """Travelers matching the filters, e.g. ?tour=..&travel_date=..&max_age=11"""
+        from .models import Traveler
+
+        params = TravelerQuerySerializer(data=request.query_params)
+        if not params.is_valid():
+            return APIResponse.error(
+                message="Invalid filters",
+                errors=params.errors,
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+
+        rows = (
+            Traveler.objects.filter(**params.get_filters())
+            .order_by('booking__travel_date', 'booking__tour__name', 'booking_id', 'position')
+            .values(
+                'name', 'age', 'category', 'booking_id', 'booking__status',
+                'booking__tour_id', 'booking__tour__name', 'booking__travel_date',
+                'booking__contact_number',
+            )
+        )
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return APIResponse.success(data=list(rows), message="Travelers retrieved successfully")
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def manifest(self, request):
+        """
+        Stream the manifest for a departure (?tour=..&travel_date=..) or a
+        date range (?date_from=..&date_to=..) as CSV, JSON or PDF (?output=)
+        """
+        from django.http import StreamingHttpResponse
+        from . import manifest
+
+        params = ManifestQuerySerializer(data=request.query_params)
+        if not params.is_valid():
+            return APIResponse.error(
+                message="Invalid manifest filters",
+                errors=params.errors,
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+
+        filters = params.get_filters()
+        rows = manifest.manifest_rows(manifest.manifest_queryset(**filters))
+        output = params.validated_data['output']
+        if output == 'json':
+            content, content_type = manifest.stream_json(rows, filters), 'application/json'
+        elif output == 'pdf':
+            content, content_type = manifest.stream_pdf(rows), 'application/pdf'
+        else:
+            content, content_type = manifest.stream_csv(rows), 'text/csv'
+
+        dates = filters['travel_date'] or f"{filters['date_from']}_{filters['date_to']}"
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="manifest_{dates}.{output}"'
+        return response
+
+    @action(detail=True, methods=['get'])
+    def voucher(self, request, pk=None):
+        """Download the travel voucher for a confirmed booking as PDF"""
+        from apps.payments import documents
+
+        booking = self.get_object()
+        if booking.status not in documents.VOUCHER_STATUSES:
+            return APIResponse.error(
+                message="Vouchers are available for confirmed bookings only",
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            digest, path = documents.get_document('voucher', booking)
+        except documents.DocumentPending:
+            response = APIResponse.success(
+                message="Voucher is being generated, please retry shortly",
+                status_code=status.HTTP_202_ACCEPTED
+            )
+            response['Retry-After'] = '5'
+            return response
+        return documents.serve(request, digest, path, f"voucher-{booking.id}.pdf")
+
     @action(detail=True, methods=['post'])
     def add_review(self, request, pk=None):
         """Add a review for a completed booking"""
@@ -4,4 +4,8 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.core'
-    verbose_name = 'Core'
\ No newline at end of file
+    verbose_name = 'Core'
+
+    def ready(self):
+        # Registers the database query timer and the job queue collector
+        from . import jobs, metrics  # noqa: F401
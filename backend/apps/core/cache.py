@@ -0,0 +1,452 @@
+"""
+Two-tier cache for Tours & Travels backend
+A per-process LRU (L1) with a byte budget sits in front of the Django
+cache (L2: Redis in production, LocMem in development).
+
+- get_or_set() coalesces concurrent misses on a key: one thread per
+  process computes while the others wait for its result, and a short
+  lock in L2 makes other processes wait for that value instead of
+  computing it too.
+- Values carry a soft expiry. Before it, a read may refresh the value
+  early with a probability that grows as the expiry approaches and with
+  the time the value took to compute (XFetch), so hot keys are rebuilt
+  before they expire rather than all at once after. Between the soft
+  expiry and the hard expiry (``stale`` seconds later) the old value is
+  served while one background thread recomputes it.
+- Deleting or setting a key drops it from the L1 of every process
+  through an invalidation channel (LocalChannel within one process,
+  RedisChannel across processes). L1 entries also expire after
+  CACHE_L1_TIMEOUT, which bounds staleness if a message is lost.
+
+Usage::
+
+    from apps.core.cache import tiered_cache
+
+    data = tiered_cache.get_or_set('key', compute, timeout=300, stale=60)
+    tiered_cache.invalidate(['key'])  # when the transaction commits
+"""
+
+import json
+import logging
+import math
+import pickle
+import random
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import close_old_connections, transaction
+from django.utils.functional import SimpleLazyObject
+from django.utils.module_loading import import_string
+
+from . import metrics, profiling
+
+logger = logging.getLogger(__name__)
+
+_EVENTS = metrics.Counter(
+    'tiered_cache_events_total', 'Two-tier cache lookups by outcome (l1_hits, l2_hits, stale_hits, misses, ...)',
+    ['event'],
+)
+
+_LOCK_PREFIX = 'tiered-lock:'
+# How often a process waiting on another process's computation re-reads L2
+_LOCK_POLL_SECONDS = 0.05
+# Clears every L1 when published
+_ALL_KEYS = '*'
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class LRUCache:
+    """
+    Thread-safe in-process LRU bounded by entry count and pickled size
+    Values are stored pickled, so callers never share (and mutate) the
+    cached object itself.
+    """
+
+    def __init__(self, max_entries=5000, max_bytes=32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        """The value of an unexpired key, or ``default``"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            payload, expires_at = entry
+            if expires_at <= time.time():
+                self._pop(key)
+                return default
+            self._data.move_to_end(key)
+        return pickle.loads(payload)
+
+    def set(self, key, value, expires_at):
+        payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if len(payload) > self.max_bytes:
+            self.delete(key)
+            return
+        with self._lock:
+            self._pop(key)
+            self._data[key] = (payload, expires_at)
+            self.size += len(payload)
+            while len(self._data) > self.max_entries or self.size > self.max_bytes:
+                oldest = next(iter(self._data))
+                self._pop(oldest)
+
+    def delete(self, key):
+        with self._lock:
+            self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+
+    def _pop(self, key):
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[0])
+
+
+class LocalChannel:
+    """
+    Invalidation channel between caches of one process
+    Every TwoTierCache subscribed to the same instance receives the keys
+    published by the others, which is how the cross-process behaviour is
+    exercised without Redis (e.g. two caches sharing one LocalChannel).
+    """
+
+    def __init__(self):
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, origin, callback):
+        with self._lock:
+            self._subscribers.append((origin, callback))
+
+    def publish(self, origin, keys):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber, callback in subscribers:
+            if subscriber != origin:
+                callback(keys)
+
+
+class RedisChannel:
+    """
+    Invalidation channel over Redis pub/sub
+    A daemon thread per process listens for published keys. Messages sent
+    while the listener is disconnected are lost, so each (re)subscription
+    clears the local L1 of this process.
+    """
+
+    def __init__(self, url=None, channel=None):
+        import redis
+
+        self.channel = channel or _setting('CACHE_INVALIDATION_CHANNEL_NAME', 'tiered-cache:invalidate')
+        self._client = redis.Redis.from_url(
+            url or _setting('CACHE_INVALIDATION_URL', 'redis://127.0.0.1:6379/1')
+        )
+        self._subscribers = []
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def subscribe(self, origin, callback):
+        with self._lock:
+            self._subscribers.append((origin, callback))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._listen, name='tiered-cache-invalidation', daemon=True)
+                self._thread.start()
+
+    def publish(self, origin, keys):
+        try:
+            self._client.publish(self.channel, json.dumps({'origin': origin, 'keys': list(keys)}))
+        except Exception:
+            logger.exception("Failed to publish cache invalidation")
+
+    def _deliver(self, origin, keys):
+        for subscriber, callback in list(self._subscribers):
+            if subscriber != origin:
+                callback(keys)
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                self._deliver(None, [_ALL_KEYS])
+                for message in pubsub.listen():
+                    if message.get('type') != 'message':
+                        continue
+                    data = json.loads(message['data'])
+                    self._deliver(data.get('origin'), data.get('keys') or [])
+            except Exception:
+                logger.exception("Cache invalidation listener disconnected, reconnecting")
+                time.sleep(1)
+
+
+class _Flight:
+    """A computation in progress that other threads of this process wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TwoTierCache:
+    """
+    Read-through cache over an L1 LRU and the Django cache ``alias``
+    L2 entries are (value, soft expiry, compute seconds) envelopes so every
+    process sees the same expiry and refresh hints.
+    """
+
+    def __init__(self, alias='default', l1=None, channel=None, l1_timeout=None, beta=None):
+        self.alias = alias
+        self.l1 = l1 if l1 is not None else LRUCache(
+            max_entries=_setting('CACHE_L1_MAX_ENTRIES', 5000),
+            max_bytes=_setting('CACHE_L1_MAX_BYTES', 32 * 1024 * 1024),
+        )
+        self.l1_timeout = l1_timeout if l1_timeout is not None else _setting('CACHE_L1_TIMEOUT', 30)
+        self.beta = beta if beta is not None else _setting('CACHE_EARLY_REFRESH_BETA', 1.0)
+        self.origin = uuid.uuid4().hex
+        self.stats = Counter()
+        self._flights = {}
+        self._flights_lock = threading.Lock()
+        self._refreshing = set()
+        self.channel = channel if channel is not None else _default_channel()
+        self.channel.subscribe(self.origin, self._on_invalidate)
+
+    @property
+    def l2(self):
+        return caches[self.alias]
+
+    # Reads
+
+    def get(self, key, default=None):
+        envelope = self._read(key)
+        if envelope is None:
+            self._count('misses')
+            return default
+        return envelope[0]
+
+    def get_many(self, keys):
+        """{key: value} for the keys found in either tier"""
+        found = {}
+        missing = []
+        for key in keys:
+            envelope = self.l1.get(key)
+            if envelope is None:
+                missing.append(key)
+            else:
+                self._count('l1_hits')
+                found[key] = envelope[0]
+        if missing:
+            from_l2 = self.l2.get_many(missing)
+            for key, envelope in from_l2.items():
+                self._fill_l1(key, envelope)
+                found[key] = envelope[0]
+            self._count('l2_hits', len(from_l2))
+            self._count('misses', len(missing) - len(from_l2))
+        return found
+
+    def get_or_set(self, key, compute, timeout=300, stale=0):
+        """
+        The cached value of ``key``, computing it with ``compute()`` on a miss
+        ``timeout`` is the soft expiry in seconds; for ``stale`` seconds after
+        it the previous value is served while it is recomputed in the
+        background.
+        """
+        envelope = self._read(key)
+        if envelope is not None:
+            value, expires_at, delta = envelope
+            now = time.time()
+            if now >= expires_at:
+                self._count('stale_hits')
+                self._refresh_in_background(key, compute, timeout, stale)
+                return value
+            if self._refresh_early(expires_at, delta, now):
+                self._count('early_refreshes')
+                self._refresh_in_background(key, compute, timeout, stale)
+            return value
+
+        self._count('misses')
+        return self._single_flight(key, compute, timeout, stale)
+
+    # Writes
+
+    def set(self, key, value, timeout=300, stale=0, delta=0.0):
+        envelope = (value, time.time() + timeout, delta)
+        self.l2.set(key, envelope, timeout=timeout + stale)
+        self._fill_l1(key, envelope)
+        self.channel.publish(self.origin, [key])
+
+    def add(self, key, value, timeout=300):
+        """Store ``value`` unless ``key`` is already in L2; returns whether it was stored"""
+        return self.l2.add(key, (value, time.time() + timeout, 0.0), timeout=timeout)
+
+    def set_many(self, mapping, timeout=300, stale=0):
+        expires_at = time.time() + timeout
+        envelopes = {key: (value, expires_at, 0.0) for key, value in mapping.items()}
+        self.l2.set_many(envelopes, timeout=timeout + stale)
+        for key, envelope in envelopes.items():
+            self._fill_l1(key, envelope)
+        self.channel.publish(self.origin, list(envelopes))
+
+    def delete_many(self, keys):
+        keys = list(keys)
+        if not keys:
+            return
+        self.l2.delete_many(keys)
+        for key in keys:
+            self.l1.delete(key)
+        self.channel.publish(self.origin, keys)
+
+    def delete(self, key):
+        self.delete_many([key])
+
+    def invalidate(self, keys):
+        """Delete ``keys`` once the current transaction commits"""
+        keys = list(keys)
+        if keys:
+            transaction.on_commit(lambda: self.delete_many(keys))
+
+    def clear_local(self):
+        self.l1.clear()
+
+    # Internals
+
+    def _read(self, key):
+        envelope = self.l1.get(key)
+        if envelope is not None:
+            self._count('l1_hits')
+            return envelope
+        envelope = self.l2.get(key)
+        if envelope is not None:
+            self._count('l2_hits')
+            self._fill_l1(key, envelope)
+        return envelope
+
+    def _fill_l1(self, key, envelope):
+        # Stale values stay in L1 only briefly, so the background refresh is picked up
+        expires_at = min(time.time() + self.l1_timeout, max(envelope[1], time.time() + 1))
+        self.l1.set(key, envelope, expires_at)
+
+    def _refresh_early(self, expires_at, delta, now):
+        if not self.beta or not delta:
+            return False
+        return now - delta * self.beta * math.log(random.random() or 1e-12) >= expires_at
+
+    def _compute(self, key, compute, timeout, stale):
+        started = time.monotonic()
+        value = compute()
+        self.set(key, value, timeout=timeout, stale=stale, delta=time.monotonic() - started)
+        return value
+
+    def _single_flight(self, key, compute, timeout, stale):
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            self._count('coalesced')
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = self._compute_once(key, compute, timeout, stale)
+            return flight.value
+        except Exception as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._flights_lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def _compute_once(self, key, compute, timeout, stale):
+        """Compute unless another process holds the lock and publishes the value in time"""
+        lock_key = _LOCK_PREFIX + key
+        lock_timeout = _setting('CACHE_LOCK_TIMEOUT', 10)
+        if self.l2.add(lock_key, self.origin, timeout=lock_timeout):
+            try:
+                return self._compute(key, compute, timeout, stale)
+            finally:
+                self.l2.delete(lock_key)
+
+        deadline = time.monotonic() + lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(_LOCK_POLL_SECONDS)
+            envelope = self.l2.get(key)
+            if envelope is not None:
+                self._count('coalesced')
+                self._fill_l1(key, envelope)
+                return envelope[0]
+            if self.l2.get(lock_key) is None:
+                break
+        return self._compute(key, compute, timeout, stale)
+
+    def _refresh_in_background(self, key, compute, timeout, stale):
+        with self._flights_lock:
+            if key in self._refreshing or key in self._flights:
+                return
+            self._refreshing.add(key)
+        lock_key = _LOCK_PREFIX + key
+        if not self.l2.add(lock_key, self.origin, timeout=_setting('CACHE_LOCK_TIMEOUT', 10)):
+            # Another process is already refreshing it
+            with self._flights_lock:
+                self._refreshing.discard(key)
+            return
+
+        def refresh():
+            try:
+                self._compute(key, compute, timeout, stale)
+            except Exception:
+                logger.exception(f"Background refresh of cache key {key} failed")
+            finally:
+                self.l2.delete(lock_key)
+                with self._flights_lock:
+                    self._refreshing.discard(key)
+                close_old_connections()
+
+        threading.Thread(target=refresh, name=f'cache-refresh:{key}', daemon=True).start()
+
+    def _on_invalidate(self, keys):
+        if _ALL_KEYS in keys:
+            self.l1.clear()
+            return
+        for key in keys:
+            self.l1.delete(key)
+
+    def _count(self, name, count=1):
+        self.stats[name] += count
+        _EVENTS.labels(name).inc(count)
+        profiling.record_cache(name, count)
+
+    def hit_ratio(self):
+        hits = self.stats['l1_hits'] + self.stats['l2_hits']
+        total = hits + self.stats['misses']
+        return round(hits / total, 4) if total else None
+
+
+def _default_channel():
+    return import_string(_setting('CACHE_INVALIDATION_CHANNEL', 'apps.core.cache.LocalChannel'))()
+
+
+# The process-wide cache, created on first use so settings are loaded
+tiered_cache = SimpleLazyObject(TwoTierCache)
@@ -0,0 +1,48 @@
+"""
+Pruning of content-addressed file caches
+Rendered documents and brochures are stored under the digest of their
+content, so every change writes a new file and the old one is never read
+again. prune() removes files that have not been written for a while;
+anything still current is rendered again on its next request.
+"""
+
+import logging
+import os
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+def prune(root, max_age_days, keep=()):
+    """
+    Delete files under ``root`` last modified more than ``max_age_days``
+    ago, except the paths in ``keep``, and the directories this empties.
+    Returns the number of files removed.
+    """
+    root = Path(root)
+    if not root.is_dir():
+        return 0
+    cutoff = time.time() - max_age_days * 86400
+    keep = {str(path) for path in keep}
+    removed = 0
+    for directory, _, filenames in os.walk(root, topdown=False):
+        for filename in filenames:
+            path = os.path.join(directory, filename)
+            if path in keep:
+                continue
+            try:
+                if os.stat(path).st_mtime < cutoff:
+                    os.unlink(path)
+                    removed += 1
+            except FileNotFoundError:
+                # Replaced or removed concurrently
+                continue
+        if directory != str(root):
+            try:
+                os.rmdir(directory)
+            except OSError:
+                # Not empty
+                pass
+    logger.info(f"Pruned {removed} cached files from {root}")
+    return removed
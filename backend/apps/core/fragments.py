@@ -0,0 +1,182 @@
+"""
+Per-object fragment cache for ModelSerializer output
+A serializer using FragmentCacheMixin stores each object's representation
+under a key made of the serializer and its schema version, the model, the
+pk and ``updated_at`` (plus the ``updated_at`` of the related objects in
+``fragment_related``). A changed row gets a new key, so fragments are
+never invalidated, they are simply no longer read and expire.
+
+Rows that render data from other tables must be touched when that data
+changes: ``touch()`` bumps the parent's updated_at in the same transaction
+as the child's write (e.g. a Review or TourPricing touches its Tour).
+Fields in ``fragment_volatile`` change too often for that (booking counts,
+payments) and are rendered on every call.
+
+With ``list_serializer_class = FragmentListSerializer`` a list is read
+with one get_many, only the misses are serialized, and they are written
+back with one set_many.
+"""
+
+import hashlib
+from collections import Counter
+
+from django.conf import settings
+from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.fields import SkipField
+from rest_framework.relations import PKOnlyObject
+
+from . import metrics, sideload
+from .cache import tiered_cache
+
+_KEY = 'fragment:{schema}:{pk}:{version}'
+
+_stats = Counter()
+_REQUESTS = metrics.Counter('fragment_cache_requests_total', 'Serializer fragment lookups by result', ['result'])
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _enabled():
+    return _setting('FRAGMENT_CACHE_ENABLED', True)
+
+
+class FragmentCacheMixin:
+    """
+    Caches ``to_representation`` per object; see the module docstring.
+    Bump ``fragment_version`` when the output changes for unchanged rows.
+    """
+    fragment_version = 1
+    # Related objects (dotted paths) whose updated_at is part of the key
+    fragment_related = ()
+    # Fields rendered on every call instead of being cached
+    fragment_volatile = ()
+
+    _fragments = None
+    _fragment_misses = None
+
+    def fragment_variant(self):
+        """Request-dependent part of the key: URLs embed the host, ?include= swaps objects for ids"""
+        request = self.context.get('request')
+        if request is None:
+            return ''
+        variant = f'{request.scheme}://{request.get_host()}'
+        include = sideload.requested(request)
+        if include:
+            variant += ';include=' + ','.join(sorted(include))
+        return variant
+
+    def _fragment_schema(self):
+        schema = getattr(self, '_schema', None)
+        if schema is None:
+            cls = type(self)
+            fields = ','.join(field.field_name for field in self._readable_fields)
+            digest = hashlib.md5(
+                f'{cls.__module__}.{cls.__qualname__}:{fields}:{self.fragment_variant()}'.encode()
+            ).hexdigest()[:16]
+            schema = self._schema = f'{self.Meta.model._meta.label_lower}:v{self.fragment_version}:{digest}'
+        return schema
+
+    def fragment_key(self, instance):
+        """Cache key of ``instance``'s fragment, or None when it cannot be cached"""
+        updated_at = getattr(instance, 'updated_at', None)
+        if instance.pk is None or updated_at is None:
+            return None
+        stamps = [updated_at.isoformat()]
+        for path in self.fragment_related:
+            related = instance
+            for attr in path.split('.'):
+                related = getattr(related, attr, None) if related is not None else None
+            stamps.append(related.updated_at.isoformat() if related is not None else '-')
+        version = hashlib.md5('|'.join(stamps).encode()).hexdigest()[:16]
+        return _KEY.format(schema=self._fragment_schema(), pk=instance.pk, version=version)
+
+    def _render(self, instance, fields, data):
+        # Same field loop as Serializer.to_representation
+        for field in fields:
+            try:
+                attribute = field.get_attribute(instance)
+            except SkipField:
+                continue
+            check_for_none = attribute.pk if isinstance(attribute, PKOnlyObject) else attribute
+            data[field.field_name] = None if check_for_none is None else field.to_representation(attribute)
+        return data
+
+    def to_representation(self, instance):
+        key = self.fragment_key(instance) if _enabled() else None
+        if key is None:
+            return super().to_representation(instance)
+
+        fields = list(self._readable_fields)
+        if self._fragments is not None:
+            fragment = self._fragments.get(key)
+        else:
+            fragment = tiered_cache.get(key)
+        if fragment is None:
+            _stats['misses'] += 1
+            _REQUESTS.labels('misses').inc()
+            cached_fields = [field for field in fields if field.field_name not in self.fragment_volatile]
+            fragment = self._render(instance, cached_fields, {})
+            if self._fragment_misses is not None:
+                self._fragment_misses[key] = fragment
+            else:
+                tiered_cache.set(key, fragment, timeout=_setting('FRAGMENT_CACHE_TIMEOUT', 3600))
+        else:
+            _stats['hits'] += 1
+            _REQUESTS.labels('hits').inc()
+
+        volatile = self._render(
+            instance, [field for field in fields if field.field_name in self.fragment_volatile], {}
+        )
+        # Keep the declared field order
+        return {
+            field.field_name: volatile[field.field_name] if field.field_name in volatile
+            else fragment[field.field_name]
+            for field in fields
+            if field.field_name in volatile or field.field_name in fragment
+        }
+
+
+class FragmentListSerializer(serializers.ListSerializer):
+    """Reads the fragments of a whole list with one get_many and writes the misses with one set_many"""
+
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        child = self.child
+        if not _enabled() or not isinstance(child, FragmentCacheMixin):
+            return [child.to_representation(item) for item in items]
+
+        keys = [key for key in (child.fragment_key(item) for item in items) if key]
+        child._fragments = tiered_cache.get_many(keys) if keys else {}
+        child._fragment_misses = {}
+        try:
+            result = [child.to_representation(item) for item in items]
+            misses = child._fragment_misses
+        finally:
+            child._fragments = None
+            child._fragment_misses = None
+        if misses:
+            tiered_cache.set_many(misses, timeout=_setting('FRAGMENT_CACHE_TIMEOUT', 3600))
+        return result
+
+
+def touch(sender, parents, dispatch_uid):
+    """
+    Keep parents' fragments current: whenever a ``sender`` row is saved or
+    deleted, set updated_at on the rows of ``parents(instance)`` (a queryset)
+    """
+    def handler(sender, instance, **kwargs):
+        parents(instance).update(updated_at=timezone.now())
+
+    post_save.connect(handler, sender=sender, weak=False, dispatch_uid=dispatch_uid)
+    post_delete.connect(handler, sender=sender, weak=False, dispatch_uid=dispatch_uid)
+
+
+def stats():
+    """Fragment hits and misses in this process"""
+    looked_up = _stats['hits'] + _stats['misses']
+    return dict(_stats, hit_ratio=round(_stats['hits'] / looked_up, 4) if looked_up else None)
@@ -0,0 +1,170 @@
+"""
+Idempotency-Key support for POST endpoints
+Wrap a viewset ``create`` with @idempotent: the first request with a given
+key executes and its response is stored; retries with the same key are
+answered from storage without running the view again. Keys are scoped to
+the authenticated user; anonymous requests ignore the header, since there
+is no caller to keep one visitor's stored response from another.
+
+A claim whose request died (worker killed or timed out) is released after
+IDEMPOTENCY_CLAIM_TIMEOUT_SECONDS: the next retry deletes it and runs the
+view again.
+"""
+
+import functools
+import hashlib
+import json
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyRecord
+from .response import APIResponse
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _scope_for(request):
+    """Keys are private to the user that sent them; None for anonymous requests"""
+    if request.user and request.user.is_authenticated:
+        return f"user:{request.user.pk}"
+    return None
+
+
+def _fingerprint(request):
+    """Hash of the method, path and parsed body, to detect key reuse with another payload"""
+    data = request.data
+    if hasattr(data, 'lists'):
+        # QueryDict from form or multipart bodies
+        data = dict(data.lists())
+    digest = hashlib.sha256()
+    digest.update(request.method.encode())
+    digest.update(request.get_full_path().encode())
+    digest.update(json.dumps(data, sort_keys=True, separators=(',', ':'), default=str).encode())
+    return digest.hexdigest()
+
+
+def _claim_cutoff():
+    """Claims created before this are abandoned and may be taken over"""
+    return timezone.now() - timedelta(seconds=_setting('IDEMPOTENCY_CLAIM_TIMEOUT_SECONDS', 120))
+
+
+def _replay(record):
+    response = Response(record.response_body, status=record.response_status)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _claim(scope, key, fingerprint):
+    """Insert the IN_PROGRESS row; returns (record, created)"""
+    expires_at = timezone.now() + timedelta(hours=_setting('IDEMPOTENCY_KEY_TTL_HOURS', 24))
+    try:
+        with transaction.atomic():
+            return IdempotencyRecord.objects.create(
+                scope=scope,
+                key=key,
+                request_fingerprint=fingerprint,
+                expires_at=expires_at,
+            ), True
+    except IntegrityError:
+        return IdempotencyRecord.objects.filter(scope=scope, key=key).first(), False
+
+
+def idempotent(view_method):
+    """
+    Decorator for viewset actions that create resources.
+
+    Requests without the Idempotency-Key header, or from anonymous callers,
+    run normally. With the header, concurrent duplicates wait (up to
+    IDEMPOTENCY_WAIT_SECONDS) for the first request to finish and then
+    replay its response; a claim older than IDEMPOTENCY_CLAIM_TIMEOUT_SECONDS
+    is taken over. Responses with status >= 500 are not stored, so the
+    client can retry.
+    """
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        scope = _scope_for(request)
+        if not key or scope is None:
+            return view_method(self, request, *args, **kwargs)
+
+        if len(key) > MAX_KEY_LENGTH:
+            return APIResponse.error(
+                message=f"{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters",
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+
+        fingerprint = _fingerprint(request)
+        deadline = time.monotonic() + _setting('IDEMPOTENCY_WAIT_SECONDS', 10)
+
+        while True:
+            record, created = _claim(scope, key, fingerprint)
+            if created:
+                break
+            if record is None:
+                # Row was deleted (failed or expired) between insert and read
+                continue
+            if record.expires_at <= timezone.now():
+                IdempotencyRecord.objects.filter(pk=record.pk, expires_at__lte=timezone.now()).delete()
+                continue
+            if record.request_fingerprint != fingerprint:
+                return APIResponse.error(
+                    message=f"{IDEMPOTENCY_HEADER} was already used for a different request",
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY
+                )
+            if record.status == 'COMPLETED':
+                logger.info(f"Replaying stored response for idempotency key {scope}:{key}")
+                return _replay(record)
+            cutoff = _claim_cutoff()
+            if record.created_at <= cutoff:
+                logger.warning(f"Taking over abandoned claim for idempotency key {scope}:{key}")
+                IdempotencyRecord.objects.filter(
+                    pk=record.pk, status='IN_PROGRESS', created_at__lte=cutoff
+                ).delete()
+                continue
+            if time.monotonic() >= deadline:
+                return APIResponse.error(
+                    message="A request with this Idempotency-Key is still being processed",
+                    status_code=status.HTTP_409_CONFLICT
+                )
+            time.sleep(0.05)
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except Exception:
+            record.delete()
+            raise
+
+        if response.status_code >= 500 or not hasattr(response, 'data'):
+            record.delete()
+            return response
+
+        record.status = 'COMPLETED'
+        record.response_status = response.status_code
+        record.response_body = response.data
+        record.save(update_fields=['status', 'response_status', 'response_body', 'updated_at'])
+        return response
+
+    return wrapper
+
+
+def purge_expired():
+    """Delete stored responses past their TTL and abandoned claims; returns the number removed"""
+    deleted, _ = IdempotencyRecord.objects.filter(
+        Q(expires_at__lte=timezone.now()) | Q(status='IN_PROGRESS', created_at__lte=_claim_cutoff())
+    ).delete()
+    return deleted
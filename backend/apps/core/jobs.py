@@ -0,0 +1,153 @@
+"""
+Background job queue for Tours & Travels backend
+Jobs are rows in core_backgroundjob, written in the caller's transaction
+so they only become visible when the surrounding work commits
+"""
+
+import logging
+import time
+import traceback
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import metrics
+from .models import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+_RUNS = metrics.Counter('background_jobs_run_total', 'Background job runs by task and outcome', ['task', 'outcome'])
+_DURATION = metrics.Histogram(
+    'background_job_duration_seconds', 'Background job run duration by task', ['task'],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300),
+)
+_QUEUED = metrics.Gauge(
+    'background_jobs', 'Background jobs waiting to run (due, scheduled) or running', ['state']
+)
+_LAG = metrics.Gauge(
+    'background_job_lag_seconds', 'How long the oldest due job has been waiting to run'
+)
+
+
+def enqueue(task, payload=None, run_after=None, max_attempts=5):
+    """Enqueue a single job; ``task`` is the dotted path of a callable"""
+    return BackgroundJob.objects.create(
+        task=task,
+        payload=payload or {},
+        run_after=run_after or timezone.now(),
+        max_attempts=max_attempts,
+    )
+
+
+def enqueue_many(task, payloads, run_after=None, max_attempts=5, batch_size=500):
+    """Enqueue one job per payload with a single bulk insert"""
+    now = timezone.now()
+    jobs = [
+        BackgroundJob(
+            task=task,
+            payload=payload,
+            run_after=run_after or now,
+            max_attempts=max_attempts,
+            created_at=now,
+            updated_at=now,
+        )
+        for payload in payloads
+    ]
+    return BackgroundJob.objects.bulk_create(jobs, batch_size=batch_size)
+
+
+def claim_jobs(limit=50, task_prefix=None):
+    """
+    Claim up to ``limit`` due jobs for this worker
+    Rows are locked with SKIP LOCKED so several workers can poll concurrently
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        queryset = BackgroundJob.objects.select_for_update(skip_locked=True).filter(
+            status='PENDING',
+            run_after__lte=now,
+        )
+        if task_prefix:
+            queryset = queryset.filter(task__startswith=task_prefix)
+        jobs = list(queryset.order_by('run_after')[:limit])
+        if jobs:
+            BackgroundJob.objects.filter(id__in=[job.id for job in jobs]).update(
+                status='RUNNING',
+                locked_at=now,
+                attempts=F('attempts') + 1,
+                updated_at=now,
+            )
+            for job in jobs:
+                job.status = 'RUNNING'
+                job.attempts += 1
+    return jobs
+
+
+def run_job(job):
+    """Execute a claimed job and record its outcome; returns True on success"""
+    now = timezone.now()
+    started = time.perf_counter()
+    try:
+        handler = import_string(job.task)
+        handler(job.payload)
+    except Exception as exc:
+        retry = job.attempts < job.max_attempts
+        _DURATION.labels(job.task).observe(time.perf_counter() - started)
+        _RUNS.labels(job.task, 'retried' if retry else 'failed').inc()
+        BackgroundJob.objects.filter(id=job.id).update(
+            status='PENDING' if retry else 'FAILED',
+            # Exponential backoff: 30s, 60s, 120s, ...
+            run_after=now + timedelta(seconds=30 * (2 ** (job.attempts - 1))),
+            last_error=''.join(traceback.format_exception_only(type(exc), exc)).strip(),
+            locked_at=None,
+            finished_at=None if retry else now,
+            updated_at=now,
+        )
+        logger.error(f"Job {job.id} ({job.task}) failed on attempt {job.attempts}: {exc}")
+        return False
+
+    _DURATION.labels(job.task).observe(time.perf_counter() - started)
+    _RUNS.labels(job.task, 'succeeded').inc()
+    BackgroundJob.objects.filter(id=job.id).update(
+        status='DONE',
+        locked_at=None,
+        finished_at=now,
+        updated_at=now,
+    )
+    return True
+
+
+def run_pending(limit=50, task_prefix=None):
+    """Claim and run one batch of due jobs; returns (succeeded, failed)"""
+    succeeded = failed = 0
+    for job in claim_jobs(limit=limit, task_prefix=task_prefix):
+        if run_job(job):
+            succeeded += 1
+        else:
+            failed += 1
+    return succeeded, failed
+
+
+def requeue_stale(older_than=timedelta(minutes=15)):
+    """Return jobs stuck in RUNNING (e.g. a worker crashed) to the queue"""
+    cutoff = timezone.now() - older_than
+    return BackgroundJob.objects.filter(status='RUNNING', locked_at__lt=cutoff).update(
+        status='PENDING',
+        locked_at=None,
+        updated_at=timezone.now(),
+    )
+
+
+@metrics.collector
+def _queue_metrics():
+    """Queue depth and lag, read from the table on each scrape"""
+    now = timezone.now()
+    pending = BackgroundJob.objects.filter(status='PENDING')
+    due = pending.filter(run_after__lte=now).aggregate(count=Count('id'), oldest=Min('run_after'))
+    _QUEUED.labels('due').set(due['count'])
+    _QUEUED.labels('scheduled').set(pending.filter(run_after__gt=now).count())
+    _QUEUED.labels('running').set(BackgroundJob.objects.filter(status='RUNNING').count())
+    _LAG.set((now - due['oldest']).total_seconds() if due['oldest'] else 0)
@@ -0,0 +1,102 @@
+"""
+Management command to benchmark the API renderers and parsers on tour list
+and booking list payloads built from the database
+"""
+
+import gzip
+import io
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from apps.bookings.models import Booking
+from apps.bookings.serializers import BookingSerializer
+from apps.core.parsers import MsgpackParser, OrjsonParser
+from apps.core.renderers import MsgpackRenderer, OrjsonRenderer
+from apps.tours.models import Tour
+from apps.tours.serializers import TourListSerializer
+
+
+def _envelope(rows):
+    """The APIResponse.paginated shape the list endpoints return"""
+    return {
+        'success': True,
+        'message': 'Success',
+        'timestamp': timezone.now(),
+        'data': rows,
+        'pagination': {'count': len(rows), 'next': None, 'previous': None},
+    }
+
+
+def _repeat(rows, count):
+    """``count`` rows, cycling through ``rows`` when the database has fewer"""
+    return [rows[i % len(rows)] for i in range(count)] if rows else []
+
+
+def _time(func, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+class Command(BaseCommand):
+    help = 'Compare size and render/parse time of DRF JSON, orjson and MessagePack on list payloads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tours', type=int, default=100, help='Rows in the tour list payload')
+        parser.add_argument('--bookings', type=int, default=100, help='Rows in the booking list payload')
+        parser.add_argument('--repeat', type=int, default=50, help='Timed runs per case (best is reported)')
+
+    def handle(self, *args, **options):
+        request = APIRequestFactory().get('/api/v1/')
+        context = {'request': request}
+        tours = Tour.objects.select_related('primary_destination').prefetch_related(
+            'destinations', 'seasonal_pricings__season'
+        )[:options['tours']]
+        bookings = Booking.objects.select_related('tour', 'user', 'package')[:options['bookings']]
+        payloads = {
+            'tour list': _repeat(TourListSerializer(tours, many=True, context=context).data, options['tours']),
+            'booking list': _repeat(BookingSerializer(bookings, many=True, context=context).data, options['bookings']),
+        }
+        if not any(payloads.values()):
+            raise CommandError('No tours or bookings to build payloads from; run seed_db first')
+
+        repeat = options['repeat']
+        stock_renderer, stock_parser = JSONRenderer(), JSONParser()
+        formats = [
+            ('DRF json', stock_renderer, stock_parser),
+            ('orjson', OrjsonRenderer(), OrjsonParser()),
+            ('msgpack', MsgpackRenderer(), MsgpackParser()),
+        ]
+        for name, rows in payloads.items():
+            if not rows:
+                continue
+            data = _envelope(rows)
+            reference = stock_parser.parse(io.BytesIO(stock_renderer.render(data)))
+            self.stdout.write(f'{name}: {len(rows)} rows')
+            self.stdout.write(f'  {"format":<10}{"bytes":>10}{"gzip":>10}{"render ms":>11}{"parse ms":>10}')
+            baseline = None
+            for label, renderer, parser in formats:
+                render_seconds, body = _time(lambda: renderer.render(data), repeat)
+                parse_seconds, parsed = _time(lambda: parser.parse(io.BytesIO(body)), repeat)
+                baseline = baseline or (len(body), render_seconds, parse_seconds)
+                self.stdout.write(
+                    f'  {label:<10}{len(body):>10,}{len(gzip.compress(body)):>10,}'
+                    f'{render_seconds * 1000:>11.2f}{parse_seconds * 1000:>10.2f}'
+                    f'   size {len(body) / baseline[0]:.0%}, render {baseline[1] / render_seconds:.1f}x,'
+                    f' parse {baseline[2] / parse_seconds:.1f}x'
+                )
+                if parsed != reference:
+                    self.stdout.write(self.style.ERROR(f'  {label} decodes to different data than DRF json'))
+            if OrjsonRenderer().render(data) == stock_renderer.render(data):
+                self.stdout.write(self.style.SUCCESS('  orjson bytes identical to DRF'))
+            else:
+                self.stdout.write(self.style.ERROR('  orjson bytes differ from DRF'))
@@ -0,0 +1,15 @@
+"""
+Management command to delete expired and abandoned Idempotency-Key records
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.core.idempotency import purge_expired
+
+
+class Command(BaseCommand):
+    help = 'Delete stored Idempotency-Key responses past their TTL and abandoned in-progress claims'
+
+    def handle(self, *args, **options):
+        deleted = purge_expired()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired or abandoned idempotency records'))
@@ -0,0 +1,63 @@
+"""
+Management command to run queued background jobs
+"""
+
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from apps.core.jobs import run_pending, requeue_stale
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (notifications, document rendering, ...)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Process the jobs that are due now and exit',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Number of jobs claimed per poll',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=2.0,
+            help='Seconds to wait when the queue is empty',
+        )
+        parser.add_argument(
+            '--task-prefix',
+            type=str,
+            default=None,
+            help='Only run jobs whose task path starts with this prefix',
+        )
+
+    def handle(self, *args, **options):
+        requeued = requeue_stale(older_than=timedelta(minutes=15))
+        if requeued:
+            self.stdout.write(self.style.WARNING(f'Requeued {requeued} stale jobs'))
+
+        total_ok = total_failed = 0
+        while True:
+            succeeded, failed = run_pending(
+                limit=options['batch_size'],
+                task_prefix=options['task_prefix'],
+            )
+            total_ok += succeeded
+            total_failed += failed
+
+            if succeeded or failed:
+                continue
+            if options['once']:
+                break
+            time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Jobs finished: {total_ok} succeeded, {total_failed} failed'
+        ))
@@ -0,0 +1,437 @@
+"""
+Prometheus metrics
+Counters and histograms kept in process memory and served in the
+Prometheus text format at /metrics:
+
+- http_requests_total, http_request_duration_seconds: per view (the
+  viewset or view class), action and status code (MetricsMiddleware)
+- db_query_duration_seconds: every query on every connection
+- tiered_cache_events_total, query_cache_requests_total,
+  fragment_cache_requests_total: cache hit rates
+- background_jobs_*: queue depth and lag (read on each scrape), job runs
+  and durations
+- bookings_created_total, bookings_confirmed_total,
+  payments_created_total, payment_webhook_events_total,
+  payment_status_changes_total: throughput
+- pricing_duration_seconds: pricing engine calls
+
+Modules define their metrics at import time::
+
+    from apps.core import metrics
+
+    PRICING_DURATION = metrics.Histogram(
+        'pricing_duration_seconds', 'Pricing engine call duration', ['operation']
+    )
+
+    with PRICING_DURATION.labels('quote').time():
+        ...
+
+Gauges hold values read when /metrics is scraped: functions registered
+with @collector run first and set them.
+
+With several worker processes, set METRICS_MULTIPROCESS_DIR to a
+directory shared by them and emptied when the server starts. Each process
+writes its counters and histograms to its own file there, at most
+METRICS_FLUSH_INTERVAL seconds after they change and when it exits, and
+/metrics adds up the files of all processes, those that have exited
+included, so counters never go backwards. Without it each process
+reports only its own counts.
+
+/metrics requires ``Authorization: Bearer <METRICS_AUTH_TOKEN>``. Without
+a token configured it is only served with DEBUG on, and is a 404
+otherwise.
+"""
+
+import atexit
+import json
+import logging
+import math
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+_METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+# Metrics by name, in registration order
+_metrics = {}
+_collectors = []
+# Guards the values of every metric
+_lock = threading.Lock()
+# Guards the process file and the pending flush
+_flush_lock = threading.Lock()
+_process = {'path': None, 'timer': None}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _directory():
+    return _setting('METRICS_MULTIPROCESS_DIR', '')
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        if name in _metrics:
+            raise ValueError(f"Metric {name} is already registered")
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # Label values -> value
+        self._values = {}
+        self._children = {}
+        _metrics[name] = self
+
+    def labels(self, *values):
+        """The series with these label values, in ``labelnames`` order"""
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {values}")
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children.setdefault(key, self._child_class(self, key))
+        return child
+
+    def _copy(self, value):
+        return value
+
+
+class _CounterChild:
+    __slots__ = ('_metric', '_key')
+
+    def __init__(self, metric, key):
+        self._metric = metric
+        self._key = key
+
+    def inc(self, amount=1):
+        values = self._metric._values
+        with _lock:
+            values[self._key] = values.get(self._key, 0) + amount
+        _changed()
+
+
+class Counter(_Metric):
+    """A total that only goes up; name it ``..._total``"""
+    type = 'counter'
+    _child_class = _CounterChild
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+
+class _GaugeChild:
+    __slots__ = ('_metric', '_key')
+
+    def __init__(self, metric, key):
+        self._metric = metric
+        self._key = key
+
+    def set(self, value):
+        with _lock:
+            self._metric._values[self._key] = value
+
+
+class Gauge(_Metric):
+    """A current value, set by a @collector on each scrape"""
+    type = 'gauge'
+    _child_class = _GaugeChild
+
+    def set(self, value):
+        self.labels().set(value)
+
+    def clear(self):
+        """Drop every series, e.g. before a collector sets the ones that exist now"""
+        with _lock:
+            self._values.clear()
+
+
+class _HistogramChild:
+    __slots__ = ('_metric', '_key')
+
+    def __init__(self, metric, key):
+        self._metric = metric
+        self._key = key
+
+    def observe(self, value):
+        metric = self._metric
+        with _lock:
+            # Per-bucket counts (the last one is +Inf), then the sum
+            counts = metric._values.get(self._key)
+            if counts is None:
+                counts = metric._values[self._key] = [0] * (len(metric.buckets) + 2)
+            counts[bisect_left(metric.buckets, value)] += 1
+            counts[-1] += value
+        _changed()
+
+    @contextmanager
+    def time(self):
+        """Observe the duration of a block or, as a decorator, of each call"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+
+class Histogram(_Metric):
+    """Observations counted into buckets by upper bound; name it ``..._seconds`` for durations"""
+    type = 'histogram'
+    _child_class = _HistogramChild
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def _copy(self, value):
+        return list(value)
+
+
+def collector(func):
+    """Run ``func`` before each scrape, to set gauges"""
+    _collectors.append(func)
+    return func
+
+
+# Multi-process collection
+
+def _changed():
+    if _process['timer'] is None and _directory():
+        with _flush_lock:
+            if _process['timer'] is None:
+                timer = threading.Timer(_setting('METRICS_FLUSH_INTERVAL', 1), flush)
+                timer.daemon = True
+                _process['timer'] = timer
+                timer.start()
+
+
+def _snapshot(types):
+    """The metrics of these types in this process, as written to the process file"""
+    with _lock:
+        return {
+            name: {
+                'type': metric.type,
+                'help': metric.documentation,
+                'labelnames': list(metric.labelnames),
+                'buckets': list(getattr(metric, 'buckets', ())),
+                'samples': [[list(key), metric._copy(value)] for key, value in metric._values.items()],
+            }
+            for name, metric in _metrics.items()
+            if metric.type in types
+        }
+
+
+def flush():
+    """Write this process's counters and histograms to its file in METRICS_MULTIPROCESS_DIR"""
+    directory = _directory()
+    if not directory:
+        return
+    with _flush_lock:
+        _process['timer'] = None
+        snapshot = _snapshot(('counter', 'histogram'))
+        if _process['path'] is None:
+            os.makedirs(directory, exist_ok=True)
+            _process['path'] = os.path.join(directory, f'{os.getpid()}-{uuid.uuid4().hex[:8]}.json')
+        temporary = f"{_process['path']}.tmp"
+        with open(temporary, 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(temporary, _process['path'])
+
+
+def _reset_after_fork():
+    """A forked worker starts from zero with its own file; the parent's counts stay in the parent's"""
+    global _lock, _flush_lock
+    _lock = threading.Lock()
+    _flush_lock = threading.Lock()
+    _process.update(path=None, timer=None)
+    for metric in _metrics.values():
+        metric._values.clear()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+atexit.register(flush)
+
+
+def _add(total, value):
+    if total is None:
+        return value
+    if isinstance(total, list):
+        return [a + b for a, b in zip(total, value)]
+    return total + value
+
+
+def _merge(families, snapshot):
+    for name, family in snapshot.items():
+        merged = families.setdefault(name, {**family, 'samples': {}})
+        for labels, value in family['samples']:
+            key = tuple(labels)
+            merged['samples'][key] = _add(merged['samples'].get(key), value)
+
+
+def _families():
+    """Every metric with its samples, those of all processes in multi-process mode"""
+    for func in _collectors:
+        try:
+            func()
+        except Exception:
+            logger.exception(f"Metrics collector {func.__qualname__} failed")
+
+    families = {}
+    directory = _directory()
+    if directory:
+        flush()
+        for filename in sorted(os.listdir(directory)):
+            if not filename.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(directory, filename)) as f:
+                    _merge(families, json.load(f))
+            except (OSError, ValueError) as exc:
+                logger.warning(f"Skipping metrics file {filename}: {exc}")
+        _merge(families, _snapshot(('gauge',)))
+    else:
+        _merge(families, _snapshot(('counter', 'gauge', 'histogram')))
+    order = {name: index for index, name in enumerate(_metrics)}
+    return sorted(families.items(), key=lambda item: (order.get(item[0], len(order)), item[0]))
+
+
+# Text format
+
+def _format(value):
+    if isinstance(value, float):
+        if math.isinf(value):
+            return '+Inf' if value > 0 else '-Inf'
+        return repr(value)
+    return str(value)
+
+
+def _escape_help(value):
+    return value.replace('\\', '\\\\').replace('\n', '\\n')
+
+
+def _escape(value):
+    return _escape_help(value).replace('"', '\\"')
+
+
+def _sample(name, labels, value):
+    if labels:
+        pairs = ','.join(f'{label}="{_escape(str(label_value))}"' for label, label_value in labels)
+        return f'{name}{{{pairs}}} {_format(value)}'
+    return f'{name} {_format(value)}'
+
+
+def render():
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for name, family in _families():
+        lines.append(f"# HELP {name} {_escape_help(family['help'])}")
+        lines.append(f"# TYPE {name} {family['type']}")
+        labelnames = family['labelnames']
+        for key, value in sorted(family['samples'].items()):
+            labels = list(zip(labelnames, key))
+            if family['type'] != 'histogram':
+                lines.append(_sample(name, labels, value))
+                continue
+            cumulative = 0
+            for bound, count in zip(family['buckets'] + [math.inf], value[:-1]):
+                cumulative += count
+                lines.append(_sample(f'{name}_bucket', labels + [('le', _format(float(bound)))], cumulative))
+            lines.append(_sample(f'{name}_sum', labels, value[-1]))
+            lines.append(_sample(f'{name}_count', labels, cumulative))
+    return '\n'.join(lines) + '\n'
+
+
+@require_GET
+def metrics_view(request):
+    token = _setting('METRICS_AUTH_TOKEN', '')
+    if not token:
+        # Open only in development; without a token production does not serve metrics
+        if not settings.DEBUG:
+            raise Http404
+    elif not constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}'):
+        return HttpResponse('Unauthorized\n', status=401, content_type='text/plain')
+    return HttpResponse(render(), content_type=CONTENT_TYPE)
+
+
+# Requests and database queries
+
+REQUESTS = Counter(
+    'http_requests_total', 'HTTP requests by view, action and status code',
+    ['view', 'action', 'method', 'status'],
+)
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'HTTP request duration by view and action',
+    ['view', 'action'],
+)
+DB_QUERY_DURATION = Histogram(
+    'db_query_duration_seconds', 'Database query duration',
+    ['database'],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+
+
+def _view_labels(request):
+    """(view, action) labels: the view class and, for viewsets, the action routed to"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved', ''
+    func = match.func
+    cls = getattr(func, 'cls', None) or getattr(func, 'view_class', None)
+    view = cls.__name__ if cls is not None else getattr(func, '__name__', 'unknown')
+    actions = getattr(func, 'actions', None)
+    method = request.method.lower()
+    if actions:
+        return view, actions.get(method) or (method == 'head' and actions.get('get')) or method
+    return view, method
+
+
+class MetricsMiddleware:
+    """Counts and times requests; place it first so the time covers the other middleware"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+        view, action = _view_labels(request)
+        method = request.method if request.method in _METHODS else 'other'
+        REQUESTS.labels(view, action, method, response.status_code).inc()
+        REQUEST_DURATION.labels(view, action).observe(time.perf_counter() - started)
+        return response
+
+
+def _time_query(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        DB_QUERY_DURATION.labels(context['connection'].alias).observe(time.perf_counter() - started)
+
+
+@receiver(connection_created)
+def _instrument_connection(sender, connection, **kwargs):
+    # First in the list: execute_wrapper() blocks open around the connect pop the last one
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _time_query)
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_idempotencyrecord'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='idempotencyrecord',
+            name='scope',
+            field=models.CharField(help_text="Owner of the key: 'user:<id>'", max_length=100),
+        ),
+    ]
@@ -6,6 +6,7 @@ Provides base models with common functionality
 import uuid
 from django.db import models
 from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
 
 
 class BaseModel(models.Model):
@@ -39,4 +40,76 @@ class BaseModel(models.Model):
         if not self.created_at:
             self.created_at = timezone.now()
         self.updated_at = timezone.now()
-        super().save(*args, **kwargs)
\ No newline at end of file
+        super().save(*args, **kwargs)
+
+class BackgroundJob(BaseModel):
+    """
+    Database-backed job queue entry
+    Jobs are enqueued inside the caller's transaction and executed by the
+    run_jobs management command; ``task`` is the dotted path of a callable
+    that receives the payload dict
+    """
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+    ]
+
+    task = models.CharField(max_length=200)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default='PENDING'
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        db_table = 'core_backgroundjob'
+        ordering = ['run_after']
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+        ]
+
+    def __str__(self):
+        return f"{self.task} ({self.status})"
+
+
+class IdempotencyRecord(BaseModel):
+    """
+    Stored outcome of a POST made with an Idempotency-Key header
+    The first request claims the (scope, key) row; retries either wait for
+    it to finish or replay the stored response
+    """
+    STATUS_CHOICES = [
+        ('IN_PROGRESS', 'In progress'),
+        ('COMPLETED', 'Completed'),
+    ]
+
+    scope = models.CharField(
+        max_length=100,
+        help_text="Owner of the key: 'user:<id>'"
+    )
+    key = models.CharField(max_length=255)
+    request_fingerprint = models.CharField(max_length=64)
+    status = models.CharField(
+        max_length=15,
+        choices=STATUS_CHOICES,
+        default='IN_PROGRESS'
+    )
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=JSONEncoder)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        db_table = 'core_idempotencyrecord'
+        unique_together = ['scope', 'key']
+
+    def __str__(self):
+        return f"{self.scope}:{self.key} ({self.status})"
@@ -0,0 +1,49 @@
+"""
+API parsers for Tours & Travels backend
+OrjsonParser returns the same data as DRF's JSONParser for UTF-8 bodies.
+Bodies orjson rejects are re-parsed by the stock parser, which either
+accepts them (e.g. integers beyond 64 bits) or raises its usual
+ParseError message.
+
+MsgpackParser accepts ``application/msgpack`` request bodies.
+"""
+
+import codecs
+import io
+
+import msgpack
+import orjson
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser, get_encoding
+
+from .renderers import MsgpackRenderer, OrjsonRenderer
+
+_UTF8 = codecs.lookup('utf-8').name
+
+
+class OrjsonParser(JSONParser):
+    """Drop-in replacement for rest_framework.parsers.JSONParser"""
+    renderer_class = OrjsonRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        if not self.strict or codecs.lookup(get_encoding(parser_context)).name != _UTF8:
+            return super().parse(stream, media_type, parser_context)
+
+        body = stream.read()
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            return super().parse(io.BytesIO(body), media_type, parser_context)
+
+
+class MsgpackParser(BaseParser):
+    """Parses MessagePack request bodies"""
+    media_type = 'application/msgpack'
+    renderer_class = MsgpackRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except (ValueError, TypeError, msgpack.UnpackException) as exc:
+            raise ParseError('MessagePack parse error - %s' % (str(exc) or 'invalid data'))
@@ -0,0 +1,259 @@
+"""
+Minimal PDF writer for printable documents (manifests, invoices, vouchers,
+brochures)
+Text-only A4 pages using the standard Helvetica fonts, so no font files or
+third-party packages are needed. Completed pages can be drained as bytes
+while the document is still being built, which lets views stream large
+documents without holding them in memory.
+"""
+
+import zlib
+
+A4 = (595.28, 841.89)
+
+# Helvetica advance widths (1/1000 em) for ASCII 32..126
+_HELVETICA_WIDTHS = [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+]
+_BOLD_FACTOR = 1.06
+
+# Characters outside WinAnsiEncoding that documents commonly contain
+_REPLACEMENTS = {'₹': 'Rs.', '–': '-', '—': '-', '’': "'", '‘': "'", '“': '"', '”': '"', '•': '-'}
+
+
+def text_width(text, size, bold=False):
+    """Approximate rendered width of ``text`` in points"""
+    total = 0
+    for char in text:
+        code = ord(char)
+        total += _HELVETICA_WIDTHS[code - 32] if 32 <= code <= 126 else 556
+    return total * size / 1000 * (_BOLD_FACTOR if bold else 1)
+
+
+def _clean(text):
+    text = str(text) if text is not None else ''
+    for char, replacement in _REPLACEMENTS.items():
+        text = text.replace(char, replacement)
+    return text.replace('\r', '').replace('\t', '    ')
+
+
+def _escape(text):
+    encoded = text.encode('cp1252', errors='replace')
+    return encoded.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+def wrap(text, width, size, bold=False):
+    """Split ``text`` into lines no wider than ``width`` points"""
+    lines = []
+    for paragraph in _clean(text).split('\n'):
+        words = paragraph.split(' ')
+        line = ''
+        for word in words:
+            candidate = f"{line} {word}" if line else word
+            if text_width(candidate, size, bold) <= width or not line:
+                line = candidate
+            else:
+                lines.append(line)
+                line = word
+            # Break words that are wider than the line on their own
+            while text_width(line, size, bold) > width and len(line) > 1:
+                cut = len(line) - 1
+                while cut > 1 and text_width(line[:cut], size, bold) > width:
+                    cut -= 1
+                lines.append(line[:cut])
+                line = line[cut:]
+        lines.append(line)
+    return lines
+
+
+def truncate(text, width, size, bold=False):
+    """Cut ``text`` to fit ``width`` points, ending with '...' when shortened"""
+    text = _clean(text).replace('\n', ' ')
+    if text_width(text, size, bold) <= width:
+        return text
+    while text and text_width(text + '...', size, bold) > width:
+        text = text[:-1]
+    return text + '...'
+
+
+class PDFWriter:
+    """
+    Build a PDF page by page.
+
+    Add content with heading()/paragraph()/table_row()/spacer(); content
+    flows onto new pages automatically. drain() returns the bytes of
+    pages finished so far, finish() the remainder of the file. For
+    small documents, render() returns the whole file.
+    """
+
+    def __init__(self, title='', page_size=A4, margin=40, footer=None, compress=True):
+        self.title = _clean(title)
+        self.width, self.height = page_size
+        self.margin = margin
+        self.footer = footer
+        self.compress = compress
+
+        self._offset = 0
+        self._offsets = {}
+        self._page_ids = []
+        self._pending = []
+        # 1: catalog, 2: page tree, 3/4: fonts, 5: info; pages follow
+        self._next_id = 6
+        self._ops = None
+        self._y = 0
+
+        self._emit(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        self._object(3, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>')
+        self._object(4, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>')
+
+    @property
+    def content_width(self):
+        return self.width - 2 * self.margin
+
+    @property
+    def page_count(self):
+        return len(self._page_ids) + (1 if self._ops is not None else 0)
+
+    # Low-level output
+
+    def _emit(self, data):
+        self._pending.append(data)
+        self._offset += len(data)
+
+    def _object(self, object_id, body):
+        self._offsets[object_id] = self._offset
+        self._emit(f'{object_id} 0 obj\n'.encode() + body + b'\nendobj\n')
+
+    def _stream_object(self, object_id, data):
+        if self.compress:
+            data = zlib.compress(data)
+            header = f'<< /Length {len(data)} /Filter /FlateDecode >>'.encode()
+        else:
+            header = f'<< /Length {len(data)} >>'.encode()
+        self._object(object_id, header + b'\nstream\n' + data + b'\nendstream')
+
+    # Page handling
+
+    def _start_page(self):
+        self._ops = []
+        self._y = self.height - self.margin
+
+    def _finish_page(self):
+        if self._ops is None:
+            return
+        page_number = len(self._page_ids) + 1
+        if self.footer:
+            self._text_at(self.margin, self.margin / 2, f"{self.footer}  -  page {page_number}", 8)
+        content_id, page_id = self._next_id, self._next_id + 1
+        self._next_id += 2
+        self._stream_object(content_id, b'\n'.join(self._ops))
+        self._object(page_id, (
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {self.width:.2f} {self.height:.2f}] '
+            f'/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents {content_id} 0 R >>'
+        ).encode())
+        self._page_ids.append(page_id)
+        self._ops = None
+
+    def _ensure_space(self, needed):
+        if self._ops is None:
+            self._start_page()
+        elif self._y - needed < self.margin:
+            self._finish_page()
+            self._start_page()
+
+    def _text_at(self, x, y, text, size, bold=False):
+        font = b'/F2' if bold else b'/F1'
+        self._ops.append(
+            b'BT ' + font + f' {size} Tf {x:.2f} {y:.2f} Td ('.encode() + _escape(text) + b') Tj ET'
+        )
+
+    # Content
+
+    def new_page(self):
+        """Start a new page unless the current one is still empty"""
+        if self._ops:
+            self._finish_page()
+        self._start_page()
+
+    def spacer(self, points=6):
+        self._ensure_space(points)
+        self._y -= points
+
+    def heading(self, text, size=14):
+        self.paragraph(text, size=size, bold=True, leading=size * 1.4)
+
+    def paragraph(self, text, size=10, bold=False, indent=0, leading=None):
+        leading = leading or size * 1.3
+        for line in wrap(text, self.content_width - indent, size, bold):
+            self._ensure_space(leading)
+            self._y -= leading
+            self._text_at(self.margin + indent, self._y, line, size, bold)
+
+    def line(self, thickness=0.5):
+        self._ensure_space(4)
+        self._y -= 2
+        self._ops.append(
+            f'{thickness} w {self.margin:.2f} {self._y:.2f} m '
+            f'{self.width - self.margin:.2f} {self._y:.2f} l S'.encode()
+        )
+        self._y -= 2
+
+    def table_row(self, cells, widths, size=9, bold=False, align=None):
+        """
+        One table row; cells are cut to their column width. ``widths`` are
+        fractions of the content width, ``align`` an optional list of
+        'left'/'right' per column.
+        """
+        leading = size * 1.4
+        self._ensure_space(leading)
+        self._y -= leading
+        x = self.margin
+        for index, (cell, fraction) in enumerate(zip(cells, widths)):
+            column = self.content_width * fraction
+            text = truncate(cell, column - 4, size, bold)
+            if text:
+                offset = 0
+                if align and align[index] == 'right':
+                    offset = column - 4 - text_width(text, size, bold)
+                self._text_at(x + offset, self._y, text, size, bold)
+            x += column
+
+    # Output
+
+    def drain(self):
+        """Bytes written since the last drain (completed pages only)"""
+        data = b''.join(self._pending)
+        self._pending = []
+        return data
+
+    def finish(self):
+        """Close the document; returns the remaining bytes of the file"""
+        self._finish_page()
+        if not self._page_ids:
+            self._start_page()
+            self._finish_page()
+
+        kids = ' '.join(f'{page_id} 0 R' for page_id in self._page_ids)
+        self._object(2, f'<< /Type /Pages /Kids [{kids}] /Count {len(self._page_ids)} >>'.encode())
+        self._object(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+        self._object(5, b'<< /Title (' + _escape(self.title) + b') /Producer (Tours & Travels) >>')
+
+        xref_offset = self._offset
+        size = self._next_id
+        entries = [b'0000000000 65535 f \n']
+        for object_id in range(1, size):
+            offset = self._offsets.get(object_id)
+            entries.append(f'{offset:010d} 00000 n \n'.encode() if offset is not None else b'0000000000 65535 f \n')
+        self._emit(f'xref\n0 {size}\n'.encode() + b''.join(entries))
+        self._emit(f'trailer\n<< /Size {size} /Root 1 0 R /Info 5 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n'.encode())
+        return self.drain()
+
+    def render(self):
+        """The complete file as bytes"""
+        head = self.drain()
+        return head + self.finish()
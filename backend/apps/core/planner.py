@@ -0,0 +1,328 @@
+"""
+select_related/prefetch_related planning from serializer fields
+``plan()`` walks a serializer's readable fields, following ``source``
+paths, nested serializers, and the relations that method fields and model
+properties declare with ``@requires``. Forward and one-to-one relations
+reached without crossing a to-many relation are select_related; the rest
+are prefetched. Aggregates a property declares with ``Annotation`` are
+annotated onto the queryset of the model it belongs to: the root queryset,
+or the Prefetch queryset of the relation reaching it. QueryPlanMixin
+applies the plan to list and retrieve querysets.
+
+On list querysets the plan also defers the text, JSON and binary columns
+of the model and its select_related relations that no field reads. A
+model whose columns cannot be known (a property or method field without
+``@requires``, or a field rendering the object itself) keeps all of them.
+
+With DEBUG on, views using QueryPlanMixin log a warning when rendering
+the response runs queries, i.e. when a relation or aggregate is still
+lazily loaded per row. On profiled requests (see apps.core.profiling) they
+record the time spent serializing.
+"""
+
+import logging
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections, models
+from django.db.models import Prefetch, QuerySet
+from django.utils.functional import cached_property
+from rest_framework import serializers
+
+from . import profiling
+from .sideload import SideloadedField
+
+logger = logging.getLogger(__name__)
+
+
+class Annotation:
+    """
+    Aggregates a model property reads from its own instance, e.g.
+    ``Annotation(confirmed_travelers=Coalesce(Subquery(...), 0))``; the
+    property should fall back to a query when the attribute is missing
+    """
+
+    def __init__(self, **expressions):
+        self.expressions = expressions
+
+
+def requires(*lookups):
+    """
+    Declare the relations a method field or model property reads, as
+    lookups relative to its object: ``'tour__primary_destination'``, a
+    Prefetch, an Annotation, or a callable returning one (for querysets of
+    models that cannot be imported yet). Columns read from heavy (text/JSON)
+    fields must be named too, e.g. ``'hotel_details'`` or
+    ``'tour__description'``. Put it below ``@property``.
+    """
+    def decorator(func):
+        func.query_lookups = lookups
+        return func
+    return decorator
+
+
+def _declared_lookups(model, attr):
+    """
+    Lookups declared with @requires on ``model.attr`` (a property,
+    cached_property or method), or None when it declares none
+    """
+    descriptor = getattr(model, attr, None)
+    if isinstance(descriptor, property):
+        descriptor = descriptor.fget
+    elif isinstance(descriptor, cached_property):
+        descriptor = descriptor.func
+    return getattr(descriptor, 'query_lookups', None)
+
+
+def _select_paths(tree, prefix=''):
+    """Paths of a select_related tree, as stored on Query.select_related"""
+    for name, below in tree.items():
+        path = f'{prefix}__{name}' if prefix else name
+        yield path
+        yield from _select_paths(below, path)
+
+
+def _unique(lookups):
+    return list(dict.fromkeys(lookups))
+
+
+def _heavy(field):
+    return isinstance(field, (models.TextField, models.JSONField, models.BinaryField))
+
+
+class Plan:
+    """Lookups to apply to a queryset"""
+
+    def __init__(self, model):
+        self.select = []
+        self.prefetch = []
+        # Column use of the model and its select_related relations, by path
+        self.models = {'': model}
+        self.columns = defaultdict(set)
+        self.opaque = set()
+        # Annotations by path: (model, {name: expression})
+        self.annotations = {}
+
+    def add_select(self, path):
+        if path not in self.select:
+            self.select.append(path)
+
+    def add_prefetch(self, lookup):
+        if lookup not in self.prefetch:
+            self.prefetch.append(lookup)
+
+    def add_lookup(self, model, prefix, to_many, lookup):
+        """Add ``lookup``, relative to ``model`` at ``prefix``"""
+        if callable(lookup):
+            lookup = lookup()
+        if isinstance(lookup, Prefetch):
+            through = f'{prefix}__{lookup.prefetch_through}' if prefix else lookup.prefetch_through
+            self.add_prefetch(Prefetch(through, queryset=lookup.queryset, to_attr=lookup.to_attr))
+            return
+        if isinstance(lookup, Annotation):
+            self.annotations.setdefault(prefix, (model, {}))[1].update(lookup.expressions)
+            return
+        reached = self.follow(model, prefix, to_many, lookup.split('__'))
+        if reached is not None:
+            # The whole related object is used
+            self.opaque.add(reached[1])
+
+    def follow(self, model, prefix, to_many, attrs):
+        """
+        Follow ``attrs`` from ``model``, adding the relations they cross
+        and the column they end at; returns the model and path reached, or
+        None at a column, property or method
+        """
+        for attr in attrs:
+            try:
+                field = model._meta.get_field(attr)
+            except FieldDoesNotExist:
+                lookups = _declared_lookups(model, attr)
+                if lookups is None:
+                    self.opaque.add(prefix)
+                for lookup in lookups or ():
+                    self.add_lookup(model, prefix, to_many, lookup)
+                return None
+            if not field.is_relation or field.related_model is None:
+                self.columns[prefix].add(field.name)
+                return None
+            prefix = f'{prefix}__{attr}' if prefix else attr
+            to_many = to_many or field.many_to_many or field.one_to_many
+            if to_many:
+                self.add_prefetch(prefix)
+            else:
+                self.add_select(prefix)
+                self.models[prefix] = field.related_model
+            model = field.related_model
+        return model, prefix, to_many
+
+    def walk(self, serializer, model, prefix='', to_many=False):
+        """Add the relations ``serializer`` reads from instances of ``model`` at ``prefix``"""
+        if isinstance(serializer, serializers.ListSerializer):
+            serializer = serializer.child
+        for field in serializer._readable_fields:
+            if isinstance(field, serializers.SerializerMethodField):
+                lookups = getattr(getattr(serializer, field.method_name, None), 'query_lookups', None)
+                if lookups is None:
+                    self.opaque.add(prefix)
+                for lookup in lookups or ():
+                    self.add_lookup(model, prefix, to_many, lookup)
+                continue
+            if isinstance(field, serializers.PrimaryKeyRelatedField):
+                # Rendered from the foreign key column
+                continue
+            if field.source == '*':
+                reached = (model, prefix, to_many)
+            else:
+                reached = self.follow(model, prefix, to_many, field.source_attrs)
+            if reached is None:
+                continue
+            if isinstance(field, serializers.BaseSerializer):
+                self.walk(field, *reached)
+            elif not isinstance(field, SideloadedField):
+                # Renders the related object itself (str(), a custom field)
+                self.opaque.add(reached[1])
+
+    def deferred(self):
+        """Heavy columns of the model and its select_related relations that are never read"""
+        columns = []
+        for path, model in self.models.items():
+            if path in self.opaque:
+                continue
+            for field in model._meta.concrete_fields:
+                if _heavy(field) and field.name not in self.columns[path]:
+                    columns.append(f'{path}__{field.name}' if path else field.name)
+        return columns
+
+    def apply(self, queryset, prune=False):
+        select = list(self.select)
+        prefetch = list(self.prefetch)
+        deferred = self.deferred() if prune else []
+        related_annotations = sorted((path, spec) for path, spec in self.annotations.items() if path)
+        if related_annotations and queryset.query.select_related is not True:
+            # The queryset's own lookups of annotated relations are replaced
+            # below, so take them over
+            if queryset.query.select_related:
+                select = _unique([*_select_paths(queryset.query.select_related), *select])
+            prefetch = _unique([*queryset._prefetch_related_lookups, *prefetch])
+            queryset = queryset.select_related(None).prefetch_related(None)
+        else:
+            # select_related() of every relation: annotated relations fall
+            # back to their properties' queries
+            related_annotations = []
+        if '' in self.annotations:
+            queryset = queryset.annotate(**self.annotations[''][1])
+
+        annotated = []
+        for path, (model, expressions) in related_annotations:
+            related = model._default_manager.annotate(**expressions)
+            if path in select:
+                # select_related cannot annotate a relation: prefetch it
+                # instead, with the relations and deferred columns below it
+                inner = f'{path}__'
+                below = [lookup[len(inner):] for lookup in select if lookup.startswith(inner)]
+                if below:
+                    related = related.select_related(*below)
+                hidden = [column[len(inner):] for column in deferred if column.startswith(inner)]
+                if hidden:
+                    related = related.defer(*hidden)
+                select = [lookup for lookup in select if lookup != path and not lookup.startswith(inner)]
+                deferred = [column for column in deferred if not column.startswith(inner)]
+                annotated.append(Prefetch(path, queryset=related))
+            elif path in prefetch:
+                prefetch[prefetch.index(path)] = Prefetch(path, queryset=related)
+        # Prefetches replacing a select_related come before lookups through them
+        prefetch = annotated + prefetch
+
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        if deferred:
+            queryset = queryset.defer(*deferred)
+        return queryset
+
+
+def plan(serializer, model=None):
+    """The Plan for rendering ``model`` instances with ``serializer`` (an instance)"""
+    child = serializer.child if isinstance(serializer, serializers.ListSerializer) else serializer
+    result = Plan(model or child.Meta.model)
+    result.walk(serializer, result.models[''])
+    return result
+
+
+class _RenderTimer:
+    """Adds the time a serializer spends rendering to the request profile"""
+
+    def __init__(self, render):
+        self.render = render
+
+    def __call__(self, instance):
+        started = time.perf_counter()
+        try:
+            return self.render(instance)
+        finally:
+            profiling.record_serializer(time.perf_counter() - started)
+
+
+class _LazyLoadWatcher:
+    """Counts the queries run while a serializer renders"""
+
+    def __init__(self, serializer, view):
+        self.serializer = serializer
+        self.view = view
+        self.render = serializer.to_representation
+
+    def __call__(self, instance):
+        queries = Counter()
+
+        def record(execute, sql, params, many, context):
+            queries[sql] += 1
+            return execute(sql, params, many, context)
+
+        if isinstance(instance, QuerySet):
+            # Unpaginated lists: the query itself is not a lazy load
+            len(instance)
+            using = instance.db
+        else:
+            using = getattr(getattr(instance, '_state', None), 'db', None) or 'default'
+        with connections[using].execute_wrapper(record):
+            data = self.render(instance)
+        if queries:
+            sql, count = queries.most_common(1)[0]
+            logger.warning(
+                "%s ran %d lazy-load queries rendering %s (most frequent, %d times: %s)",
+                type(self.serializer).__name__, sum(queries.values()),
+                type(self.view).__name__, count, sql[:300],
+            )
+        return data
+
+
+class QueryPlanMixin:
+    """
+    Applies the serializer's Plan to the queryset of list and retrieve,
+    deferring unread heavy columns on lists; with DEBUG on, warns about
+    queries run while rendering, and on profiled requests times it
+    """
+    planned_actions = ('list', 'retrieve')
+    pruned_actions = ('list',)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        action = getattr(self, 'action', None)
+        if action in self.planned_actions:
+            queryset = plan(self.get_serializer(), queryset.model).apply(
+                queryset, prune=action in self.pruned_actions
+            )
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if args or 'instance' in kwargs:
+            if profiling.current() is not None:
+                serializer.to_representation = _RenderTimer(serializer.to_representation)
+            if settings.DEBUG:
+                serializer.to_representation = _LazyLoadWatcher(serializer, self)
+        return serializer
@@ -0,0 +1,241 @@
+"""
+Per-request profiling
+With REQUEST_PROFILING on, ProfilerMiddleware measures every request:
+wall time, database time, query count, duplicate queries (the same SQL
+run more than once, the signature of an N+1), serializer time, two-tier
+cache hits and misses, and response size. It reports them in a
+``Server-Timing`` header and a JSON log line on the ``apps.core.profiling``
+logger, and aggregates them per view in the process (see ``stats()``).
+
+An admin can add ``?profile=1`` to any request (profiling on or off) to
+get a cProfile dump of it as an attachment instead of the response;
+open it with ``python -m pstats`` or snakeviz.
+
+With profiling off and no ``profile`` parameter a request costs one
+substring check.
+"""
+
+import cProfile
+import json
+import logging
+import marshal
+import pstats
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+_views = defaultdict(Counter)
+_views_lock = threading.Lock()
+
+# Cache counters (see TwoTierCache.stats) reported as hits
+_CACHE_HITS = ('l1_hits', 'l2_hits', 'stale_hits')
+
+
+def current():
+    """The RequestProfile of the request this thread is handling, if it is profiled"""
+    return getattr(_local, 'profile', None)
+
+
+def record_cache(name, count=1):
+    profile = getattr(_local, 'profile', None)
+    if profile is not None:
+        profile.cache[name] += count
+
+
+def record_serializer(seconds):
+    profile = getattr(_local, 'profile', None)
+    if profile is not None:
+        profile.serializer_time += seconds
+
+
+class RequestProfile:
+    """Measurements of one request; also the database execute wrapper collecting them"""
+
+    def __init__(self):
+        self.db_time = 0.0
+        self.queries = Counter()
+        self.serializer_time = 0.0
+        self.cache = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries[sql] += 1
+
+    @property
+    def query_count(self):
+        return sum(self.queries.values())
+
+    @property
+    def duplicate_queries(self):
+        return sum(count - 1 for count in self.queries.values() if count > 1)
+
+    @property
+    def cache_hits(self):
+        return sum(self.cache[name] for name in _CACHE_HITS)
+
+    @property
+    def cache_misses(self):
+        return self.cache['misses']
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    return match.view_name or match._func_path
+
+
+def _response_size(response):
+    if getattr(response, 'streaming', False):
+        return None
+    return len(response.content)
+
+
+def _is_admin(request):
+    """Whether the request is made by an admin, authenticating it as the API views would"""
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        from rest_framework.request import Request
+        from rest_framework.settings import api_settings
+
+        drf_request = Request(request)
+        for authentication in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+            try:
+                result = authentication().authenticate(drf_request)
+            except Exception:
+                return False
+            if result is not None:
+                user = result[0]
+                break
+    return bool(user is not None and user.is_authenticated and getattr(user, 'is_admin', False))
+
+
+def _server_timing(profile, wall):
+    return ', '.join([
+        f'total;dur={wall * 1000:.1f}',
+        f'db;dur={profile.db_time * 1000:.1f};desc="{profile.query_count} queries, '
+        f'{profile.duplicate_queries} duplicates"',
+        f'serializer;dur={profile.serializer_time * 1000:.1f}',
+        f'cache;desc="{profile.cache_hits} hits, {profile.cache_misses} misses"',
+    ])
+
+
+def _aggregate(view, profile, wall, size):
+    with _views_lock:
+        counts = _views[view]
+        counts['requests'] += 1
+        counts['wall_ms'] += wall * 1000
+        counts['max_wall_ms'] = max(counts['max_wall_ms'], wall * 1000)
+        counts['db_ms'] += profile.db_time * 1000
+        counts['queries'] += profile.query_count
+        counts['duplicate_queries'] += profile.duplicate_queries
+        counts['serializer_ms'] += profile.serializer_time * 1000
+        counts['cache_hits'] += profile.cache_hits
+        counts['cache_misses'] += profile.cache_misses
+        counts['bytes'] += size or 0
+
+
+class ProfilerMiddleware:
+    """Measures requests; see the module docstring"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'REQUEST_PROFILING', False)
+
+    def __call__(self, request):
+        cprofile = 'profile=' in request.META.get('QUERY_STRING', '') and request.GET.get('profile') == '1'
+        if not self.enabled and not cprofile:
+            return self.get_response(request)
+        if cprofile and not _is_admin(request):
+            cprofile = False
+            if not self.enabled:
+                return self.get_response(request)
+
+        profile = _local.profile = RequestProfile()
+        profiler = cProfile.Profile() if cprofile else None
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile))
+                if profiler is not None:
+                    profiler.enable()
+                try:
+                    response = self.get_response(request)
+                finally:
+                    if profiler is not None:
+                        profiler.disable()
+        finally:
+            _local.profile = None
+        wall = time.perf_counter() - started
+
+        view = _view_name(request)
+        size = _response_size(response)
+        if profiler is not None:
+            response = self._dump(profiler, view)
+        response['Server-Timing'] = _server_timing(profile, wall)
+        if self.enabled:
+            _aggregate(view, profile, wall, size)
+            logger.info(json.dumps({
+                'event': 'request_profile',
+                'method': request.method,
+                'path': request.path,
+                'view': view,
+                'status': response.status_code,
+                'wall_ms': round(wall * 1000, 2),
+                'db_ms': round(profile.db_time * 1000, 2),
+                'queries': profile.query_count,
+                'duplicate_queries': profile.duplicate_queries,
+                'serializer_ms': round(profile.serializer_time * 1000, 2),
+                'cache_hits': profile.cache_hits,
+                'cache_misses': profile.cache_misses,
+                'bytes': size,
+            }))
+        return response
+
+    def _dump(self, profiler, view):
+        stats = pstats.Stats(profiler)
+        response = HttpResponse(marshal.dumps(stats.stats), content_type='application/octet-stream')
+        filename = f"{view.replace(':', '-')}-{timezone.now():%Y%m%dT%H%M%S}.prof"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+def stats():
+    """Per-view request count and averages for this process"""
+    data = {}
+    with _views_lock:
+        views = {view: Counter(counts) for view, counts in _views.items()}
+    for view, counts in sorted(views.items()):
+        requests = counts['requests']
+        data[view] = {
+            'requests': requests,
+            'avg_wall_ms': round(counts['wall_ms'] / requests, 2),
+            'max_wall_ms': round(counts['max_wall_ms'], 2),
+            'avg_db_ms': round(counts['db_ms'] / requests, 2),
+            'avg_queries': round(counts['queries'] / requests, 2),
+            'avg_duplicate_queries': round(counts['duplicate_queries'] / requests, 2),
+            'avg_serializer_ms': round(counts['serializer_ms'] / requests, 2),
+            'cache_hits': counts['cache_hits'],
+            'cache_misses': counts['cache_misses'],
+            'avg_bytes': round(counts['bytes'] / requests),
+        }
+    return data
+
+
+def reset_stats():
+    with _views_lock:
+        _views.clear()
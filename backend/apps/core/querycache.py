@@ -0,0 +1,317 @@
+"""
+Opt-in queryset result cache
+Models that use CachedManager can cache reads with ``.cached()`` (or for
+every queryset with ``CachedManager(cache_all=True)``). Results are stored
+in the two-tier cache under the compiled SQL and params plus a generation
+token for every table the query reads; any write to one of those tables
+(save, delete, update(), bulk_create, bulk_update, M2M changes) replaces
+the table's token when its transaction commits, which retires every
+cached result that read the table.
+
+A query is only cached when every table it reads belongs to a model using
+CachedManager (or to the auto-created M2M table of one), since writes to
+other tables are not seen. Queries that lock rows, use extra()/raw SQL, or
+run inside a transaction that has written one of their tables always go
+to the database. Writes made with raw SQL are not seen either.
+"""
+
+import hashlib
+import threading
+import uuid
+from collections import Counter, defaultdict
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connections, models, transaction
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.db.models.sql import Query
+
+from . import metrics
+from .cache import tiered_cache
+
+_TABLE_KEY = 'querycache:table:{table}'
+_RESULT_KEY = 'querycache:result:{digest}'
+# Lifetime of a table's generation token; a token that expires only retires results early
+TOKEN_TIMEOUT = 24 * 60 * 60
+
+_models = set()
+_tables = set()
+_quoted = {}
+_stats = defaultdict(Counter)
+_local = threading.local()
+
+_REQUESTS = metrics.Counter(
+    'query_cache_requests_total', 'Cacheable queryset evaluations by model and result', ['model', 'result']
+)
+_INVALIDATIONS = metrics.Counter(
+    'query_cache_invalidations_total', 'Query cache invalidations by table', ['table']
+)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _count(label, name):
+    _stats[label][name] += 1
+    _REQUESTS.labels(label, name).inc()
+
+
+def tracked_tables():
+    """Tables whose writes invalidate cached results"""
+    if not _tables:
+        for model in _models:
+            _tables.add(model._meta.db_table)
+            for field in model._meta.local_many_to_many:
+                if field.remote_field.through._meta.auto_created:
+                    _tables.add(field.remote_field.through._meta.db_table)
+    return _tables
+
+
+def _written_tables(using):
+    """Tables written by the open transaction of this thread on ``using``"""
+    states = getattr(_local, 'written', None)
+    if states is None:
+        states = _local.written = {}
+    return states.setdefault(using, {})
+
+
+def _token_key(table):
+    return _TABLE_KEY.format(table=table)
+
+
+def _tokens(tables):
+    keys = {table: _token_key(table) for table in tables}
+    found = tiered_cache.get_many(keys.values())
+    for table, key in keys.items():
+        if key not in found:
+            tiered_cache.add(key, uuid.uuid4().hex, timeout=TOKEN_TIMEOUT)
+            found[key] = tiered_cache.get(key)
+    return [(table, found[keys[table]]) for table in sorted(tables)]
+
+
+def _retire(table, pending):
+    if not pending[0]:
+        pending[0] = True
+        tiered_cache.delete(_token_key(table))
+
+
+def invalidate_tables(tables, using='default'):
+    """
+    Retire cached results that read ``tables``: immediately in autocommit
+    mode, otherwise when the current transaction commits, and until then
+    queries on those tables in this transaction bypass the cache
+    """
+    for table in tables:
+        _stats[table]['invalidations'] += 1
+        _INVALIDATIONS.labels(table).inc()
+    if not connections[using].in_atomic_block:
+        tiered_cache.delete_many([_token_key(table) for table in tables])
+        return
+    written = _written_tables(using)
+    for table in tables:
+        # One flag per table and transaction; callbacks discarded by a
+        # savepoint rollback are re-registered by the next write
+        pending = written.get(table)
+        if pending is None or pending[0]:
+            pending = written[table] = [False]
+        transaction.on_commit(lambda table=table, pending=pending: _retire(table, pending), using=using)
+
+
+def _invalidate_model(model, using):
+    invalidate_tables([model._meta.db_table], using)
+
+
+def _written(sender, instance, using, **kwargs):
+    _invalidate_model(sender, using)
+
+
+def _m2m_changed(sender, action, using, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear') and sender._meta.db_table in tracked_tables():
+        _invalidate_model(sender, using)
+
+
+def register(model):
+    """Invalidate cached results when ``model`` rows are written"""
+    if model in _models:
+        return
+    _models.add(model)
+    _tables.clear()
+    uid = f'querycache:{model._meta.label}'
+    post_save.connect(_written, sender=model, dispatch_uid=uid)
+    post_delete.connect(_written, sender=model, dispatch_uid=uid)
+    m2m_changed.connect(_m2m_changed, dispatch_uid='querycache:m2m')
+
+
+def _quoted_tables(using):
+    """(table, quoted name) of every model table, as they appear in compiled SQL"""
+    connection = connections[using]
+    quoted = _quoted.get(connection.vendor)
+    if quoted is None:
+        quoted = _quoted[connection.vendor] = [
+            (model._meta.db_table, connection.ops.quote_name(model._meta.db_table))
+            for model in apps.get_models(include_auto_created=True)
+        ]
+    return quoted
+
+
+def _sql_tables(sql, using):
+    """Tables read by compiled ``sql`` (joins and subqueries included)"""
+    return {table for table, quoted in _quoted_tables(using) if quoted in sql}
+
+
+def _uses_raw_sql(expression):
+    """Whether a query or expression embeds SQL whose tables cannot be known"""
+    if isinstance(expression, Query):
+        if expression.extra or expression.extra_tables:
+            return True
+        children = [expression.where, *expression.annotations.values(), *expression.combined_queries]
+        return any(_uses_raw_sql(child) for child in children)
+    if isinstance(expression, RawSQL):
+        return True
+    inner = getattr(expression, 'query', None)
+    if isinstance(inner, Query):
+        return _uses_raw_sql(inner)
+    children = list(getattr(expression, 'children', None) or [])
+    for attr in ('lhs', 'rhs'):
+        value = getattr(expression, attr, None)
+        if value is not None:
+            children.append(value)
+    if hasattr(expression, 'get_source_expressions'):
+        children.extend(child for child in expression.get_source_expressions() if child is not None)
+    return any(_uses_raw_sql(child) for child in children)
+
+
+class CachedQuerySet(models.QuerySet):
+    """QuerySet whose evaluation can be served from the query cache"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cache_timeout = None
+
+    def cached(self, timeout=None):
+        """Serve this queryset's results from the cache for up to ``timeout`` seconds"""
+        clone = self._chain()
+        clone._cache_timeout = timeout or _setting('QUERY_CACHE_TIMEOUT', 300)
+        return clone
+
+    def uncached(self):
+        clone = self._chain()
+        clone._cache_timeout = None
+        return clone
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._cache_timeout = self._cache_timeout
+        return clone
+
+    def _fetch_all(self):
+        if self._result_cache is None and self._cache_timeout:
+            self._result_cache = self._cached_results()
+        super()._fetch_all()
+
+    def _cached_results(self):
+        """The results of this query, from the cache when it is safe to use"""
+        label = self.model._meta.label
+        if (not _setting('QUERY_CACHE_ENABLED', True) or self.query.select_for_update
+                or self._known_related_objects):
+            _count(label, 'bypassed')
+            return list(self._iterable_class(self))
+
+        sql, params = self.query.chain().get_compiler(using=self.db).as_sql()
+        tables = _sql_tables(sql, self.db)
+        if not tables or not tables <= tracked_tables() or _uses_raw_sql(self.query):
+            _count(label, 'bypassed')
+            return list(self._iterable_class(self))
+
+        connection = connections[self.db]
+        written = _written_tables(self.db)
+        if not connection.in_atomic_block:
+            written.clear()
+        elif written.keys() & tables:
+            _count(label, 'bypassed')
+            return list(self._iterable_class(self))
+
+        digest = hashlib.sha256(repr((
+            self.db, label, self._iterable_class.__name__, sql, params, _tokens(tables),
+        )).encode()).hexdigest()
+        key = _RESULT_KEY.format(digest=digest)
+        results = tiered_cache.get(key)
+        if results is not None:
+            _count(label, 'hits')
+            return results
+
+        _count(label, 'misses')
+        results = list(self._iterable_class(self))
+        tiered_cache.set(key, results, timeout=self._cache_timeout)
+        return results
+
+    # Bulk writes do not send post_save; delete() sends post_delete per row
+
+    def update(self, **kwargs):
+        rows = super().update(**kwargs)
+        _invalidate_model(self.model, self.db)
+        return rows
+
+    update.alters_data = True
+
+    def bulk_create(self, *args, **kwargs):
+        objects = super().bulk_create(*args, **kwargs)
+        _invalidate_model(self.model, self.db)
+        return objects
+
+    def bulk_update(self, *args, **kwargs):
+        rows = super().bulk_update(*args, **kwargs)
+        _invalidate_model(self.model, self.db)
+        return rows
+
+    bulk_update.alters_data = True
+
+    def delete(self):
+        deleted = super().delete()
+        _invalidate_model(self.model, self.db)
+        return deleted
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
+class CachedManagerMixin:
+    """
+    Manager behaviour for CachedQuerySet: registers the model for
+    invalidation and, with ``cache_all``, caches every queryset it returns
+    """
+
+    def __init__(self, *args, cache_all=False, timeout=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache_all = cache_all
+        self.timeout = timeout
+
+    def contribute_to_class(self, cls, name):
+        super().contribute_to_class(cls, name)
+        if not cls._meta.abstract:
+            register(cls)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.cache_all:
+            queryset = queryset.cached(self.timeout)
+        return queryset
+
+
+class CachedManager(CachedManagerMixin, models.Manager.from_queryset(CachedQuerySet)):
+    pass
+
+
+def stats():
+    """Per-model hit/miss/bypass counts and hit ratio for this process, plus per-table invalidations"""
+    data = {}
+    for name, counts in sorted(_stats.items()):
+        looked_up = counts['hits'] + counts['misses']
+        data[name] = dict(counts, hit_ratio=round(counts['hits'] / looked_up, 4) if looked_up else None)
+    return data
+
+
+def reset_stats():
+    _stats.clear()
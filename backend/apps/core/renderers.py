@@ -0,0 +1,125 @@
+"""
+API renderers for Tours & Travels backend
+OrjsonRenderer produces the same bytes as DRF's JSONRenderer (compact,
+UTF-8, U+2028/U+2029 escaped, datetimes as isoformat with "Z" for UTC,
+Decimal as a number unless API_JSON_DECIMAL_AS_STRING) several times
+faster, by encoding with orjson and only calling back into Python for the
+types orjson does not handle natively.
+
+Payloads orjson cannot reproduce exactly are rendered by the stock
+renderer instead: indented output (``Accept: application/json; indent=4``,
+the browsable API), integers beyond 64 bits, and Decimals whose float
+Python would print in exponent form. Two differences remain for plain
+float values: those below 1e-4 or from 1e16 are printed without an
+exponent or its sign ("1e16" rather than "1e+16"), and NaN/Infinity
+render as null where the stock renderer raises.
+
+MsgpackRenderer serves ``application/msgpack`` (or ``?format=msgpack``).
+Values msgpack has no type for (Decimal, UUID, dates, lazy strings) are
+converted as for JSON, so a client decoding either format gets the same
+data.
+"""
+
+import datetime
+import decimal
+import uuid
+
+import msgpack
+import orjson
+from django.conf import settings
+from django.db.models.query import QuerySet
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+# Floats Python's json prints without an exponent
+_PLAIN_FLOAT_MIN = 1e-4
+_PLAIN_FLOAT_MAX = 1e16
+_LINE_SEPARATORS = (b'\xe2\x80\xa8', b'\xe2\x80\xa9')
+
+
+class _Unsupported(Exception):
+    """Raised from the default hook to render the payload with the stock encoder"""
+
+
+def _decimal_as_string():
+    return getattr(settings, 'API_JSON_DECIMAL_AS_STRING', False)
+
+
+def _default(obj):
+    """Types orjson does not serialize itself, converted as DRF's JSONEncoder does"""
+    if isinstance(obj, decimal.Decimal):
+        if _decimal_as_string():
+            return str(obj)
+        value = float(obj)
+        if value and not _PLAIN_FLOAT_MIN <= abs(value) < _PLAIN_FLOAT_MAX:
+            raise _Unsupported
+        return value
+    if isinstance(obj, Promise):
+        return force_str(obj)
+    if isinstance(obj, datetime.timedelta):
+        return str(obj.total_seconds())
+    if isinstance(obj, bytes):
+        return obj.decode()
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time, uuid.UUID)):
+        # Subclasses orjson rejects; handled by the stock encoder
+        raise _Unsupported
+    if isinstance(obj, QuerySet):
+        return tuple(obj)
+    if hasattr(obj, 'tolist'):
+        # numpy arrays and scalars
+        return obj.tolist()
+    if hasattr(obj, '__getitem__'):
+        cls = list if isinstance(obj, (list, tuple)) else dict
+        try:
+            return cls(obj)
+        except Exception:
+            raise _Unsupported
+    if hasattr(obj, '__iter__'):
+        return tuple(obj)
+    raise _Unsupported
+
+
+class _StockEncoder(JSONRenderer.encoder_class):
+    """DRF's encoder, honouring API_JSON_DECIMAL_AS_STRING"""
+
+    def default(self, obj):
+        if isinstance(obj, decimal.Decimal) and _decimal_as_string():
+            return str(obj)
+        return super().default(obj)
+
+
+class OrjsonRenderer(JSONRenderer):
+    """Drop-in replacement for rest_framework.renderers.JSONRenderer"""
+    encoder_class = _StockEncoder
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if not (self.compact and self.strict and not self.ensure_ascii):
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=_default, option=_OPTIONS)
+        except (_Unsupported, orjson.JSONEncodeError):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if b'\xe2\x80' in ret:
+            ret = ret.replace(_LINE_SEPARATORS[0], b'\\u2028').replace(_LINE_SEPARATORS[1], b'\\u2029')
+        return ret
+
+
+class MsgpackRenderer(BaseRenderer):
+    """MessagePack rendering; values msgpack has no type for are converted like JSON"""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_StockEncoder().default, use_bin_type=True, datetime=False)
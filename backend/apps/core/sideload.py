@@ -0,0 +1,167 @@
+"""
+Sideloaded (normalized) responses
+With ``?include=seasons,tours`` the nested fields that would embed those
+related objects render their id (or list of ids) instead, and the objects
+themselves are serialized once each into a top-level ``included`` section:
+``{"included": {"seasons": {"<id>": {...}}, "tours": {...}}}``. Included
+objects sideload in turn, e.g. the season pricings of an included tour
+refer to included seasons.
+
+Serializers declare which fields can be sideloaded with
+``sideload_fields = {'season_details': 'seasons'}`` (or ``(collection,
+source)`` for method fields), and each collection is registered once with
+``register()``. Views using SideloadViewMixin add the ``included``
+section; unknown collection names in ``include`` are ignored.
+"""
+
+from django.db import models
+from rest_framework import serializers
+
+_collections = {}
+
+
+def register(name, serializer_class, queryset=None):
+    """Make ``name`` includable; its objects are read from ``queryset`` and rendered with ``serializer_class``"""
+    if queryset is None:
+        queryset = serializer_class.Meta.model._default_manager.all()
+    _collections[name] = (serializer_class, queryset)
+
+
+def requested(request):
+    """Registered collections named in the request's ``include`` parameter"""
+    if request is None:
+        return frozenset()
+    include = getattr(request, '_sideload_include', None)
+    if include is None:
+        params = getattr(request, 'query_params', None) or request.GET
+        names = {name.strip() for name in params.get('include', '').split(',')}
+        include = request._sideload_include = frozenset(names & _collections.keys())
+    return include
+
+
+def _track(request, serializer):
+    """Collect sideloaded ids from ``serializer``'s output when the response is finalized"""
+    roots = getattr(request, '_sideload_roots', None)
+    if roots is None:
+        roots = request._sideload_roots = []
+    if not any(root is serializer for root in roots):
+        roots.append(serializer)
+
+
+class SideloadedField(serializers.Field):
+    """Renders the id(s) of a related object that is sideloaded into ``included``"""
+
+    def __init__(self, collection, many=False, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+        self.collection = collection
+        self.many = many
+
+    def to_representation(self, value):
+        if self.many:
+            items = value.all() if isinstance(value, models.manager.BaseManager) else value
+            return [item.pk for item in items]
+        return value.pk
+
+
+class SideloadMixin:
+    """Swaps the fields in ``sideload_fields`` for SideloadedField when their collection is included"""
+    # Field name -> collection name, or (collection name, source)
+    sideload_fields = {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        include = requested(request)
+        swapped = False
+        for name, spec in self.sideload_fields.items():
+            collection, source = spec if isinstance(spec, tuple) else (spec, None)
+            field = fields.get(name)
+            if field is None or collection not in include:
+                continue
+            fields[name] = SideloadedField(
+                collection,
+                many=isinstance(field, serializers.ListSerializer),
+                source=source or field.source,
+            )
+            swapped = True
+        if swapped:
+            _track(request, self.root)
+        return fields
+
+
+def _collect(serializer, data, found):
+    """Add the ids that sideloaded fields rendered into ``data`` to ``found``"""
+    if isinstance(serializer, serializers.ListSerializer):
+        for item in data or ():
+            _collect(serializer.child, item, found)
+        return
+    if not isinstance(data, dict):
+        return
+    for field in serializer._readable_fields:
+        value = data.get(field.field_name)
+        if value is None:
+            continue
+        if isinstance(field, SideloadedField):
+            ids = found.setdefault(field.collection, {})
+            for pk in value if field.many else (value,):
+                ids.setdefault(pk)
+        elif isinstance(field, serializers.BaseSerializer):
+            _collect(field, value, found)
+
+
+def included(request):
+    """
+    The ``included`` section for the serializers rendered during ``request``:
+    every referenced object serialized once, per collection and id
+    """
+    roots = getattr(request, '_sideload_roots', None)
+    if not roots:
+        return None
+    context = roots[0]._context
+    result = {name: {} for name in requested(request)}
+    found, seen, processed = {}, set(), 0
+    while True:
+        while processed < len(roots):
+            root = roots[processed]
+            processed += 1
+            if hasattr(root, '_data'):
+                _collect(root, root._data, found)
+        missing = {
+            collection: [pk for pk in ids if (collection, pk) not in seen]
+            for collection, ids in found.items()
+        }
+        missing = {collection: pks for collection, pks in missing.items() if pks}
+        if not missing:
+            return result
+        for collection, pks in missing.items():
+            seen.update((collection, pk) for pk in pks)
+            serializer_class, queryset = _collections[collection]
+            objects = queryset.in_bulk(pks)
+            instances = [objects[pk] for pk in pks if pk in objects]
+            serializer = serializer_class(instances, many=True, context=context)
+            roots.append(serializer)
+            for instance, data in zip(instances, serializer.data):
+                result[collection][str(instance.pk)] = data
+
+
+class SideloadViewMixin:
+    """Adds the ``included`` section to responses rendered with ``?include=``"""
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        # Cached fragments skip building nested serializers, so they cannot track themselves
+        if requested(self.request):
+            _track(self.request, serializer)
+        return serializer
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        data = getattr(response, 'data', None)
+        if data is not None and 200 <= response.status_code < 300:
+            sideloaded = included(request)
+            if sideloaded is not None:
+                if isinstance(data, dict):
+                    data['included'] = sideloaded
+                else:
+                    response.data = {'data': data, 'included': sideloaded}
+        return super().finalize_response(request, response, *args, **kwargs)
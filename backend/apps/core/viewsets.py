@@ -7,9 +7,11 @@ from rest_framework import viewsets, status
 from rest_framework.response import Response
 from django.utils import timezone
 from .response import APIResponse
+from .planner import QueryPlanMixin
+from .sideload import SideloadViewMixin
 
 
-class BaseViewSet(viewsets.ModelViewSet):
+class BaseViewSet(QueryPlanMixin, SideloadViewMixin, viewsets.ModelViewSet):
     """
     Base viewset with common functionality for all API endpoints
     Provides consistent response formatting and error handling
@@ -0,0 +1,14 @@
+from django.contrib import admin
+from .models import RollupState, StatusCounter
+
+
+@admin.register(RollupState)
+class RollupStateAdmin(admin.ModelAdmin):
+    list_display = ['name', 'watermark', 'days_processed', 'duration_ms', 'updated_at']
+    readonly_fields = ['name', 'watermark', 'days_processed', 'duration_ms', 'created_at', 'updated_at']
+
+
+@admin.register(StatusCounter)
+class StatusCounterAdmin(admin.ModelAdmin):
+    list_display = ['name', 'value', 'updated_at']
+    readonly_fields = ['name', 'value', 'created_at', 'updated_at']
@@ -0,0 +1,109 @@
+"""
+Live status counters for the admin badges
+("N pending bookings", "N new inquiries", ...)
+
+Each counter is a StatusCounter row, adjusted with an F() update in the
+same transaction as the write that changes a record's status: by signal
+handlers for single-row saves and deletes (see signals.py), and by
+adjust() in the bulk code paths that bypass signals. All counters are
+mirrored under a single key of the two-tier cache that is dropped when
+the transaction commits, so polling the badges is usually served from
+process memory. recount() recomputes
+every counter from the source tables and corrects any drift; run it
+periodically with the recount_status_counters command.
+"""
+
+import logging
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from apps.core.cache import tiered_cache
+
+from .models import StatusCounter
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY = 'dashboard:status-counters'
+# Bounds how long a value read concurrently with a write can be served
+CACHE_TIMEOUT = 60
+
+# name: (model label, field, value counted)
+COUNTERS = {
+    'pending_bookings': ('bookings.Booking', 'status', 'PENDING'),
+    'new_inquiries': ('tours.Inquiry', 'status', 'NEW'),
+    'pending_custom_packages': ('tours.CustomPackage', 'status', 'PENDING'),
+    'pending_refunds': ('payments.Refund', 'status', 'PENDING'),
+    'unverified_reviews': ('reviews.Review', 'is_verified', False),
+}
+
+
+def counters_for(model):
+    """(name, field, value) of the counters that count rows of ``model``"""
+    label = model._meta.label
+    return [(name, field, value) for name, (counter_label, field, value) in COUNTERS.items()
+            if counter_label == label]
+
+
+def _refresh_cache_on_commit():
+    tiered_cache.invalidate([CACHE_KEY])
+
+
+def adjust(changes):
+    """
+    Apply ``{name: delta}`` to the counters inside the current transaction.
+    Callers that update rows in bulk use this with the number of rows that
+    entered or left a counted status.
+    """
+    changes = {name: delta for name, delta in changes.items() if delta}
+    if not changes:
+        return
+    for name, delta in changes.items():
+        StatusCounter.objects.filter(name=name).update(value=F('value') + delta, updated_at=timezone.now())
+    _refresh_cache_on_commit()
+
+
+def recount(names=None):
+    """
+    Recompute counters from the source tables and store them. The counter
+    rows stay locked while counting, so concurrent adjustments apply on top
+    of the recount instead of being lost. Returns {name: (old, new)} for the
+    counters that had drifted.
+    """
+    names = list(names or COUNTERS)
+    drift = {}
+    with transaction.atomic():
+        existing = {
+            counter.name: counter
+            for counter in StatusCounter.objects.select_for_update().filter(name__in=names)
+        }
+        for name in names:
+            label, field, value = COUNTERS[name]
+            actual = apps.get_model(label).objects.filter(**{field: value}).count()
+            counter = existing.get(name)
+            if counter is None:
+                StatusCounter.objects.create(name=name, value=actual)
+            elif counter.value != actual:
+                drift[name] = (counter.value, actual)
+                counter.value = actual
+                counter.save(update_fields=['value', 'updated_at'])
+        _refresh_cache_on_commit()
+    if drift:
+        logger.warning(f"Status counters drifted and were corrected: {drift}")
+    return drift
+
+
+def _read_counts():
+    counts = dict(StatusCounter.objects.filter(name__in=COUNTERS).values_list('name', 'value'))
+    if len(counts) < len(COUNTERS):
+        # First use: create the missing rows from a full count
+        recount([name for name in COUNTERS if name not in counts])
+        counts = dict(StatusCounter.objects.filter(name__in=COUNTERS).values_list('name', 'value'))
+    return {name: max(counts.get(name, 0), 0) for name in COUNTERS}
+
+
+def get_counts():
+    """All counters as {name: value}, from the cache when possible"""
+    return tiered_cache.get_or_set(CACHE_KEY, _read_counts, timeout=CACHE_TIMEOUT)
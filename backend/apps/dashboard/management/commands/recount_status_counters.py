@@ -0,0 +1,22 @@
+"""
+Management command to recount the admin badge counters from the source
+tables, correcting drift left by writes that bypassed the counter
+updates (raw SQL, shell edits, deferred-field saves). Schedule it every
+few minutes alongside update_dashboard_rollups.
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.dashboard import counters
+
+
+class Command(BaseCommand):
+    help = 'Recount the admin status counters and correct any drift'
+
+    def handle(self, *args, **options):
+        drift = counters.recount()
+        for name, (old, new) in drift.items():
+            self.stdout.write(f"{name}: {old} -> {new}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Recounted {len(counters.COUNTERS)} counters, {len(drift)} corrected"
+        ))
@@ -0,0 +1,52 @@
+"""
+Management command to bring the admin dashboard rollup tables up to date
+
+Only days whose bookings, payments, refunds, invoices, inquiries or custom
+packages changed since the previous run are recomputed, so it is cheap to
+run every few minutes from cron. --rebuild recomputes every day (or the
+--from/--to range), e.g. after data was deleted.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.dashboard.rollups import update_rollups
+
+
+class Command(BaseCommand):
+    help = 'Update the daily dashboard rollups for days changed since the last run'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Recompute every day instead of only changed days',
+        )
+        parser.add_argument(
+            '--from',
+            dest='date_from',
+            help='Only process days on or after this date (YYYY-MM-DD)',
+        )
+        parser.add_argument(
+            '--to',
+            dest='date_to',
+            help='Only process days on or before this date (YYYY-MM-DD)',
+        )
+
+    def handle(self, *args, **options):
+        from django.utils.dateparse import parse_date
+
+        bounds = {}
+        for key in ('date_from', 'date_to'):
+            if options[key]:
+                bounds[key] = parse_date(options[key])
+                if bounds[key] is None:
+                    raise CommandError(f"Invalid date: {options[key]}")
+
+        metrics = update_rollups(rebuild=options['rebuild'], **bounds)
+        if metrics['days_processed']:
+            span = f" ({metrics['first_day']} to {metrics['last_day']})"
+        else:
+            span = ''
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {metrics['days_processed']} days{span} in {metrics['duration_ms']}ms"
+        ))
@@ -0,0 +1,108 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:06
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('tours', '0003_inquiry_anonymous_token'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRevenueStat',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, help_text='Unique identifier for this record', primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='Timestamp when this record was created')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='Timestamp when this record was last updated')),
+                ('day', models.DateField(unique=True)),
+                ('payments_count', models.PositiveIntegerField(default=0)),
+                ('payments_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('invoices_count', models.PositiveIntegerField(default=0)),
+                ('invoiced_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('tax_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('discount_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('refunds_count', models.PositiveIntegerField(default=0)),
+                ('refunds_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'db_table': 'dashboard_daily_revenue_stat',
+                'ordering': ['day'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RollupState',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, help_text='Unique identifier for this record', primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='Timestamp when this record was created')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='Timestamp when this record was last updated')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('watermark', models.DateTimeField()),
+                ('days_processed', models.PositiveIntegerField(default=0)),
+                ('duration_ms', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'dashboard_rollup_state',
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyCustomPackageStat',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, help_text='Unique identifier for this record', primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='Timestamp when this record was created')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='Timestamp when this record was last updated')),
+                ('day', models.DateField()),
+                ('status', models.CharField(max_length=15)),
+                ('requests', models.PositiveIntegerField(default=0)),
+                ('participants', models.PositiveIntegerField(default=0)),
+                ('quoted_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'db_table': 'dashboard_daily_custom_package_stat',
+                'ordering': ['day'],
+                'unique_together': {('day', 'status')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyInquiryStat',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, help_text='Unique identifier for this record', primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='Timestamp when this record was created')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='Timestamp when this record was last updated')),
+                ('day', models.DateField()),
+                ('status', models.CharField(max_length=20)),
+                ('inquiries', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'dashboard_daily_inquiry_stat',
+                'ordering': ['day'],
+                'unique_together': {('day', 'status')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyBookingStat',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, help_text='Unique identifier for this record', primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='Timestamp when this record was created')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='Timestamp when this record was last updated')),
+                ('day', models.DateField()),
+                ('status', models.CharField(max_length=50)),
+                ('bookings', models.PositiveIntegerField(default=0)),
+                ('travelers', models.PositiveIntegerField(default=0)),
+                ('gross_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('discount_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('tour', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_booking_stats', to='tours.tour')),
+            ],
+            options={
+                'db_table': 'dashboard_daily_booking_stat',
+                'ordering': ['day'],
+                'indexes': [models.Index(fields=['day', 'status'], name='dashboard_d_day_027265_idx')],
+                'unique_together': {('day', 'tour', 'status')},
+            },
+        ),
+    ]
@@ -0,0 +1,112 @@
+"""
+Daily rollup tables for the admin operations dashboard
+Rows are derived data: apps.dashboard.rollups rewrites the rows of every
+day whose source records changed, so they can be rebuilt at any time
+"""
+
+from django.db import models
+from apps.core.models import BaseModel
+
+
+class DailyBookingStat(BaseModel):
+    """Bookings made on a day, per tour and current booking status"""
+    day = models.DateField()
+    tour = models.ForeignKey(
+        'tours.Tour',
+        on_delete=models.CASCADE,
+        related_name='daily_booking_stats'
+    )
+    status = models.CharField(max_length=50)
+    bookings = models.PositiveIntegerField(default=0)
+    travelers = models.PositiveIntegerField(default=0)
+    gross_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    discount_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = 'dashboard_daily_booking_stat'
+        ordering = ['day']
+        unique_together = ['day', 'tour', 'status']
+        indexes = [
+            models.Index(fields=['day', 'status']),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.tour_id} {self.status}: {self.bookings}"
+
+
+class DailyRevenueStat(BaseModel):
+    """Money in and out on a day"""
+    day = models.DateField(unique=True)
+    payments_count = models.PositiveIntegerField(default=0)
+    payments_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    invoices_count = models.PositiveIntegerField(default=0)
+    invoiced_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    tax_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    discount_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    refunds_count = models.PositiveIntegerField(default=0)
+    refunds_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = 'dashboard_daily_revenue_stat'
+        ordering = ['day']
+
+    def __str__(self):
+        return f"{self.day}: {self.payments_amount}"
+
+
+class DailyInquiryStat(BaseModel):
+    """Inquiries received on a day, per current status"""
+    day = models.DateField()
+    status = models.CharField(max_length=20)
+    inquiries = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'dashboard_daily_inquiry_stat'
+        ordering = ['day']
+        unique_together = ['day', 'status']
+
+    def __str__(self):
+        return f"{self.day} {self.status}: {self.inquiries}"
+
+
+class DailyCustomPackageStat(BaseModel):
+    """Custom package requests received on a day, per current status"""
+    day = models.DateField()
+    status = models.CharField(max_length=15)
+    requests = models.PositiveIntegerField(default=0)
+    participants = models.PositiveIntegerField(default=0)
+    quoted_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = 'dashboard_daily_custom_package_stat'
+        ordering = ['day']
+        unique_together = ['day', 'status']
+
+    def __str__(self):
+        return f"{self.day} {self.status}: {self.requests}"
+
+
+class RollupState(BaseModel):
+    """Watermark of the last rollup run: source rows changed after it are reprocessed"""
+    name = models.CharField(max_length=50, unique=True)
+    watermark = models.DateTimeField()
+    days_processed = models.PositiveIntegerField(default=0)
+    duration_ms = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'dashboard_rollup_state'
+
+    def __str__(self):
+        return f"{self.name} @ {self.watermark}"
+
+
+class StatusCounter(BaseModel):
+    """Number of records currently in a status shown as an admin badge (see counters.py)"""
+    name = models.CharField(max_length=50, unique=True)
+    value = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'dashboard_status_counter'
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
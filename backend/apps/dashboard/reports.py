@@ -0,0 +1,177 @@
+"""
+Admin dashboard figures read from the daily rollup tables
+A date range costs a handful of grouped queries over at most one row per
+day (per tour and status for bookings), independent of booking volume.
+"""
+
+import datetime
+from decimal import Decimal
+
+from django.db.models import F, Q, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+
+from .models import (
+    DailyBookingStat, DailyCustomPackageStat, DailyInquiryStat,
+    DailyRevenueStat, RollupState
+)
+from .rollups import CANCELLED_STATUSES, STATE_NAME
+
+CONVERTED_STATUSES = ['CONFIRMED', 'COMPLETED']
+ANSWERED_INQUIRY_STATUSES = ['RESPONDED', 'CLOSED']
+
+_PERIODS = {
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+
+def _money(value):
+    return str(Decimal(value or 0).quantize(Decimal('0.01')))
+
+
+def _rate(part, whole):
+    return round(part / whole, 4) if whole else None
+
+
+def _periods(date_from, date_to, interval):
+    """Start date of every period in the range, so empty periods still appear"""
+    if interval == 'month':
+        current = date_from.replace(day=1)
+    elif interval == 'week':
+        current = date_from - datetime.timedelta(days=date_from.weekday())
+    else:
+        current = date_from
+    while current <= date_to:
+        yield current
+        if interval == 'month':
+            current = (current.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+        else:
+            current += datetime.timedelta(days=7 if interval == 'week' else 1)
+
+
+def _by_period(queryset, interval, **aggregates):
+    period = _PERIODS[interval]('day') if interval in _PERIODS else F('day')
+    rows = queryset.annotate(period=period).values('period').annotate(**aggregates).order_by()
+    return {row.pop('period'): row for row in rows}
+
+
+def dashboard_data(date_from, date_to, interval='day', top=10):
+    """Totals, breakdowns and a per-period series for ``date_from``..``date_to``"""
+    in_range = {'day__range': (date_from, date_to)}
+    bookings = DailyBookingStat.objects.filter(**in_range)
+    revenue = DailyRevenueStat.objects.filter(**in_range)
+    inquiries = DailyInquiryStat.objects.filter(**in_range)
+    custom_packages = DailyCustomPackageStat.objects.filter(**in_range)
+    open_value = Sum('gross_amount', filter=~Q(status__in=CANCELLED_STATUSES))
+
+    by_status = {
+        row['status']: {
+            'bookings': row['bookings'],
+            'travelers': row['travelers'],
+            'gross_amount': _money(row['gross_amount']),
+        }
+        for row in bookings.values('status').annotate(
+            bookings=Sum('bookings'), travelers=Sum('travelers'), gross_amount=Sum('gross_amount')
+        ).order_by('status')
+    }
+    total_bookings = sum(row['bookings'] for row in by_status.values())
+    converted = sum(by_status.get(key, {}).get('bookings', 0) for key in CONVERTED_STATUSES)
+
+    top_tours = [
+        {
+            'tour': row['tour_id'],
+            'name': row['tour__name'],
+            'bookings': row['bookings'],
+            'travelers': row['travelers'],
+            'booking_value': _money(row['booking_value']),
+        }
+        for row in bookings.values('tour_id', 'tour__name').annotate(
+            bookings=Sum('bookings'), travelers=Sum('travelers'), booking_value=open_value
+        ).order_by(F('booking_value').desc(nulls_last=True), '-bookings')[:top]
+    ]
+
+    money = revenue.aggregate(
+        payments_count=Sum('payments_count'),
+        payments_amount=Sum('payments_amount'),
+        invoiced_amount=Sum('invoiced_amount'),
+        tax_amount=Sum('tax_amount'),
+        discount_amount=Sum('discount_amount'),
+        refunds_count=Sum('refunds_count'),
+        refunds_amount=Sum('refunds_amount'),
+    )
+
+    inquiries_by_status = dict(
+        inquiries.values_list('status').annotate(total=Sum('inquiries')).order_by('status')
+    )
+    packages_by_status = {
+        row['status']: {
+            'requests': row['requests'],
+            'participants': row['participants'],
+            'quoted_amount': _money(row['quoted_amount']),
+        }
+        for row in custom_packages.values('status').annotate(
+            requests=Sum('requests'), participants=Sum('participants'), quoted_amount=Sum('quoted_amount')
+        ).order_by('status')
+    }
+    total_inquiries = sum(inquiries_by_status.values())
+    total_packages = sum(row['requests'] for row in packages_by_status.values())
+
+    booking_series = _by_period(bookings, interval, bookings=Sum('bookings'), booking_value=open_value)
+    revenue_series = _by_period(
+        revenue, interval,
+        payments_amount=Sum('payments_amount'), tax_amount=Sum('tax_amount'),
+        discount_amount=Sum('discount_amount'), refunds_amount=Sum('refunds_amount'),
+    )
+    inquiry_series = _by_period(inquiries, interval, inquiries=Sum('inquiries'))
+    package_series = _by_period(custom_packages, interval, requests=Sum('requests'))
+    series = []
+    for period in _periods(date_from, date_to, interval):
+        booking_row = booking_series.get(period, {})
+        revenue_row = revenue_series.get(period, {})
+        series.append({
+            'period': period,
+            'bookings': booking_row.get('bookings') or 0,
+            'booking_value': _money(booking_row.get('booking_value')),
+            'payments_amount': _money(revenue_row.get('payments_amount')),
+            'tax_amount': _money(revenue_row.get('tax_amount')),
+            'discount_amount': _money(revenue_row.get('discount_amount')),
+            'refunds_amount': _money(revenue_row.get('refunds_amount')),
+            'inquiries': inquiry_series.get(period, {}).get('inquiries') or 0,
+            'custom_packages': package_series.get(period, {}).get('requests') or 0,
+        })
+
+    state = RollupState.objects.filter(name=STATE_NAME).first()
+    return {
+        'date_from': date_from,
+        'date_to': date_to,
+        'interval': interval,
+        'as_of': state.watermark if state else None,
+        'totals': {
+            'bookings': total_bookings,
+            'travelers': sum(row['travelers'] for row in by_status.values()),
+            'payments_count': money['payments_count'] or 0,
+            'payments_amount': _money(money['payments_amount']),
+            'invoiced_amount': _money(money['invoiced_amount']),
+            'tax_amount': _money(money['tax_amount']),
+            'discount_amount': _money(money['discount_amount']),
+            'refunds_count': money['refunds_count'] or 0,
+            'refunds_amount': _money(money['refunds_amount']),
+            'net_revenue': _money((money['payments_amount'] or 0) - (money['refunds_amount'] or 0)),
+            'inquiries': total_inquiries,
+            'custom_packages': total_packages,
+        },
+        'conversion': {
+            'booking_confirmation_rate': _rate(converted, total_bookings),
+            'inquiry_response_rate': _rate(
+                sum(inquiries_by_status.get(key, 0) for key in ANSWERED_INQUIRY_STATUSES), total_inquiries
+            ),
+            'custom_package_conversion_rate': _rate(
+                packages_by_status.get('CONFIRMED', {}).get('requests', 0), total_packages
+            ),
+        },
+        'bookings_by_status': by_status,
+        'top_tours': top_tours,
+        'inquiries_by_status': inquiries_by_status,
+        'custom_packages_by_status': packages_by_status,
+        'series': series,
+    }
@@ -0,0 +1,275 @@
+"""
+Incremental maintenance of the dashboard rollup tables
+
+A run finds the days touched by source rows updated since the previous
+run's watermark (bookings, payments, refunds, invoices, inquiries, custom
+packages; every bulk write in this codebase sets updated_at), recomputes
+all rollups for those days with a few grouped queries per window of
+days, and swaps the rows in one transaction per window. The first run,
+and ``rebuild``, process every day. Hard deletes of source rows are not
+seen by the watermark; rebuild the affected range after purging data.
+"""
+
+import datetime
+import logging
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from apps.bookings.models import Booking
+from apps.payments.models import Invoice, Payment, Refund
+from apps.tours.models import CustomPackage, Inquiry
+from .models import (
+    DailyBookingStat, DailyCustomPackageStat, DailyInquiryStat,
+    DailyRevenueStat, RollupState
+)
+
+logger = logging.getLogger(__name__)
+
+STATE_NAME = 'dashboard'
+# Rows committed by transactions that started before the previous run
+# carry an updated_at slightly older than its watermark
+WATERMARK_OVERLAP = datetime.timedelta(minutes=5)
+# Longest span of days recomputed with one set of range queries
+WINDOW_DAYS = 31
+BULK_BATCH_SIZE = 500
+
+CANCELLED_STATUSES = ['CANCELLED', 'CANCELLED_REFUNDED', 'CANCELLED_NOT_REFUNDED']
+PAID_STATUSES = ['SUCCESS', 'REFUNDED']
+
+ZERO = Decimal('0')
+
+ROLLUP_MODELS = [DailyBookingStat, DailyRevenueStat, DailyInquiryStat, DailyCustomPackageStat]
+
+
+def _sources():
+    """(queryset, date expressions that decide which day a row is counted on)"""
+    return [
+        (Booking.objects.all(), [TruncDate('booking_date')]),
+        (Payment.objects.all(), [TruncDate('created_at'), TruncDate('processed_at')]),
+        (Refund.objects.all(), [TruncDate('processed_at')]),
+        (Invoice.objects.all(), [F('issued_date')]),
+        (Inquiry.objects.all(), [TruncDate('created_at')]),
+        (CustomPackage.objects.all(), [TruncDate('created_at')]),
+    ]
+
+
+def changed_days(since=None):
+    """Days counted by any source row updated after ``since`` (every day when None)"""
+    days = set()
+    for queryset, expressions in _sources():
+        if since is not None:
+            queryset = queryset.filter(updated_at__gt=since)
+        for expression in expressions:
+            days.update(
+                queryset.order_by().annotate(rollup_day=expression)
+                .values_list('rollup_day', flat=True).distinct()
+            )
+    days.discard(None)
+    return days
+
+
+def _start_of(day):
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def _windows(days):
+    """Sorted days split into runs spanning at most WINDOW_DAYS"""
+    window = []
+    for day in sorted(days):
+        if window and (day - window[0]).days >= WINDOW_DAYS:
+            yield window
+            window = []
+        window.append(day)
+    if window:
+        yield window
+
+
+def _in_window(field, days):
+    """Filter on a datetime field: within the window's range and on one of its days"""
+    return Q(**{
+        f'{field}__gte': _start_of(days[0]),
+        f'{field}__lt': _start_of(days[-1] + datetime.timedelta(days=1)),
+    })
+
+
+def _booking_rows(days):
+    rows = (
+        Booking.objects.filter(_in_window('booking_date', days))
+        .annotate(day=TruncDate('booking_date'))
+        .filter(day__in=days)
+        .order_by()
+        .values('day', 'tour_id', 'status')
+        .annotate(
+            bookings=Count('id'),
+            travelers=Sum('travelers_count'),
+            gross_amount=Sum('total_price'),
+            discount_amount=Sum('discount_amount'),
+        )
+    )
+    return [
+        DailyBookingStat(
+            day=row['day'],
+            tour_id=row['tour_id'],
+            status=row['status'],
+            bookings=row['bookings'],
+            travelers=row['travelers'] or 0,
+            gross_amount=row['gross_amount'] or ZERO,
+            discount_amount=row['discount_amount'] or ZERO,
+        )
+        for row in rows
+    ]
+
+
+def _revenue_rows(days, booking_rows):
+    revenue = defaultdict(dict)
+
+    paid_on = Coalesce('processed_at', 'created_at')
+    payments = (
+        Payment.objects.filter(status__in=PAID_STATUSES)
+        .filter(
+            _in_window('processed_at', days)
+            | (Q(processed_at__isnull=True) & _in_window('created_at', days))
+        )
+        .annotate(day=TruncDate(paid_on))
+        .filter(day__in=days)
+        .order_by()
+        .values('day')
+        .annotate(count=Count('id'), amount=Sum('amount'))
+    )
+    for row in payments:
+        revenue[row['day']].update(payments_count=row['count'], payments_amount=row['amount'])
+
+    invoices = (
+        Invoice.objects.filter(issued_date__in=days)
+        .exclude(status='CANCELLED')
+        .order_by()
+        .values('issued_date')
+        .annotate(count=Count('id'), amount=Sum('amount'), tax=Sum('tax_amount'))
+    )
+    for row in invoices:
+        revenue[row['issued_date']].update(
+            invoices_count=row['count'], invoiced_amount=row['amount'], tax_amount=row['tax']
+        )
+
+    refunds = (
+        Refund.objects.filter(status='PROCESSED')
+        .filter(_in_window('processed_at', days))
+        .annotate(day=TruncDate('processed_at'))
+        .filter(day__in=days)
+        .order_by()
+        .values('day')
+        .annotate(count=Count('id'), amount=Sum('amount'))
+    )
+    for row in refunds:
+        revenue[row['day']].update(refunds_count=row['count'], refunds_amount=row['amount'])
+
+    # Discounts granted on bookings made that day and not cancelled since
+    for stat in booking_rows:
+        if stat.status not in CANCELLED_STATUSES and stat.discount_amount:
+            values = revenue[stat.day]
+            values['discount_amount'] = values.get('discount_amount', ZERO) + stat.discount_amount
+
+    return [
+        DailyRevenueStat(day=day, **{key: value or 0 for key, value in values.items()})
+        for day, values in revenue.items()
+    ]
+
+
+def _inquiry_rows(days):
+    rows = (
+        Inquiry.objects.filter(_in_window('created_at', days))
+        .annotate(day=TruncDate('created_at'))
+        .filter(day__in=days)
+        .order_by()
+        .values('day', 'status')
+        .annotate(inquiries=Count('id'))
+    )
+    return [DailyInquiryStat(**row) for row in rows]
+
+
+def _custom_package_rows(days):
+    rows = (
+        CustomPackage.objects.filter(_in_window('created_at', days))
+        .annotate(day=TruncDate('created_at'))
+        .filter(day__in=days)
+        .order_by()
+        .values('day', 'status')
+        .annotate(requests=Count('id'), participants=Sum('participants_count'), quoted_amount=Sum('quoted_price'))
+    )
+    return [
+        DailyCustomPackageStat(
+            day=row['day'],
+            status=row['status'],
+            requests=row['requests'],
+            participants=row['participants'] or 0,
+            quoted_amount=row['quoted_amount'] or ZERO,
+        )
+        for row in rows
+    ]
+
+
+def rebuild_days(days):
+    """Recompute every rollup for ``days``; returns the number of days processed"""
+    processed = 0
+    for window in _windows(days):
+        booking_rows = _booking_rows(window)
+        rows = {
+            DailyBookingStat: booking_rows,
+            DailyRevenueStat: _revenue_rows(window, booking_rows),
+            DailyInquiryStat: _inquiry_rows(window),
+            DailyCustomPackageStat: _custom_package_rows(window),
+        }
+        with transaction.atomic():
+            for model, objects in rows.items():
+                model.objects.filter(day__in=window).delete()
+                model.objects.bulk_create(objects, batch_size=BULK_BATCH_SIZE)
+        processed += len(window)
+    return processed
+
+
+def update_rollups(rebuild=False, date_from=None, date_to=None):
+    """
+    Bring the rollups up to date. Only days changed since the last run
+    are processed, unless ``rebuild`` is set or there was no previous run;
+    ``date_from``/``date_to`` limit the days processed. Returns a dict of
+    run metrics.
+    """
+    started = time.monotonic()
+    run_at = timezone.now()
+    state = RollupState.objects.filter(name=STATE_NAME).first()
+    since = None if rebuild or state is None else state.watermark - WATERMARK_OVERLAP
+
+    days = changed_days(since)
+    if date_from:
+        days = {day for day in days if day >= date_from}
+    if date_to:
+        days = {day for day in days if day <= date_to}
+
+    processed = rebuild_days(days)
+    if since is None and not (date_from or date_to):
+        # Days that no longer have any source rows were not rewritten
+        for model in ROLLUP_MODELS:
+            model.objects.filter(created_at__lt=run_at).delete()
+    duration_ms = round((time.monotonic() - started) * 1000)
+    if not (date_from or date_to):
+        # A partial range does not cover every change, so it keeps the watermark
+        RollupState.objects.update_or_create(
+            name=STATE_NAME,
+            defaults={'watermark': run_at, 'days_processed': processed, 'duration_ms': duration_ms},
+        )
+
+    metrics = {
+        'since': since,
+        'days_processed': processed,
+        'first_day': min(days) if days else None,
+        'last_day': max(days) if days else None,
+        'duration_ms': duration_ms,
+    }
+    logger.info(f"Dashboard rollups updated: {metrics}")
+    return metrics
@@ -0,0 +1,25 @@
+from datetime import timedelta
+
+from django.utils import timezone
+from rest_framework import serializers
+
+
+class DashboardQuerySerializer(serializers.Serializer):
+    """Date range and grouping for the admin dashboard; defaults to the last 30 days"""
+    INTERVAL_CHOICES = ['day', 'week', 'month']
+    DEFAULT_DAYS = 30
+    MAX_DAYS = 731
+
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    interval = serializers.ChoiceField(choices=INTERVAL_CHOICES, required=False, default='day')
+    top = serializers.IntegerField(required=False, default=10, min_value=1, max_value=50)
+
+    def validate(self, attrs):
+        attrs['date_to'] = attrs.get('date_to') or timezone.localdate()
+        attrs['date_from'] = attrs.get('date_from') or attrs['date_to'] - timedelta(days=self.DEFAULT_DAYS - 1)
+        if attrs['date_from'] > attrs['date_to']:
+            raise serializers.ValidationError("date_from must be on or before date_to")
+        if (attrs['date_to'] - attrs['date_from']).days >= self.MAX_DAYS:
+            raise serializers.ValidationError(f"Date range cannot exceed {self.MAX_DAYS} days")
+        return attrs
@@ -0,0 +1,54 @@
+"""
+Signal handlers keeping the status counters current
+Each counted instance remembers, when loaded, which counters it falls
+under; post_save and post_delete compare that with its state after the
+write and adjust the counters in the same transaction.
+"""
+
+from django.apps import apps
+from django.db.models.signals import post_delete, post_init, post_save
+
+from . import counters
+
+_STATE_ATTR = '_status_counters'
+
+
+def _state(instance, definitions):
+    """{name: counted?} for the instance, None where the field was not loaded"""
+    values = instance.__dict__
+    return {
+        name: (values[field] == value) if field in values else None
+        for name, field, value in definitions
+    }
+
+
+def _remember(sender, instance, **kwargs):
+    setattr(instance, _STATE_ATTR, _state(instance, counters.counters_for(sender)))
+
+
+def _saved(sender, instance, created, **kwargs):
+    definitions = counters.counters_for(sender)
+    before = {} if created else getattr(instance, _STATE_ATTR, {})
+    after = _state(instance, definitions)
+    changes = {}
+    for name, _, _ in definitions:
+        old, new = bool(before.get(name)), after[name]
+        if new is None or (not created and before.get(name) is None):
+            # Field not loaded (deferred): left to the periodic recount
+            continue
+        changes[name] = int(new) - int(old)
+    counters.adjust(changes)
+    setattr(instance, _STATE_ATTR, after)
+
+
+def _deleted(sender, instance, **kwargs):
+    state = getattr(instance, _STATE_ATTR, {})
+    counters.adjust({name: -1 for name, counted in state.items() if counted})
+
+
+def connect():
+    for label in {label for label, _, _ in counters.COUNTERS.values()}:
+        model = apps.get_model(label)
+        post_init.connect(_remember, sender=model, dispatch_uid=f'status-counters-init-{label}')
+        post_save.connect(_saved, sender=model, dispatch_uid=f'status-counters-save-{label}')
+        post_delete.connect(_deleted, sender=model, dispatch_uid=f'status-counters-delete-{label}')
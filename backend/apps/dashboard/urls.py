@@ -0,0 +1,7 @@
+from django.urls import path
+from .views import DashboardView, StatusCountersView
+
+urlpatterns = [
+    path('', DashboardView.as_view(), name='dashboard'),
+    path('counters/', StatusCountersView.as_view(), name='dashboard-counters'),
+]
@@ -0,0 +1,41 @@
+from rest_framework import status
+from rest_framework.views import APIView
+
+from apps.core.permissions import IsAdminUser
+from apps.core.response import APIResponse
+from .counters import get_counts
+from .reports import dashboard_data
+from .serializers import DashboardQuerySerializer
+
+
+class DashboardView(APIView):
+    """
+    Admin operations dashboard: bookings by status, top tours, revenue,
+    taxes, discounts and refunds, inquiries and custom packages over a date
+    range, read from the daily rollup tables (see update_dashboard_rollups)
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        serializer = DashboardQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return APIResponse.error(
+                message="Invalid dashboard parameters",
+                errors=serializer.errors,
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+        return APIResponse.success(
+            data=dashboard_data(**serializer.validated_data),
+            message="Dashboard retrieved successfully"
+        )
+
+
+class StatusCountersView(APIView):
+    """Badge counts for the admin UI (pending bookings, new inquiries, ...), one cache read"""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return APIResponse.success(
+            data=get_counts(),
+            message="Counters retrieved successfully"
+        )
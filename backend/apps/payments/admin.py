@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Payment, Refund, Invoice
+from .models import Payment, Refund, Invoice, ReconciliationDiscrepancy, PaymentWebhookEvent
 
 
 @admin.register(Payment)
@@ -154,4 +154,34 @@ class InvoiceAdmin(admin.ModelAdmin):
     def get_queryset(self, request):
         return super().get_queryset(request).select_related(
             'booking', 'booking__user', 'booking__tour'
-        )
\ No newline at end of file
+        )
+
+
+@admin.register(ReconciliationDiscrepancy)
+class ReconciliationDiscrepancyAdmin(admin.ModelAdmin):
+    list_display = [
+        'booking', 'kind', 'expected_amount', 'actual_amount',
+        'is_resolved', 'run', 'created_at'
+    ]
+    list_filter = ['kind', 'is_resolved', 'created_at']
+    search_fields = ['booking__id', 'booking__user__email', 'booking__tour__name']
+    readonly_fields = ['id', 'run', 'booking', 'kind', 'expected_amount', 'actual_amount', 'details', 'created_at', 'updated_at']
+    ordering = ['-created_at']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('booking', 'run')
+
+
+@admin.register(PaymentWebhookEvent)
+class PaymentWebhookEventAdmin(admin.ModelAdmin):
+    list_display = ['event_id', 'event_type', 'transaction_id', 'status', 'gateway_created_at', 'received_at']
+    list_filter = ['status', 'event_type', 'received_at']
+    search_fields = ['event_id', 'transaction_id']
+    readonly_fields = [
+        'id', 'event_id', 'event_type', 'transaction_id', 'gateway_created_at', 'payload',
+        'signature', 'received_at', 'status', 'processed_at', 'error', 'created_at', 'updated_at'
+    ]
+    ordering = ['-received_at']
+
+    def has_add_permission(self, request):
+        return False
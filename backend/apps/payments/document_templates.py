@@ -0,0 +1,141 @@
+"""
+Invoice and travel voucher layouts
+Pure functions from a plain context dict to PDF bytes. This module must not
+import Django models: it is loaded by the rendering worker processes, which
+do not set up Django.
+"""
+
+import os
+import tempfile
+
+from apps.core.pdf import PDFWriter
+
+# Bump when a layout changes so cached documents are re-rendered
+TEMPLATE_VERSION = 1
+
+COMPANY_NAME = 'Tours & Travels'
+
+
+def _money(value):
+    return f"Rs. {value}"
+
+
+def _key_values(pdf, rows, label_width=0.3):
+    widths = [label_width, 1 - label_width]
+    for label, value in rows:
+        pdf.table_row([label, value if value not in (None, '') else '-'], widths, size=10)
+
+
+def render_invoice(context):
+    pdf = PDFWriter(title=f"Invoice {context['invoice_number']}", footer=COMPANY_NAME)
+    pdf.heading(COMPANY_NAME, size=18)
+    pdf.paragraph('Tax invoice', size=11, bold=True)
+    pdf.line()
+    pdf.spacer(6)
+
+    _key_values(pdf, [
+        ('Invoice number', context['invoice_number']),
+        ('Issued', context['issued_date']),
+        ('Due', context['due_date']),
+        ('Status', context['status']),
+    ])
+    pdf.spacer(10)
+    pdf.paragraph('Billed to', size=11, bold=True)
+    _key_values(pdf, [
+        ('Customer', context['customer_name']),
+        ('Email', context['customer_email']),
+        ('Contact', context['contact_number']),
+    ])
+    pdf.spacer(10)
+    pdf.paragraph('Booking', size=11, bold=True)
+    _key_values(pdf, [
+        ('Booking reference', context['booking_id']),
+        ('Tour', context['tour_name']),
+        ('Package', context['package_name']),
+        ('Travel date', context['travel_date']),
+        ('Travelers', context['travelers_count']),
+    ])
+
+    pdf.spacer(14)
+    widths = [0.7, 0.3]
+    align = ['left', 'right']
+    pdf.table_row(['Description', 'Amount'], widths, size=10, bold=True, align=align)
+    pdf.line()
+    pdf.table_row([f"{context['tour_name']} ({context['travelers_count']} travelers)",
+                   _money(context['base_amount'])], widths, size=10, align=align)
+    if context['discount_amount'] and context['discount_amount'] != '0.00':
+        pdf.table_row(['Discount', f"- {_money(context['discount_amount'])}"], widths, size=10, align=align)
+    pdf.table_row(['Subtotal', _money(context['amount'])], widths, size=10, align=align)
+    pdf.table_row(['GST (5%)', _money(context['tax_amount'])], widths, size=10, align=align)
+    pdf.line()
+    pdf.table_row(['Total', _money(context['total_amount'])], widths, size=11, bold=True, align=align)
+
+    if context['notes']:
+        pdf.spacer(14)
+        pdf.paragraph('Notes', size=10, bold=True)
+        pdf.paragraph(context['notes'], size=9)
+    return pdf.render()
+
+
+def render_voucher(context):
+    pdf = PDFWriter(title=f"Travel voucher {context['booking_id']}", footer=COMPANY_NAME)
+    pdf.heading(COMPANY_NAME, size=18)
+    pdf.paragraph('Travel voucher', size=11, bold=True)
+    pdf.line()
+    pdf.spacer(6)
+
+    _key_values(pdf, [
+        ('Booking reference', context['booking_id']),
+        ('Status', context['status']),
+        ('Tour', context['tour_name']),
+        ('Package', context['package_name']),
+        ('Travel date', context['travel_date']),
+        ('Duration', f"{context['duration_days']} days"),
+        ('Lead traveler', context['customer_name']),
+        ('Contact', context['contact_number']),
+        ('Emergency contact', context['emergency_contact']),
+        ('Payment', context['payment_status']),
+    ])
+
+    pdf.spacer(12)
+    pdf.paragraph('Travelers', size=11, bold=True)
+    widths = [0.08, 0.57, 0.15, 0.2]
+    pdf.table_row(['#', 'Name', 'Age', 'Category'], widths, bold=True)
+    pdf.line()
+    for number, traveler in enumerate(context['travelers'], start=1):
+        pdf.table_row([number, traveler['name'], traveler['age'], traveler['category']], widths)
+
+    if context['special_requests']:
+        pdf.spacer(12)
+        pdf.paragraph('Special requests', size=10, bold=True)
+        pdf.paragraph(context['special_requests'], size=9)
+
+    pdf.spacer(16)
+    pdf.paragraph('Please carry this voucher and a government photo ID on the day of travel.', size=9)
+    return pdf.render()
+
+
+RENDERERS = {
+    'invoice': render_invoice,
+    'voucher': render_voucher,
+}
+
+
+def render_to_file(kind, context, path):
+    """
+    Render a document and move it into place atomically.
+    Runs in worker processes; returns the path written.
+    """
+    data = RENDERERS[kind](context)
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as handle:
+            handle.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return path
@@ -0,0 +1,301 @@
+"""
+Cached invoice and travel voucher PDFs
+Documents are stored under DOCUMENT_CACHE_ROOT with the SHA-256 of their
+template version and content as file name, so a document is rendered once
+per distinct content and any change to the invoice or booking produces a
+new file. Misses are rendered in a bounded process pool, one render per
+file however many requests ask for it; when the pool is saturated the
+render is handed to the background job queue instead. Files of content
+that changed are never read again; prerender_documents prunes them.
+"""
+
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+
+from apps.core import filecache
+
+from . import document_templates
+
+logger = logging.getLogger(__name__)
+
+RENDER_TASK = 'apps.payments.documents.render_document_job'
+VOUCHER_STATUSES = ['CONFIRMED', 'COMPLETED']
+
+
+class DocumentPending(Exception):
+    """The document is being rendered in the background; retry shortly"""
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _text(value):
+    return '' if value is None else str(value)
+
+
+def _customer_name(user):
+    return (user.get_full_name() or user.username or user.email).strip()
+
+
+def invoice_context(invoice):
+    """Everything printed on an invoice, as plain strings"""
+    booking = invoice.booking
+    return {
+        'invoice_number': invoice.invoice_number,
+        'issued_date': _text(invoice.issued_date),
+        'due_date': _text(invoice.due_date),
+        'status': invoice.get_status_display(),
+        'amount': _text(invoice.amount),
+        'tax_amount': _text(invoice.tax_amount),
+        'total_amount': _text(invoice.total_amount),
+        'notes': invoice.notes or '',
+        'booking_id': _text(booking.id),
+        'base_amount': _text(booking.base_amount if booking.base_amount is not None else invoice.amount),
+        'discount_amount': _text(booking.discount_amount),
+        'customer_name': _customer_name(booking.user),
+        'customer_email': booking.user.email,
+        'contact_number': booking.contact_number,
+        'tour_name': booking.tour.name,
+        'package_name': booking.package.name if booking.package else '',
+        'travel_date': _text(booking.travel_date),
+        'travelers_count': booking.travelers_count,
+    }
+
+
+def voucher_context(booking):
+    """Everything printed on a travel voucher, as plain strings"""
+    travelers = [
+        {'name': traveler.name, 'age': _text(traveler.age), 'category': traveler.get_category_display()}
+        for traveler in booking.travelers.all()
+    ]
+    if not travelers and isinstance(booking.traveler_details, list):
+        travelers = [
+            {'name': _text(item.get('name')), 'age': _text(item.get('age')), 'category': ''}
+            for item in booking.traveler_details if isinstance(item, dict)
+        ]
+    payments = sorted(booking.payments.all(), key=lambda payment: payment.created_at)
+    return {
+        'booking_id': _text(booking.id),
+        'status': booking.get_status_display(),
+        'tour_name': booking.tour.name,
+        'duration_days': booking.tour.duration_days,
+        'package_name': booking.package.name if booking.package else '',
+        'travel_date': _text(booking.travel_date),
+        'customer_name': _customer_name(booking.user),
+        'contact_number': booking.contact_number,
+        'emergency_contact': booking.emergency_contact,
+        'special_requests': booking.special_requests or '',
+        'payment_status': payments[-1].get_status_display() if payments else 'Pending',
+        'travelers': travelers,
+    }
+
+
+CONTEXT_BUILDERS = {
+    'invoice': invoice_context,
+    'voucher': voucher_context,
+}
+
+
+def document_location(kind, context):
+    """(digest, absolute path) for a rendered document"""
+    payload = json.dumps(
+        {'kind': kind, 'version': document_templates.TEMPLATE_VERSION, 'context': context},
+        sort_keys=True,
+        cls=DjangoJSONEncoder
+    )
+    digest = hashlib.sha256(payload.encode()).hexdigest()
+    return digest, _cache_root() / kind / digest[:2] / f'{digest}.pdf'
+
+
+def _cache_root():
+    return Path(_setting('DOCUMENT_CACHE_ROOT', Path(settings.MEDIA_ROOT) / 'documents'))
+
+
+def prune_cache(keep=()):
+    """
+    Delete cached documents not written for DOCUMENT_CACHE_MAX_AGE_DAYS,
+    except the paths in ``keep``; returns the number removed
+    """
+    return filecache.prune(_cache_root(), _setting('DOCUMENT_CACHE_MAX_AGE_DAYS', 30), keep)
+
+
+# Bounded render pool, created on first use in each web process
+_pool = None
+# Reentrant: a callback added to a finished future runs in the adding thread
+_pool_lock = threading.RLock()
+# Renders submitted and not finished yet, by output path; a render holds
+# its slot until it finishes, even after the request stopped waiting
+_in_flight = {}
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: the workers only import document_templates, and forking
+            # a threaded server process is unsafe
+            _pool = ProcessPoolExecutor(
+                max_workers=_setting('DOCUMENT_RENDER_WORKERS', 2),
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        broken, _pool = _pool, None
+    if broken is not None:
+        broken.shutdown(wait=False, cancel_futures=True)
+
+
+def _release(key, future):
+    with _pool_lock:
+        if _in_flight.get(key) is future:
+            del _in_flight[key]
+
+
+def _submit(kind, context, path):
+    """
+    The future rendering ``path``: the one already in flight, or a new
+    one; None when DOCUMENT_RENDER_MAX_PENDING renders are in flight
+    """
+    key = str(path)
+    with _pool_lock:
+        future = _in_flight.get(key)
+        if future is None:
+            if len(_in_flight) >= _setting('DOCUMENT_RENDER_MAX_PENDING', 8):
+                return None
+            future = _get_pool().submit(document_templates.render_to_file, kind, context, key)
+            _in_flight[key] = future
+            future.add_done_callback(lambda done: _release(key, done))
+        return future
+
+
+def _render_in_pool(kind, context, path):
+    try:
+        future = _submit(kind, context, path)
+        if future is None:
+            return False
+        try:
+            future.result(timeout=_setting('DOCUMENT_RENDER_TIMEOUT', 10))
+        except FutureTimeoutError:
+            # Keeps running in the pool; the file appears when it finishes,
+            # and retries meanwhile wait on the same future
+            raise DocumentPending()
+    except BrokenProcessPool:
+        logger.exception("Document render pool failed; recreating it")
+        _reset_pool()
+        return False
+    return True
+
+
+def get_document(kind, obj):
+    """
+    Path of the rendered document for ``obj``, rendering it on a miss.
+    Raises DocumentPending when the render was deferred to the job queue.
+    """
+    context = CONTEXT_BUILDERS[kind](obj)
+    digest, path = document_location(kind, context)
+    if path.exists():
+        return digest, path
+
+    if not _render_in_pool(kind, context, path):
+        from apps.core.jobs import enqueue
+        enqueue(RENDER_TASK, {'kind': kind, 'id': str(obj.pk)})
+        logger.info(f"Render pool busy; queued {kind} {obj.pk}")
+        raise DocumentPending()
+    return digest, path
+
+
+def render_document_job(payload):
+    """Background job handler: render a document that missed the cache"""
+    kind, obj = payload['kind'], load_objects(payload['kind'], [payload['id']])
+    if not obj:
+        return
+    context = CONTEXT_BUILDERS[kind](obj[0])
+    _, path = document_location(kind, context)
+    if not path.exists():
+        document_templates.render_to_file(kind, context, str(path))
+
+
+def load_objects(kind, ids):
+    """Invoices or bookings with everything their document context reads"""
+    from apps.bookings.models import Booking
+    from .models import Invoice
+
+    if kind == 'invoice':
+        return list(
+            Invoice.objects.filter(pk__in=ids)
+            .select_related('booking', 'booking__tour', 'booking__package', 'booking__user')
+        )
+    return list(
+        Booking.objects.filter(pk__in=ids)
+        .select_related('tour', 'package', 'user')
+        .prefetch_related('travelers', 'payments')
+    )
+
+
+def serve(request, digest, path, filename):
+    """
+    Return the cached file. Unchanged documents answer If-None-Match with
+    304; with DOCUMENT_ACCEL_REDIRECT_PREFIX set, the web server sends the
+    file (X-Accel-Redirect) instead of Django.
+    """
+    etag = f'"{digest}"'
+    if request.headers.get('If-None-Match') == etag:
+        return HttpResponseNotModified()
+
+    prefix = _setting('DOCUMENT_ACCEL_REDIRECT_PREFIX', '')
+    if prefix:
+        response = HttpResponse(content_type='application/pdf')
+        response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + path.relative_to(_cache_root()).as_posix()
+        response['Content-Disposition'] = f'inline; filename="{filename}"'
+    else:
+        response = FileResponse(open(path, 'rb'), content_type='application/pdf', filename=filename)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, max-age=3600'
+    return response
+
+
+def render_missing(kind, objects, workers=None, chunksize=8, current=None):
+    """
+    Render every document for ``objects`` that is not cached yet, in a
+    process pool spread across cores. Adds their paths to the ``current``
+    set when given. Returns (rendered, already_cached).
+    """
+    pending = {}
+    cached = 0
+    for obj in objects:
+        context = CONTEXT_BUILDERS[kind](obj)
+        _, path = document_location(kind, context)
+        if current is not None:
+            current.add(path)
+        if path.exists():
+            cached += 1
+        else:
+            pending[str(path)] = context
+
+    if pending:
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            list(pool.map(
+                document_templates.render_to_file,
+                [kind] * len(pending),
+                pending.values(),
+                pending.keys(),
+                chunksize=chunksize,
+            ))
+    return len(pending), cached
@@ -0,0 +1,213 @@
+"""
+Finance batch command with two jobs:
+- overdue: mark DRAFT/SENT invoices past their due date as OVERDUE
+- reconcile: scan bookings in keyset order and record disagreements
+  between booking totals, invoices, successful payments and refunds
+
+The reconciliation reads bookings in fixed-size chunks ordered by id, with
+payment and refund sums computed by aggregate subqueries in the same
+query, so memory stays bounded regardless of table size. Each chunk's
+discrepancies and the run checkpoint are committed together; --resume
+continues the latest unfinished run from its checkpoint.
+"""
+
+import logging
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import DecimalField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.bookings.models import Booking
+from apps.payments.models import (
+    Payment, Refund, Invoice, ReconciliationRun, ReconciliationDiscrepancy
+)
+
+logger = logging.getLogger('apps.payments')
+
+MONEY = DecimalField(max_digits=14, decimal_places=2)
+
+
+def _sum_subquery(model, **filters):
+    """Per-booking SUM(amount) over ``model`` rows matching ``filters``"""
+    totals = (
+        model.objects.filter(booking=OuterRef('pk'), **filters)
+        .order_by()
+        .values('booking')
+        .annotate(total=Sum('amount'))
+        .values('total')[:1]
+    )
+    return Coalesce(Subquery(totals, output_field=MONEY), Value(Decimal('0.00')), output_field=MONEY)
+
+
+def _invoice_field(field):
+    return Subquery(Invoice.objects.filter(booking=OuterRef('pk')).values(field)[:1])
+
+
+class Command(BaseCommand):
+    help = 'Mark overdue invoices and reconcile bookings, invoices, payments and refunds'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'jobs',
+            nargs='*',
+            help='Jobs to run: overdue, reconcile (default: both)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Rows per chunk / transaction',
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Resume the latest unfinished reconciliation run from its checkpoint',
+        )
+        parser.add_argument(
+            '--max-chunks',
+            type=int,
+            default=None,
+            help='Stop after this many reconciliation chunks (resume later with --resume)',
+        )
+
+    def handle(self, *args, **options):
+        jobs = options['jobs'] or ['overdue', 'reconcile']
+        unknown = set(jobs) - {'overdue', 'reconcile'}
+        if unknown:
+            raise CommandError(f"Unknown job(s): {', '.join(sorted(unknown))}")
+        if 'overdue' in jobs:
+            self.mark_overdue(options['chunk_size'])
+        if 'reconcile' in jobs:
+            self.reconcile(options['chunk_size'], options['resume'], options['max_chunks'])
+
+    def mark_overdue(self, chunk_size):
+        """Set-wise DRAFT/SENT -> OVERDUE for invoices past due_date"""
+        started = time.monotonic()
+        today = timezone.now().date()
+        overdue = Invoice.objects.filter(status__in=['DRAFT', 'SENT'], due_date__lt=today)
+
+        total = 0
+        while True:
+            with transaction.atomic():
+                ids = list(
+                    overdue.select_for_update(skip_locked=True)
+                    .order_by()
+                    .values_list('id', flat=True)[:chunk_size]
+                )
+                if not ids:
+                    break
+                total += overdue.filter(id__in=ids).update(status='OVERDUE', updated_at=timezone.now())
+            if len(ids) < chunk_size:
+                break
+
+        duration_ms = round((time.monotonic() - started) * 1000, 1)
+        logger.info(f"finance_sweep overdue: {total} invoices marked OVERDUE in {duration_ms}ms")
+        self.stdout.write(self.style.SUCCESS(f'Marked {total} invoices as OVERDUE ({duration_ms}ms)'))
+
+    def reconcile(self, chunk_size, resume, max_chunks):
+        started = time.monotonic()
+        if resume:
+            run = ReconciliationRun.objects.filter(status='RUNNING').order_by('-created_at').first()
+            if not run:
+                raise CommandError('No unfinished reconciliation run to resume')
+            self.stdout.write(f'Resuming run {run.id} after booking {run.last_booking_id}')
+        else:
+            run = ReconciliationRun.objects.create()
+
+        bookings = Booking.objects.annotate(
+            collected=_sum_subquery(Payment, status__in=['SUCCESS', 'REFUNDED']),
+            refunds_committed=_sum_subquery(Refund, status__in=['APPROVED', 'PROCESSED']),
+            invoice_id=_invoice_field('id'),
+            invoice_status=_invoice_field('status'),
+            invoice_amount=_invoice_field('amount'),
+            invoice_tax=_invoice_field('tax_amount'),
+            invoice_total=_invoice_field('total_amount'),
+        ).order_by('id').values(
+            'id', 'status', 'total_price', 'collected', 'refunds_committed',
+            'invoice_id', 'invoice_status', 'invoice_amount', 'invoice_tax', 'invoice_total',
+        )
+
+        chunks = 0
+        while max_chunks is None or chunks < max_chunks:
+            chunk = bookings
+            if run.last_booking_id:
+                chunk = chunk.filter(id__gt=run.last_booking_id)
+            rows = list(chunk[:chunk_size])
+            if not rows:
+                self._finish(run)
+                break
+
+            discrepancies = []
+            for row in rows:
+                discrepancies.extend(self.check_booking(run, row))
+
+            with transaction.atomic():
+                ReconciliationDiscrepancy.objects.bulk_create(discrepancies, batch_size=500)
+                run.last_booking_id = rows[-1]['id']
+                run.bookings_scanned += len(rows)
+                run.discrepancies_found += len(discrepancies)
+                run.save(update_fields=['last_booking_id', 'bookings_scanned', 'discrepancies_found', 'updated_at'])
+
+            chunks += 1
+            if len(rows) < chunk_size:
+                self._finish(run)
+                break
+        else:
+            self.stdout.write(self.style.WARNING(
+                f'Stopped after {chunks} chunks; continue with --resume'
+            ))
+
+        duration_ms = round((time.monotonic() - started) * 1000, 1)
+        logger.info(
+            f"finance_sweep reconcile: run {run.id} scanned {run.bookings_scanned}, "
+            f"found {run.discrepancies_found} discrepancies in {duration_ms}ms"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Reconciliation {run.status.lower()}: {run.bookings_scanned} bookings scanned, '
+            f'{run.discrepancies_found} discrepancies ({duration_ms}ms)'
+        ))
+
+    def _finish(self, run):
+        run.status = 'COMPLETED'
+        run.finished_at = timezone.now()
+        run.save(update_fields=['status', 'finished_at', 'updated_at'])
+
+    def check_booking(self, run, row):
+        """Return unsaved discrepancy records for one annotated booking row"""
+        found = []
+
+        def flag(kind, expected=None, actual=None, **details):
+            found.append(ReconciliationDiscrepancy(
+                run=run,
+                booking_id=row['id'],
+                kind=kind,
+                expected_amount=expected,
+                actual_amount=actual,
+                details={'booking_status': row['status'], 'invoice_status': row['invoice_status'], **details},
+            ))
+
+        collected = row['collected']
+        if row['refunds_committed'] > collected:
+            flag('REFUNDS_EXCEED_PAYMENTS', expected=collected, actual=row['refunds_committed'])
+
+        if row['invoice_id'] is None:
+            if collected > 0 or row['status'] in ('PENDING', 'CONFIRMED', 'COMPLETED'):
+                flag('MISSING_INVOICE', expected=row['total_price'])
+            return found
+
+        if row['invoice_amount'] != row['total_price']:
+            flag('INVOICE_AMOUNT_MISMATCH', expected=row['total_price'], actual=row['invoice_amount'],
+                 invoice_id=str(row['invoice_id']))
+        if row['invoice_total'] != row['invoice_amount'] + row['invoice_tax']:
+            flag('INVOICE_TOTAL_MISMATCH', expected=row['invoice_amount'] + row['invoice_tax'],
+                 actual=row['invoice_total'], invoice_id=str(row['invoice_id']))
+        if collected > row['invoice_total']:
+            flag('OVERPAID', expected=row['invoice_total'], actual=collected, invoice_id=str(row['invoice_id']))
+        elif row['invoice_status'] == 'PAID' and collected < row['invoice_total']:
+            flag('PAID_INVOICE_UNDERPAID', expected=row['invoice_total'], actual=collected,
+                 invoice_id=str(row['invoice_id']))
+        return found
@@ -0,0 +1,87 @@
+"""
+Management command to pre-render invoice and voucher PDFs for upcoming
+departures, so customers download them from the cache
+Documents whose content is unchanged are skipped; the rest are rendered
+in a process pool across all cores. Afterwards, cached files not written
+for DOCUMENT_CACHE_MAX_AGE_DAYS are deleted, except the ones just found
+current.
+"""
+
+import datetime
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.bookings.models import Booking
+from apps.payments import documents
+from apps.payments.models import Invoice
+
+
+class Command(BaseCommand):
+    help = 'Pre-render invoice and voucher PDFs for upcoming departures'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=30,
+            help='Departures from today up to this many days ahead',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Render processes (default: number of CPUs)',
+        )
+        parser.add_argument(
+            '--skip-invoices',
+            action='store_true',
+        )
+        parser.add_argument(
+            '--skip-vouchers',
+            action='store_true',
+        )
+        parser.add_argument(
+            '--no-prune',
+            action='store_true',
+            help='Keep old cached files',
+        )
+
+    def handle(self, *args, **options):
+        today = datetime.date.today()
+        window = (today, today + datetime.timedelta(days=options['days']))
+        current = set()
+
+        if not options['skip_invoices']:
+            invoice_ids = Invoice.objects.filter(
+                booking__travel_date__range=window,
+                booking__status__in=['PENDING', 'CONFIRMED'],
+            ).exclude(status='CANCELLED').values_list('id', flat=True)
+            self._render('invoice', list(invoice_ids), options['workers'], current)
+
+        if not options['skip_vouchers']:
+            booking_ids = Booking.objects.filter(
+                travel_date__range=window,
+                status__in=documents.VOUCHER_STATUSES,
+            ).values_list('id', flat=True)
+            self._render('voucher', list(booking_ids), options['workers'], current)
+
+        if not options['no_prune']:
+            removed = documents.prune_cache(keep=current)
+            self.stdout.write(self.style.SUCCESS(f"Pruned {removed:,} old cached documents"))
+
+    def _render(self, kind, ids, workers, current):
+        started = time.perf_counter()
+        objects = []
+        for offset in range(0, len(ids), 1000):
+            objects.extend(documents.load_objects(kind, ids[offset:offset + 1000]))
+        loaded = time.perf_counter()
+        rendered, cached = documents.render_missing(kind, objects, workers=workers, current=current)
+        finished = time.perf_counter()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{kind}s: {rendered:,} rendered, {cached:,} already cached "
+            f"(load {loaded - started:.2f}s, render {finished - loaded:.2f}s"
+            + (f", {rendered / (finished - loaded):,.0f}/s" if rendered else '')
+            + ')'
+        ))
@@ -0,0 +1,55 @@
+"""
+Management command to apply received payment gateway webhook events
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.payments.webhooks import apply_pending
+
+
+class Command(BaseCommand):
+    help = 'Apply received payment gateway webhook events to payments, bookings and invoices'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Drain the events received so far and exit',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of events claimed per batch',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=1.0,
+            help='Seconds to wait when there are no new events',
+        )
+
+    def handle(self, *args, **options):
+        totals = {'APPLIED': 0, 'IGNORED': 0, 'FAILED': 0, 'DEFERRED': 0}
+        started = time.perf_counter()
+
+        while True:
+            outcomes = apply_pending(limit=options['batch_size'])
+            for key, value in outcomes.items():
+                totals[key] += value
+
+            if any(outcomes.values()):
+                continue
+            if options['once']:
+                break
+            time.sleep(options['sleep'])
+
+        elapsed = time.perf_counter() - started
+        processed = sum(totals.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {processed} events in {elapsed:.2f}s: "
+            f"{totals['APPLIED']} applied, {totals['IGNORED']} ignored, {totals['FAILED']} failed, "
+            f"{totals['DEFERRED']} deferred"
+        ))
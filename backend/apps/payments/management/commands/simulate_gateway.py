@@ -0,0 +1,254 @@
+"""
+Management command that plays the payment gateway against the local
+webhook endpoint: creates pending payments, then delivers signed
+succeeded / failed / refunded callbacks for them, including retries,
+duplicates and out-of-order deliveries, and reports ingestion latency.
+
+Intended for development databases only: the simulated payments are
+attached to existing bookings, and applying the events confirms them.
+"""
+
+import json
+import random
+import statistics
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from apps.bookings.models import Booking
+from apps.payments import webhooks
+from apps.payments.models import Payment
+
+
+class Command(BaseCommand):
+    help = 'Replay simulated payment gateway webhooks against the local endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--payments',
+            type=int,
+            default=10_000,
+            help='Number of simulated pending payments',
+        )
+        parser.add_argument(
+            '--failure-rate',
+            type=float,
+            default=0.1,
+            help='Share of payments whose first attempt fails (followed by a retry that succeeds)',
+        )
+        parser.add_argument(
+            '--refund-rate',
+            type=float,
+            default=0.05,
+            help='Share of payments refunded after succeeding',
+        )
+        parser.add_argument(
+            '--duplicate-rate',
+            type=float,
+            default=0.05,
+            help='Share of events delivered twice',
+        )
+        parser.add_argument(
+            '--shuffle-window',
+            type=int,
+            default=20,
+            help='Deliveries are shuffled within windows of this size to simulate reordering',
+        )
+        parser.add_argument(
+            '--url',
+            type=str,
+            default=None,
+            help='POST to a running server at this URL instead of calling the view in-process',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=8,
+            help='Parallel senders when --url is used',
+        )
+        parser.add_argument(
+            '--process',
+            action='store_true',
+            help='Apply the received events afterwards and verify final payment states',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Random seed',
+        )
+
+    def handle(self, *args, **options):
+        if not settings.PAYMENT_WEBHOOK_SECRET:
+            raise CommandError('Set PAYMENT_WEBHOOK_SECRET before simulating the gateway')
+
+        rng = random.Random(options['seed'])
+        booking_ids = list(Booking.objects.values_list('id', flat=True)[:1000])
+        if not booking_ids:
+            raise CommandError('At least one booking is required to attach simulated payments to')
+
+        payments, expected = self._create_payments(rng, booking_ids, options)
+        events = self._build_events(rng, payments, expected, options)
+        self.stdout.write(
+            f"Created {len(payments):,} pending payments; delivering {len(events):,} events..."
+        )
+
+        started = time.perf_counter()
+        if options['url']:
+            latencies, errors = self._deliver_http(events, options['url'], options['concurrency'])
+        else:
+            latencies, errors = self._deliver_in_process(events)
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        self.stdout.write(
+            f"Delivered {len(events):,} events in {elapsed:.2f}s "
+            f"({len(events) / elapsed:,.0f} events/s), {errors} rejected"
+        )
+        if latencies:
+            self.stdout.write(
+                f"  latency p50 {self._percentile(latencies, 50):.2f}ms, "
+                f"p95 {self._percentile(latencies, 95):.2f}ms, "
+                f"p99 {self._percentile(latencies, 99):.2f}ms, "
+                f"mean {statistics.fmean(latencies):.2f}ms"
+            )
+
+        if options['process']:
+            self._process_and_verify(expected)
+
+    def _create_payments(self, rng, booking_ids, options):
+        run = uuid.uuid4().hex[:8].upper()
+        payments = [
+            Payment(
+                booking_id=rng.choice(booking_ids),
+                amount=rng.randint(5_000, 200_000),
+                transaction_id=f"SIM-{run}-{index:06d}",
+            )
+            for index in range(options['payments'])
+        ]
+        Payment.objects.bulk_create(payments, batch_size=1000)
+
+        expected = {}
+        for payment in payments:
+            refunded = rng.random() < options['refund_rate']
+            expected[payment.transaction_id] = 'REFUNDED' if refunded else 'SUCCESS'
+        return payments, expected
+
+    def _build_events(self, rng, payments, expected, options):
+        """Signed-ready event dicts in delivery order"""
+        base = int(time.time()) - 3600
+        events = []
+        for index, payment in enumerate(payments):
+            created = base + index % 3000
+            data = {
+                'transaction_id': payment.transaction_id,
+                'amount': str(payment.amount),
+                'currency': 'INR',
+            }
+            if rng.random() < options['failure_rate']:
+                events.append(self._event('payment.failed', created, data))
+                created += 1
+            events.append(self._event('payment.succeeded', created, data))
+            if expected[payment.transaction_id] == 'REFUNDED':
+                events.append(self._event('payment.refunded', created + 60, data))
+
+        for event in list(events):
+            if rng.random() < options['duplicate_rate']:
+                events.insert(rng.randrange(len(events)), event)
+
+        window = max(options['shuffle_window'], 1)
+        for start in range(0, len(events), window):
+            chunk = events[start:start + window]
+            rng.shuffle(chunk)
+            events[start:start + window] = chunk
+        return events
+
+    def _event(self, event_type, created, data):
+        return {
+            'id': f"evt_{uuid.uuid4().hex}",
+            'type': event_type,
+            'created': created,
+            'data': data,
+        }
+
+    def _deliver_in_process(self, events):
+        client = Client(HTTP_HOST='localhost')
+        path = reverse('payment-webhook')
+        latencies, errors = [], 0
+        for event in events:
+            body = json.dumps(event).encode()
+            started = time.perf_counter()
+            response = client.post(
+                path,
+                data=body,
+                content_type='application/json',
+                headers={webhooks.SIGNATURE_HEADER: webhooks.signature_header(body)},
+            )
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                errors += 1
+        return latencies, errors
+
+    def _deliver_http(self, events, url, concurrency):
+        def send(event):
+            body = json.dumps(event).encode()
+            request = urllib.request.Request(url, data=body, method='POST', headers={
+                'Content-Type': 'application/json',
+                webhooks.SIGNATURE_HEADER: webhooks.signature_header(body),
+            })
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request, timeout=10) as response:
+                    ok = response.status == 200
+            except (urllib.error.URLError, OSError):
+                ok = False
+            return (time.perf_counter() - started) * 1000, ok
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(send, events))
+        return [latency for latency, _ in results], sum(1 for _, ok in results if not ok)
+
+    def _process_and_verify(self, expected):
+        started = time.perf_counter()
+        totals = {'APPLIED': 0, 'IGNORED': 0, 'FAILED': 0, 'DEFERRED': 0}
+        while True:
+            outcomes = webhooks.apply_pending(limit=500)
+            if not any(outcomes.values()):
+                break
+            for key, value in outcomes.items():
+                totals[key] += value
+        elapsed = time.perf_counter() - started
+
+        processed = sum(totals.values())
+        self.stdout.write(
+            f"Applied {processed:,} events in {elapsed:.2f}s "
+            f"({processed / elapsed if elapsed else 0:,.0f} events/s): "
+            f"{totals['APPLIED']:,} applied, {totals['IGNORED']:,} ignored, {totals['FAILED']:,} failed, "
+            f"{totals['DEFERRED']:,} deferred"
+        )
+
+        actual = dict(
+            Payment.objects.filter(transaction_id__in=list(expected))
+            .values_list('transaction_id', 'status')
+        )
+        mismatches = sum(1 for txn, state in expected.items() if actual.get(txn) != state)
+        if mismatches:
+            self.stdout.write(self.style.ERROR(
+                f"{mismatches:,} of {len(expected):,} payments did not reach their expected status"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"All {len(expected):,} payments reached their expected status"
+            ))
+
+    @staticmethod
+    def _percentile(values, percent):
+        index = min(len(values) - 1, int(round(percent / 100 * (len(values) - 1))))
+        return values[index]
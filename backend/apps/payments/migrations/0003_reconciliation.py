@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:37
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0007_booking_status_indexes'),
+        ('payments', '0002_alter_invoice_options_alter_refund_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReconciliationDiscrepancy',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, help_text='Unique identifier for this record', primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='Timestamp when this record was created')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='Timestamp when this record was last updated')),
+                ('kind', models.CharField(choices=[('MISSING_INVOICE', 'Missing invoice'), ('INVOICE_AMOUNT_MISMATCH', 'Invoice amount differs from booking total'), ('INVOICE_TOTAL_MISMATCH', 'Invoice total differs from amount plus tax'), ('OVERPAID', 'Payments exceed invoice total'), ('PAID_INVOICE_UNDERPAID', 'Invoice marked paid but payments fall short'), ('REFUNDS_EXCEED_PAYMENTS', 'Refunds exceed successful payments')], max_length=30)),
+                ('expected_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=14, null=True)),
+                ('actual_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=14, null=True)),
+                ('details', models.JSONField(blank=True, default=dict)),
+                ('is_resolved', models.BooleanField(default=False)),
+            ],
+            options={
+                'db_table': 'payments_reconciliationdiscrepancy',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ReconciliationRun',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, help_text='Unique identifier for this record', primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='Timestamp when this record was created')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='Timestamp when this record was last updated')),
+                ('status', models.CharField(choices=[('RUNNING', 'Running'), ('COMPLETED', 'Completed')], default='RUNNING', max_length=20)),
+                ('last_booking_id', models.UUIDField(blank=True, null=True)),
+                ('bookings_scanned', models.PositiveIntegerField(default=0)),
+                ('discrepancies_found', models.PositiveIntegerField(default=0)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'payments_reconciliationrun',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['status', 'due_date'], name='payments_in_status_68daea_idx'),
+        ),
+        migrations.AddField(
+            model_name='reconciliationdiscrepancy',
+            name='booking',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reconciliation_discrepancies', to='bookings.booking'),
+        ),
+        migrations.AddField(
+            model_name='reconciliationdiscrepancy',
+            name='run',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='discrepancies', to='payments.reconciliationrun'),
+        ),
+        migrations.AddIndex(
+            model_name='reconciliationdiscrepancy',
+            index=models.Index(fields=['kind', 'is_resolved'], name='payments_re_kind_a05c07_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:40
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0003_reconciliation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentWebhookEvent',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, help_text='Unique identifier for this record', primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='Timestamp when this record was created')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='Timestamp when this record was last updated')),
+                ('event_id', models.CharField(max_length=100, unique=True)),
+                ('event_type', models.CharField(max_length=50)),
+                ('transaction_id', models.CharField(blank=True, db_index=True, max_length=100)),
+                ('gateway_created_at', models.DateTimeField(blank=True, null=True)),
+                ('payload', models.JSONField(default=dict)),
+                ('signature', models.CharField(blank=True, max_length=255)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('status', models.CharField(choices=[('RECEIVED', 'Received'), ('APPLIED', 'Applied'), ('IGNORED', 'Ignored'), ('FAILED', 'Failed')], default='RECEIVED', max_length=10)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+            ],
+            options={
+                'db_table': 'payments_webhookevent',
+                'ordering': ['received_at'],
+                'indexes': [models.Index(fields=['status', 'gateway_created_at'], name='payments_we_status_a04433_idx')],
+            },
+        ),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.conf import settings
 from apps.core.models import BaseModel
 from apps.bookings.models import Booking
@@ -42,6 +42,10 @@ class Payment(BaseModel):
     class Meta:
         db_table = 'payments_payment'
         ordering = ['-created_at']
+        indexes = [
+            # Change scan of the dashboard rollups
+            models.Index(fields=['updated_at']),
+        ]
 
     def __str__(self):
         return f"Payment {self.id} - {self.booking.tour.name} - ₹{self.amount}"
@@ -87,6 +91,10 @@ class Refund(BaseModel):
     class Meta:
         db_table = 'payments_refund'
         ordering = ['-created_at']
+        indexes = [
+            # Change scan of the dashboard rollups
+            models.Index(fields=['updated_at']),
+        ]
 
     def __str__(self):
         return f"Refund {self.id} - {self.booking.tour.name} - ₹{self.amount}"
@@ -122,14 +130,45 @@ class Invoice(BaseModel):
     class Meta:
         db_table = 'payments_invoice'
         ordering = ['-created_at']
+        indexes = [
+            # Used by the finance_sweep overdue job
+            models.Index(fields=['status', 'due_date']),
+            # Change scan of the dashboard rollups
+            models.Index(fields=['updated_at']),
+        ]
+
+    @classmethod
+    def allocate_numbers(cls, how_many=1):
+        """
+        Next ``how_many`` invoice numbers for today, from the day's
+        InvoiceSequence row. The row stays locked until the caller's
+        transaction ends, so concurrent allocations never share a number.
+        """
+        import datetime
+        today = datetime.date.today()
+        with transaction.atomic():
+            sequence = InvoiceSequence.objects.select_for_update().filter(day=today).first()
+            if sequence is None:
+                try:
+                    with transaction.atomic():
+                        # Continue after invoices numbered before the day had a row
+                        sequence = InvoiceSequence.objects.create(
+                            day=today, last_number=cls.objects.filter(created_at__date=today).count()
+                        )
+                except IntegrityError:
+                    sequence = InvoiceSequence.objects.select_for_update().get(day=today)
+            first = sequence.last_number + 1
+            sequence.last_number += how_many
+            sequence.save(update_fields=['last_number', 'updated_at'])
+        return [
+            f"INV-{today.strftime('%Y-%m%d')}-{number:04d}"
+            for number in range(first, first + how_many)
+        ]
 
     def save(self, *args, **kwargs):
         if not self.invoice_number:
             # Generate invoice number
-            import datetime
-            today = datetime.date.today()
-            count = Invoice.objects.filter(created_at__date=today).count() + 1
-            self.invoice_number = f"INV-{today.strftime('%Y-%m%d')}-{count:04d}"
+            self.invoice_number = Invoice.allocate_numbers()[0]
         
         # Calculate total_amount properly
         from decimal import Decimal, ROUND_HALF_UP
@@ -144,4 +183,129 @@ class Invoice(BaseModel):
         super().save(*args, **kwargs)
 
     def __str__(self):
-        return f"Invoice {self.invoice_number} - {self.booking.tour.name}"
\ No newline at end of file
+        return f"Invoice {self.invoice_number} - {self.booking.tour.name}"
+
+
+class InvoiceSequence(BaseModel):
+    """Last invoice number issued on a day (see Invoice.allocate_numbers)"""
+    day = models.DateField(unique=True)
+    last_number = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'payments_invoice_sequence'
+
+    def __str__(self):
+        return f"{self.day}: {self.last_number}"
+
+
+class ReconciliationRun(BaseModel):
+    """
+    One pass of the finance reconciliation scan
+    Doubles as the checkpoint: last_booking_id is the keyset position of
+    the last committed chunk, so an interrupted run can be resumed
+    """
+    STATUS_CHOICES = [
+        ('RUNNING', 'Running'),
+        ('COMPLETED', 'Completed'),
+    ]
+
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='RUNNING'
+    )
+    last_booking_id = models.UUIDField(null=True, blank=True)
+    bookings_scanned = models.PositiveIntegerField(default=0)
+    discrepancies_found = models.PositiveIntegerField(default=0)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'payments_reconciliationrun'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Reconciliation {self.id} ({self.status})"
+
+
+class ReconciliationDiscrepancy(BaseModel):
+    """
+    A disagreement between a booking, its invoice, payments and refunds
+    found by the reconciliation scan
+    """
+    KIND_CHOICES = [
+        ('MISSING_INVOICE', 'Missing invoice'),
+        ('INVOICE_AMOUNT_MISMATCH', 'Invoice amount differs from booking total'),
+        ('INVOICE_TOTAL_MISMATCH', 'Invoice total differs from amount plus tax'),
+        ('OVERPAID', 'Payments exceed invoice total'),
+        ('PAID_INVOICE_UNDERPAID', 'Invoice marked paid but payments fall short'),
+        ('REFUNDS_EXCEED_PAYMENTS', 'Refunds exceed successful payments'),
+    ]
+
+    run = models.ForeignKey(
+        ReconciliationRun,
+        on_delete=models.CASCADE,
+        related_name='discrepancies'
+    )
+    booking = models.ForeignKey(
+        Booking,
+        on_delete=models.CASCADE,
+        related_name='reconciliation_discrepancies'
+    )
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    expected_amount = models.DecimalField(max_digits=14, decimal_places=2, null=True, blank=True)
+    actual_amount = models.DecimalField(max_digits=14, decimal_places=2, null=True, blank=True)
+    details = models.JSONField(default=dict, blank=True)
+    is_resolved = models.BooleanField(default=False)
+
+    class Meta:
+        db_table = 'payments_reconciliationdiscrepancy'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['kind', 'is_resolved']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} - Booking {self.booking_id}"
+
+
+class PaymentWebhookEvent(BaseModel):
+    """
+    Raw payment gateway callback, stored as received
+    The raw columns (event_id, payload, signature, ...) are never modified;
+    only the processing columns change as the worker applies the event
+    """
+    STATUS_CHOICES = [
+        ('RECEIVED', 'Received'),
+        ('APPLIED', 'Applied'),
+        ('IGNORED', 'Ignored'),
+        ('FAILED', 'Failed'),
+    ]
+
+    event_id = models.CharField(max_length=100, unique=True)
+    event_type = models.CharField(max_length=50)
+    transaction_id = models.CharField(max_length=100, blank=True, db_index=True)
+    gateway_created_at = models.DateTimeField(null=True, blank=True)
+    payload = models.JSONField(default=dict)
+    signature = models.CharField(max_length=255, blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default='RECEIVED'
+    )
+    processed_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    # Events for a payment not recorded yet are retried with backoff
+    attempts = models.PositiveSmallIntegerField(default=0)
+    retry_after = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'payments_webhookevent'
+        ordering = ['received_at']
+        indexes = [
+            models.Index(fields=['status', 'gateway_created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} {self.event_id} ({self.status})"
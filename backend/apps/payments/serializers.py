@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from apps.core.planner import requires
 from .models import Payment, Refund, Invoice
 
 class PaymentSerializer(serializers.ModelSerializer):
@@ -13,6 +14,7 @@ class PaymentSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
+    @requires('booking__tour__name', 'booking__user__email', 'booking__travel_date')
     def get_booking_details(self, obj):
         if obj.booking:
             return {
@@ -43,6 +45,7 @@ class RefundSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'processed_by', 'processed_at', 'created_at', 'updated_at']
 
+    @requires('payment__amount', 'payment__transaction_id')
     def get_payment_details(self, obj):
         return {
             'id': obj.payment.id,
@@ -50,6 +53,7 @@ class RefundSerializer(serializers.ModelSerializer):
             'transaction_id': obj.payment.transaction_id,
         }
 
+    @requires('booking__tour__name', 'booking__user__email', 'booking__travel_date')
     def get_booking_details(self, obj):
         return {
             'id': obj.booking.id,
@@ -71,6 +75,7 @@ class InvoiceSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'invoice_number', 'issued_date', 'created_at', 'updated_at']
 
+    @requires('booking__tour__name', 'booking__user__email', 'booking__travel_date', 'booking__total_price')
     def get_booking_details(self, obj):
         return {
             'id': obj.booking.id,
@@ -78,4 +83,45 @@ class InvoiceSerializer(serializers.ModelSerializer):
             'user_email': obj.booking.user.email,
             'travel_date': obj.booking.travel_date,
             'total_price': obj.booking.total_price,
-        }
\ No newline at end of file
+        }
+
+
+class BulkRefundActionSerializer(serializers.Serializer):
+    """Input for bulk refund transitions: explicit ids or a filter"""
+    ids = serializers.ListField(
+        child=serializers.UUIDField(),
+        required=False,
+        allow_empty=False,
+        max_length=5000
+    )
+    tour = serializers.UUIDField(required=False)
+    travel_date = serializers.DateField(required=False)
+    booking = serializers.UUIDField(required=False)
+    admin_notes = serializers.CharField(required=False, allow_blank=True)
+
+    FILTER_FIELDS = {
+        'tour': 'booking__tour_id',
+        'travel_date': 'booking__travel_date',
+        'booking': 'booking_id',
+    }
+
+    def validate(self, data):
+        """Require either a list of refund ids or at least one filter"""
+        has_filter = any(field in data for field in self.FILTER_FIELDS)
+        if not data.get('ids') and not has_filter:
+            raise serializers.ValidationError(
+                "Provide 'ids' or at least one filter (tour, travel_date, booking)."
+            )
+        if data.get('ids') and has_filter:
+            raise serializers.ValidationError(
+                "Use either 'ids' or filters, not both."
+            )
+        return data
+
+    def get_filters(self):
+        """Map validated filter values to Refund queryset lookups"""
+        return {
+            lookup: self.validated_data[field]
+            for field, lookup in self.FILTER_FIELDS.items()
+            if field in self.validated_data
+        }
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import PaymentViewSet, RefundViewSet, InvoiceViewSet
+from .views import PaymentViewSet, RefundViewSet, InvoiceViewSet, PaymentWebhookView
 
 router = DefaultRouter()
 router.register(r'refunds', RefundViewSet, basename='refund')
@@ -8,5 +8,6 @@ router.register(r'invoices', InvoiceViewSet, basename='invoice')
 router.register(r'', PaymentViewSet, basename='payment')  # Shadowing fix: moved to end
 
 urlpatterns = [
+    path('webhooks/gateway/', PaymentWebhookView.as_view(), name='payment-webhook'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,16 +1,30 @@
 from rest_framework import status
 from rest_framework.decorators import action
+from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from django.db import transaction
 from django.utils import timezone
+from apps.core import metrics
 from apps.core.viewsets import BaseViewSet
+from apps.core.idempotency import idempotent
 from apps.core.permissions import IsAdminUser
 from apps.core.response import APIResponse
 from .models import Payment, Refund, Invoice
-from .serializers import PaymentSerializer, RefundSerializer, InvoiceSerializer
+from apps.bookings.models import Booking
+from apps.bookings.summary import invalidate_for_bookings
+from apps.dashboard import counters
+from . import documents, webhooks
+from .serializers import (
+    PaymentSerializer, RefundSerializer, InvoiceSerializer,
+    BulkRefundActionSerializer
+)
 import logging
 
 logger = logging.getLogger(__name__)
 
+PAYMENTS_CREATED = metrics.Counter('payments_created_total', 'Payments created, by initial status', ['status'])
+
 
 class PaymentViewSet(BaseViewSet):
     """ViewSet for managing payments"""
@@ -25,6 +39,7 @@ class PaymentViewSet(BaseViewSet):
             permission_classes = [IsAdminUser]
         return [permission() for permission in permission_classes]
 
+    @idempotent
     def create(self, request, *args, **kwargs):
         """Create a new payment"""
         serializer = self.get_serializer(data=request.data)
@@ -35,6 +50,7 @@ class PaymentViewSet(BaseViewSet):
                 serializer.validated_data['transaction_id'] = f"TXN-{uuid.uuid4().hex[:12].upper()}"
             
             payment = serializer.save()
+            transaction.on_commit(PAYMENTS_CREATED.labels(payment.status).inc)
             logger.info(f"Payment created: {payment.transaction_id}")
             
             return APIResponse.success(
@@ -58,28 +74,65 @@ class RefundViewSet(BaseViewSet):
     serializer_class = RefundSerializer
     permission_classes = [IsAdminUser]
 
+    # Allowed refund state transitions and the side effects they carry
+    TRANSITIONS = {
+        'approve': {
+            'from_status': 'PENDING',
+            'to_status': 'APPROVED',
+            'booking_status': 'CANCELLED_REFUNDED',
+            'payment_status': None,
+            'default_notes': '',
+        },
+        'reject': {
+            'from_status': 'PENDING',
+            'to_status': 'REJECTED',
+            'booking_status': 'CANCELLED_NOT_REFUNDED',
+            'payment_status': None,
+            'default_notes': 'Refund rejected by admin',
+        },
+        'process': {
+            'from_status': 'APPROVED',
+            'to_status': 'PROCESSED',
+            'booking_status': None,
+            'payment_status': 'REFUNDED',
+            'default_notes': None,  # Processing keeps existing admin notes
+        },
+    }
+    BULK_BATCH_SIZE = 500
+
+    def _lock(self, refund):
+        """
+        Re-read ``refund`` with its row locked, inside the caller's
+        transaction, so concurrent transitions check and write it in turn
+        """
+        return Refund.objects.select_related('booking', 'payment').select_for_update(of=('self',)).get(
+            pk=refund.pk
+        )
+
     @action(detail=True, methods=['post'])
     def approve(self, request, pk=None):
         """Approve a refund"""
         refund = self.get_object()
         
-        if refund.status != 'PENDING':
-            return APIResponse.error(
-                message="Only pending refunds can be approved",
-                status_code=status.HTTP_400_BAD_REQUEST
-            )
-        
-        refund.status = 'APPROVED'
-        refund.processed_by = request.user
-        refund.processed_at = timezone.now()
-        refund.admin_notes = request.data.get('admin_notes', '')
-        refund.save()
-        
-        # Sync with booking status
-        if refund.booking:
-            refund.booking.status = 'CANCELLED_REFUNDED'
-            refund.booking.save()
-            logger.info(f"Booking {refund.booking.id} status updated to CANCELLED_REFUNDED")
+        with transaction.atomic():
+            refund = self._lock(refund)
+            if refund.status != 'PENDING':
+                return APIResponse.error(
+                    message="Only pending refunds can be approved",
+                    status_code=status.HTTP_400_BAD_REQUEST
+                )
+
+            refund.status = 'APPROVED'
+            refund.processed_by = request.user
+            refund.processed_at = timezone.now()
+            refund.admin_notes = request.data.get('admin_notes', '')
+            refund.save()
+            
+            # Sync with booking status
+            if refund.booking:
+                refund.booking.status = 'CANCELLED_REFUNDED'
+                refund.booking.save()
+                logger.info(f"Booking {refund.booking.id} status updated to CANCELLED_REFUNDED")
         
         logger.info(f"Refund {refund.id} approved by {request.user.email}")
         
@@ -93,23 +146,25 @@ class RefundViewSet(BaseViewSet):
         """Reject a refund"""
         refund = self.get_object()
         
-        if refund.status != 'PENDING':
-            return APIResponse.error(
-                message="Only pending refunds can be rejected",
-                status_code=status.HTTP_400_BAD_REQUEST
-            )
-        
-        refund.status = 'REJECTED'
-        refund.processed_by = request.user
-        refund.processed_at = timezone.now()
-        refund.admin_notes = request.data.get('admin_notes', 'Refund rejected by admin')
-        refund.save()
-        
-        # Sync with booking status
-        if refund.booking:
-            refund.booking.status = 'CANCELLED_NOT_REFUNDED'
-            refund.booking.save()
-            logger.info(f"Booking {refund.booking.id} status updated to CANCELLED_NOT_REFUNDED")
+        with transaction.atomic():
+            refund = self._lock(refund)
+            if refund.status != 'PENDING':
+                return APIResponse.error(
+                    message="Only pending refunds can be rejected",
+                    status_code=status.HTTP_400_BAD_REQUEST
+                )
+
+            refund.status = 'REJECTED'
+            refund.processed_by = request.user
+            refund.processed_at = timezone.now()
+            refund.admin_notes = request.data.get('admin_notes', 'Refund rejected by admin')
+            refund.save()
+            
+            # Sync with booking status
+            if refund.booking:
+                refund.booking.status = 'CANCELLED_NOT_REFUNDED'
+                refund.booking.save()
+                logger.info(f"Booking {refund.booking.id} status updated to CANCELLED_NOT_REFUNDED")
         
         logger.info(f"Refund {refund.id} rejected by {request.user.email}")
         
@@ -123,20 +178,22 @@ class RefundViewSet(BaseViewSet):
         """Mark refund as processed"""
         refund = self.get_object()
         
-        if refund.status != 'APPROVED':
-            return APIResponse.error(
-                message="Only approved refunds can be processed",
-                status_code=status.HTTP_400_BAD_REQUEST
-            )
-        
-        refund.status = 'PROCESSED'
-        refund.processed_by = request.user
-        refund.processed_at = timezone.now()
-        refund.save()
-        
-        # Update original payment status
-        refund.payment.status = 'REFUNDED'
-        refund.payment.save()
+        with transaction.atomic():
+            refund = self._lock(refund)
+            if refund.status != 'APPROVED':
+                return APIResponse.error(
+                    message="Only approved refunds can be processed",
+                    status_code=status.HTTP_400_BAD_REQUEST
+                )
+
+            refund.status = 'PROCESSED'
+            refund.processed_by = request.user
+            refund.processed_at = timezone.now()
+            refund.save()
+            
+            # Update original payment status
+            refund.payment.status = 'REFUNDED'
+            refund.payment.save()
         
         logger.info(f"Refund {refund.id} processed by {request.user.email}")
         
@@ -145,6 +202,123 @@ class RefundViewSet(BaseViewSet):
             message="Refund processed successfully"
         )
 
+    @action(detail=False, methods=['post'])
+    def bulk_approve(self, request):
+        """Approve many pending refunds in one transaction"""
+        return self._bulk_transition(request, 'approve')
+
+    @action(detail=False, methods=['post'])
+    def bulk_reject(self, request):
+        """Reject many pending refunds in one transaction"""
+        return self._bulk_transition(request, 'reject')
+
+    @action(detail=False, methods=['post'])
+    def bulk_process(self, request):
+        """Mark many approved refunds as processed in one transaction"""
+        return self._bulk_transition(request, 'process')
+
+    def _bulk_transition(self, request, transition_name):
+        """
+        Apply a refund state transition to a set of refunds.
+
+        Refunds are selected by explicit ``ids`` or by filters (tour,
+        travel_date, booking). With filters only refunds in the transition's
+        source status are selected; with ids every id gets an outcome.
+        Refunds, bookings and payments are written with ``bulk_update``.
+        """
+        transition = self.TRANSITIONS[transition_name]
+        input_serializer = BulkRefundActionSerializer(data=request.data)
+        if not input_serializer.is_valid():
+            return APIResponse.error(
+                message=f"Bulk {transition_name} failed",
+                errors=input_serializer.errors,
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+
+        requested_ids = input_serializer.validated_data.get('ids')
+        admin_notes = input_serializer.validated_data.get('admin_notes', transition['default_notes'])
+        now = timezone.now()
+
+        with transaction.atomic():
+            queryset = Refund.objects.select_related('booking', 'payment').select_for_update(of=('self',))
+            if requested_ids:
+                requested_ids = list(dict.fromkeys(requested_ids))
+                queryset = queryset.filter(id__in=requested_ids)
+            else:
+                queryset = queryset.filter(
+                    status=transition['from_status'],
+                    **input_serializer.get_filters()
+                )
+            refunds = {refund.id: refund for refund in queryset}
+
+            results = []
+            refunds_to_update = []
+            bookings_to_update = {}
+            payments_to_update = {}
+
+            for refund_id in (requested_ids or list(refunds)):
+                refund = refunds.get(refund_id)
+                if refund is None:
+                    results.append({'id': refund_id, 'outcome': 'not_found'})
+                    continue
+                if refund.status != transition['from_status']:
+                    results.append({
+                        'id': refund_id,
+                        'outcome': 'skipped',
+                        'detail': f"Refund is {refund.status}, expected {transition['from_status']}",
+                    })
+                    continue
+
+                refund.status = transition['to_status']
+                refund.processed_by = request.user
+                refund.processed_at = now
+                refund.updated_at = now
+                if admin_notes is not None:
+                    refund.admin_notes = admin_notes
+                refunds_to_update.append(refund)
+
+                if transition['booking_status'] and refund.booking:
+                    refund.booking.status = transition['booking_status']
+                    refund.booking.updated_at = now
+                    bookings_to_update[refund.booking.id] = refund.booking
+                if transition['payment_status']:
+                    refund.payment.status = transition['payment_status']
+                    refund.payment.updated_at = now
+                    payments_to_update[refund.payment.id] = refund.payment
+
+                results.append({'id': refund_id, 'outcome': transition['to_status'].lower()})
+
+            refund_fields = ['status', 'processed_by', 'processed_at', 'updated_at']
+            if admin_notes is not None:
+                refund_fields.append('admin_notes')
+            Refund.objects.bulk_update(refunds_to_update, refund_fields, batch_size=self.BULK_BATCH_SIZE)
+            if bookings_to_update:
+                Booking.objects.bulk_update(
+                    bookings_to_update.values(), ['status', 'updated_at'], batch_size=self.BULK_BATCH_SIZE
+                )
+            if payments_to_update:
+                Payment.objects.bulk_update(
+                    payments_to_update.values(), ['status', 'updated_at'], batch_size=self.BULK_BATCH_SIZE
+                )
+            invalidate_for_bookings({refund.booking_id or refund.payment.booking_id for refund in refunds_to_update})
+            if transition['from_status'] == 'PENDING':
+                counters.adjust({'pending_refunds': -len(refunds_to_update)})
+
+        summary = {
+            'requested': len(results),
+            'updated': len(refunds_to_update),
+            'skipped': sum(1 for result in results if result['outcome'] == 'skipped'),
+            'not_found': sum(1 for result in results if result['outcome'] == 'not_found'),
+            'bookings_updated': len(bookings_to_update),
+            'payments_updated': len(payments_to_update),
+        }
+        logger.info(f"Bulk refund {transition_name} by {request.user.email}: {summary}")
+
+        return APIResponse.success(
+            data={'summary': summary, 'results': results},
+            message=f"Bulk {transition_name}: {summary['updated']} of {summary['requested']} refunds updated"
+        )
+
 
 class InvoiceViewSet(BaseViewSet):
     """ViewSet for managing invoices"""
@@ -153,7 +327,7 @@ class InvoiceViewSet(BaseViewSet):
 
     def get_permissions(self):
         """Set permissions based on action"""
-        if self.action in ['list', 'retrieve']:
+        if self.action in ['list', 'retrieve', 'pdf']:
             # Allow authenticated users to view their own invoices
             from rest_framework.permissions import IsAuthenticated
             permission_classes = [IsAuthenticated]
@@ -205,6 +379,21 @@ class InvoiceViewSet(BaseViewSet):
             message="Invoice marked as paid"
         )
 
+    @action(detail=True, methods=['get'])
+    def pdf(self, request, pk=None):
+        """Download the invoice as PDF (rendered once per invoice content)"""
+        invoice = self.get_object()
+        try:
+            digest, path = documents.get_document('invoice', invoice)
+        except documents.DocumentPending:
+            response = APIResponse.success(
+                message="Invoice is being generated, please retry shortly",
+                status_code=status.HTTP_202_ACCEPTED
+            )
+            response['Retry-After'] = '5'
+            return response
+        return documents.serve(request, digest, path, f"{invoice.invoice_number}.pdf")
+
     @action(detail=True, methods=['post'])
     def send_invoice(self, request, pk=None):
         """Send invoice to customer"""
@@ -220,4 +409,32 @@ class InvoiceViewSet(BaseViewSet):
         return APIResponse.success(
             data=InvoiceSerializer(invoice).data,
             message="Invoice sent to customer"
-        )
\ No newline at end of file
+        )
+
+
+class PaymentWebhookView(APIView):
+    """
+    Receives payment gateway callbacks.
+    Only verifies the signature and stores the raw event; the
+    process_payment_events worker applies it to payments and bookings.
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def post(self, request, *args, **kwargs):
+        body = request.body
+        signature = request.headers.get(webhooks.SIGNATURE_HEADER, '')
+        try:
+            webhooks.verify_signature(signature, body)
+            event = webhooks.record_event(body, signature)
+        except webhooks.InvalidWebhook as exc:
+            logger.warning(f"Rejected payment webhook: {exc}")
+            return APIResponse.error(
+                message=str(exc),
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+
+        return APIResponse.success(
+            data={'event_id': event['id']},
+            message="Event received"
+        )
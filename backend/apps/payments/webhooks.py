@@ -0,0 +1,301 @@
+"""
+Payment gateway webhook ingestion
+The HTTP endpoint only verifies the signature and appends the raw event to
+PaymentWebhookEvent; apply_pending() (run by process_payment_events) later
+applies the events to Payment, Booking and Invoice. An event can arrive
+before the payment it refers to is committed, so events for an unknown
+transaction stay RECEIVED and are retried with backoff until
+PAYMENT_WEBHOOK_RETRY_HOURS after they were received.
+"""
+
+import datetime
+import hashlib
+import hmac
+import json
+import logging
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+from itertools import groupby
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.bookings.models import Booking
+from apps.bookings.summary import invalidate_for_bookings
+from apps.core import metrics
+from apps.dashboard import counters
+from .models import Invoice, Payment, PaymentWebhookEvent
+
+logger = logging.getLogger(__name__)
+
+_EVENTS = metrics.Counter('payment_webhook_events_total', 'Gateway webhook events applied, by outcome', ['outcome'])
+_STATUS_CHANGES = metrics.Counter(
+    'payment_status_changes_total', 'Payments moved to a status by webhook events', ['status']
+)
+_BOOKINGS_CONFIRMED = metrics.Counter('bookings_confirmed_total', 'Pending bookings confirmed by a successful payment')
+
+SIGNATURE_HEADER = 'X-Gateway-Signature'
+# Longest wait before retrying an event for an unknown transaction
+MAX_RETRY_DELAY = timedelta(hours=1)
+
+# Payment status each event type moves the payment to
+EVENT_PAYMENT_STATUS = {
+    'payment.succeeded': 'SUCCESS',
+    'payment.failed': 'FAILED',
+    'payment.refunded': 'REFUNDED',
+}
+
+
+class InvalidWebhook(Exception):
+    """Raised when a callback fails signature or payload validation"""
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def compute_signature(secret, timestamp, body):
+    """Hex HMAC-SHA256 of "<timestamp>.<raw body>" """
+    message = str(timestamp).encode() + b'.' + body
+    return hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+
+
+def signature_header(body, secret=None, timestamp=None):
+    """Build the header value the gateway sends: "t=<unix time>,v1=<signature>" """
+    secret = secret or _setting('PAYMENT_WEBHOOK_SECRET', '')
+    timestamp = int(timestamp if timestamp is not None else time.time())
+    return f"t={timestamp},v1={compute_signature(secret, timestamp, body)}"
+
+
+def verify_signature(header, body, now=None):
+    """Check the signature header against the raw body; raises InvalidWebhook"""
+    secret = _setting('PAYMENT_WEBHOOK_SECRET', '')
+    if not secret:
+        raise InvalidWebhook('Webhook secret is not configured')
+    if not header:
+        raise InvalidWebhook('Missing signature header')
+
+    parts = dict(item.split('=', 1) for item in header.split(',') if '=' in item)
+    try:
+        timestamp = int(parts['t'])
+        signature = parts['v1']
+    except (KeyError, ValueError):
+        raise InvalidWebhook('Malformed signature header')
+
+    now = now if now is not None else time.time()
+    if abs(now - timestamp) > _setting('PAYMENT_WEBHOOK_TOLERANCE_SECONDS', 300):
+        raise InvalidWebhook('Signature timestamp outside tolerance')
+    if not hmac.compare_digest(compute_signature(secret, timestamp, body), signature):
+        raise InvalidWebhook('Signature mismatch')
+
+
+def record_event(body, signature=''):
+    """
+    Append a verified callback to PaymentWebhookEvent.
+    Redelivered events (same event id) are ignored by the unique constraint.
+    Returns the parsed event.
+    """
+    try:
+        event = json.loads(body)
+        event_id = str(event['id'])
+        event_type = str(event['type'])
+    except (ValueError, KeyError, TypeError):
+        raise InvalidWebhook('Payload must be a JSON object with id and type')
+
+    data = event.get('data') or {}
+    if not isinstance(data, dict):
+        raise InvalidWebhook('Event data must be a JSON object')
+    created = event.get('created')
+    gateway_created_at = None
+    if isinstance(created, (int, float)):
+        gateway_created_at = datetime.datetime.fromtimestamp(created, tz=datetime.timezone.utc)
+
+    PaymentWebhookEvent.objects.bulk_create(
+        [PaymentWebhookEvent(
+            event_id=event_id[:100],
+            event_type=event_type[:50],
+            transaction_id=str(data.get('transaction_id') or '')[:100],
+            gateway_created_at=gateway_created_at,
+            payload=event,
+            signature=signature[:255],
+        )],
+        ignore_conflicts=True
+    )
+    return event
+
+
+def _event_sort_key(event):
+    return (
+        event.transaction_id,
+        event.gateway_created_at or event.received_at,
+        event.received_at,
+    )
+
+
+def _check_amount(payment, event_type, data):
+    """
+    Error message when the event's currency, or the amount of a successful
+    payment, differs from the payment; '' when they match. Refund events
+    may carry a partial amount, so only their currency is checked.
+    """
+    currency = data.get('currency')
+    expected_currency = _setting('PAYMENT_CURRENCY', 'INR')
+    if currency is not None and str(currency).upper() != expected_currency:
+        return f"Currency mismatch: event {currency}, expected {expected_currency}"
+    if event_type != 'payment.succeeded':
+        return ''
+    try:
+        amount = Decimal(str(data['amount']))
+    except (KeyError, InvalidOperation):
+        return 'Missing or invalid amount'
+    if amount != payment.amount:
+        return f"Amount mismatch: event {amount}, payment {payment.amount}"
+    return ''
+
+
+def _apply_to_payment(payment, event, now):
+    """
+    Apply one event to a locked payment in memory; returns (status, error).
+    Events older than the last applied one for the payment are ignored,
+    so redelivery or out-of-order arrival cannot roll a payment back.
+    Events whose amount or currency does not match the payment fail.
+    """
+    new_status = EVENT_PAYMENT_STATUS.get(event.event_type)
+    if new_status is None:
+        return 'IGNORED', f"Unhandled event type {event.event_type}"
+
+    data = event.payload.get('data') if isinstance(event.payload, dict) else None
+    data = data if isinstance(data, dict) else {}
+    mismatch = _check_amount(payment, event.event_type, data)
+    if mismatch:
+        logger.warning(f"Rejected webhook event {event.event_id} for {payment.transaction_id}: {mismatch}")
+        return 'FAILED', mismatch
+
+    gateway_response = payment.gateway_response if isinstance(payment.gateway_response, dict) else {}
+    event_time = (event.gateway_created_at or event.received_at).isoformat(timespec='microseconds')
+    last_applied = gateway_response.get('last_event_at')
+    if last_applied and event_time < last_applied:
+        return 'IGNORED', 'Stale event'
+    if payment.status == 'REFUNDED' and new_status != 'REFUNDED':
+        return 'IGNORED', 'Payment already refunded'
+
+    payment.status = new_status
+    payment.processed_at = payment.processed_at or now
+    payment.gateway_response = {
+        **gateway_response,
+        'last_event_id': event.event_id,
+        'last_event_type': event.event_type,
+        'last_event_at': event_time,
+        'data': data,
+    }
+    payment.updated_at = now
+    return 'APPLIED', ''
+
+
+def _defer(event, now):
+    """
+    Schedule a retry of an event whose payment is not recorded (yet);
+    returns (status, error), FAILED once the retry window has passed
+    """
+    event.attempts += 1
+    if now - event.received_at >= timedelta(hours=_setting('PAYMENT_WEBHOOK_RETRY_HOURS', 24)):
+        return 'FAILED', 'Unknown transaction'
+    # 30s, 60s, 120s, ... up to an hour
+    event.retry_after = now + min(timedelta(seconds=30 * 2 ** (event.attempts - 1)), MAX_RETRY_DELAY)
+    return 'RECEIVED', f"Unknown transaction, retry {event.attempts} scheduled"
+
+
+def apply_pending(limit=500):
+    """
+    Claim up to ``limit`` unprocessed events and apply them in one transaction.
+
+    The payments the batch touches are locked with a single query, each
+    transaction's events are applied to its payment oldest first, and the
+    results are written back set-wise: payments with bulk_update, bookings
+    confirmed and invoices marked paid with one UPDATE each. Events for an
+    unknown transaction are deferred (see _defer). Returns a dict of outcome
+    counts.
+    """
+    outcomes = {'APPLIED': 0, 'IGNORED': 0, 'FAILED': 0, 'DEFERRED': 0}
+    now = timezone.now()
+    with transaction.atomic():
+        events = list(
+            PaymentWebhookEvent.objects.select_for_update(skip_locked=True)
+            .filter(Q(retry_after__isnull=True) | Q(retry_after__lte=now), status='RECEIVED')
+            .order_by('gateway_created_at', 'received_at')[:limit]
+        )
+        if not events:
+            return outcomes
+
+        transaction_ids = {event.transaction_id for event in events if event.transaction_id}
+        payments = Payment.objects.select_for_update().in_bulk(
+            transaction_ids, field_name='transaction_id'
+        )
+
+        changed = {}
+        paid_booking_ids = set()
+        confirmed = 0
+        events.sort(key=_event_sort_key)
+        for transaction_id, group in groupby(events, key=lambda event: event.transaction_id):
+            payment = payments.get(transaction_id)
+            for event in group:
+                if not transaction_id:
+                    event.status, event.error = 'FAILED', 'Missing transaction id'
+                    continue
+                if payment is None:
+                    event.status, event.error = _defer(event, now)
+                    continue
+                event.status, event.error = _apply_to_payment(payment, event, now)
+                if event.status == 'APPLIED':
+                    changed[payment.pk] = payment
+            if payment is not None and payment.pk in changed and payment.status == 'SUCCESS':
+                paid_booking_ids.add(payment.booking_id)
+
+        if changed:
+            Payment.objects.bulk_update(
+                changed.values(),
+                ['status', 'processed_at', 'gateway_response', 'updated_at'],
+                batch_size=500
+            )
+            invalidate_for_bookings({payment.booking_id for payment in changed.values()})
+        if paid_booking_ids:
+            confirmed = Booking.objects.filter(pk__in=paid_booking_ids, status='PENDING').update(
+                status='CONFIRMED', updated_at=now
+            )
+            counters.adjust({'pending_bookings': -confirmed})
+            Invoice.objects.filter(booking_id__in=paid_booking_ids).exclude(
+                status__in=['PAID', 'CANCELLED']
+            ).update(status='PAID', updated_at=now)
+
+        # Outcomes repeat heavily, so one UPDATE per (status, error) beats bulk_update
+        by_outcome = defaultdict(list)
+        deferred = []
+        for event in events:
+            if event.status == 'RECEIVED':
+                deferred.append(event)
+                outcomes['DEFERRED'] += 1
+                continue
+            by_outcome[(event.status, event.error)].append(event.pk)
+            outcomes[event.status] += 1
+        if deferred:
+            for event in deferred:
+                event.updated_at = now
+            PaymentWebhookEvent.objects.bulk_update(
+                deferred, ['attempts', 'retry_after', 'error', 'updated_at'], batch_size=500
+            )
+        for (event_status, error), pks in by_outcome.items():
+            PaymentWebhookEvent.objects.filter(pk__in=pks).update(
+                status=event_status, error=error, processed_at=now, updated_at=now
+            )
+
+    for outcome, count in outcomes.items():
+        _EVENTS.labels(outcome).inc(count)
+    for payment_status, count in Counter(payment.status for payment in changed.values()).items():
+        _STATUS_CHANGES.labels(payment_status).inc(count)
+    _BOOKINGS_CONFIRMED.inc(confirmed)
+    logger.info(f"Applied webhook events: {outcomes}")
+    return outcomes
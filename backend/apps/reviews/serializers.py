@@ -1,8 +1,15 @@
 from rest_framework import serializers
+from apps.core.fragments import FragmentCacheMixin, FragmentListSerializer
+from apps.core.planner import requires
+from apps.core.sideload import SideloadMixin
 from .models import Review
 from apps.users.serializers import UserProfileSerializer
 
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(FragmentCacheMixin, SideloadMixin, serializers.ModelSerializer):
+    fragment_related = ('tour', 'tour.primary_destination')
+    # Users have no updated_at to key on
+    fragment_volatile = ('user_details',)
+    sideload_fields = {'user_details': 'users'}
     user_details = UserProfileSerializer(source='user', read_only=True)
     tour_details = serializers.SerializerMethodField()
 
@@ -13,7 +20,9 @@ class ReviewSerializer(serializers.ModelSerializer):
             'is_verified', 'user_details', 'tour_details', 'created_at'
         ]
         read_only_fields = ['id', 'user', 'created_at']
+        list_serializer_class = FragmentListSerializer
 
+    @requires('tour__name', 'tour__slug', 'tour__primary_destination__name')
     def get_tour_details(self, obj):
         """Get tour details for the review"""
         if obj.tour:
@@ -5,8 +5,10 @@ from rest_framework.permissions import IsAuthenticatedOrReadOnly
 from .models import Review
 from .serializers import ReviewSerializer
 from apps.core.response import APIResponse
+from apps.core.planner import QueryPlanMixin
+from apps.core.sideload import SideloadViewMixin
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(QueryPlanMixin, SideloadViewMixin, viewsets.ModelViewSet):
     serializer_class = ReviewSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 
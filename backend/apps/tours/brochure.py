@@ -0,0 +1,255 @@
+"""
+Tour brochures
+A brochure is rendered from the tour's brochure fields plus the rows it
+prints from other models (seasons and their prices, destinations, hotels,
+day-by-day itinerary). Files are stored under BROCHURE_CACHE_ROOT with the
+SHA-256 of the template version and that content as file name, so an edit
+to any of those models yields a new file on the next request and an
+unchanged tour is never rendered twice. render_brochures prunes the files
+of content that changed.
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch, Q
+from django.http import FileResponse, HttpResponseNotModified
+
+from apps.core import filecache
+
+from . import brochure_templates
+from .models import Hotel, Tour, TourItinerary, TourPricing
+
+FORMATS = {
+    'pdf': 'application/pdf',
+    'html': 'text/html; charset=utf-8',
+}
+
+
+def _text(value):
+    return '' if value is None else str(value)
+
+
+def _strings(value):
+    return [str(item) for item in value] if isinstance(value, list) else []
+
+
+def brochure_queryset():
+    """Tours with everything their brochure context reads, in four extra queries"""
+    return (
+        Tour.objects.select_related('primary_destination')
+        .prefetch_related(
+            'destinations',
+            Prefetch('seasonal_pricings', queryset=TourPricing.objects.select_related('season')),
+            Prefetch('detailed_itineraries', queryset=TourItinerary.objects.order_by('day_number', 'id')),
+        )
+    )
+
+
+def load_hotels(tours):
+    """
+    {(destination_id, lower-cased name): Hotel} for the hotels named in the
+    tours' hotel_details, with one query
+    """
+    condition = Q()
+    for tour in tours:
+        for destination_id, details in (tour.hotel_details or {}).items():
+            if isinstance(details, dict) and details.get('hotel_name'):
+                condition |= Q(destination_id=destination_id, name__iexact=details['hotel_name'])
+    if not condition:
+        return {}
+    return {
+        (str(hotel.destination_id), hotel.name.lower()): hotel
+        for hotel in Hotel.objects.filter(condition, is_active=True)
+    }
+
+
+def _itinerary(tour):
+    days = [
+        {'day': item.day_number, 'title': item.title, 'description': item.description}
+        for item in tour.detailed_itineraries.all()
+    ]
+    if days:
+        return days
+    # Fall back to the day list stored on the tour itself
+    return [
+        {'day': _text(item.get('day')), 'title': _text(item.get('title')), 'description': _text(item.get('description'))}
+        for item in (tour.itinerary if isinstance(tour.itinerary, list) else []) if isinstance(item, dict)
+    ]
+
+
+def _hotels(tour, destinations, hotels):
+    rows = []
+    for destination_id, details in (tour.hotel_details or {}).items():
+        if not isinstance(details, dict):
+            continue
+        name = _text(details.get('hotel_name'))
+        hotel = hotels.get((str(destination_id), name.lower()))
+        rows.append({
+            'destination': destinations.get(str(destination_id), ''),
+            'name': hotel.name if hotel else name,
+            'hotel_type': _text(details.get('hotel_type')) or (hotel.hotel_type if hotel else ''),
+            'address': hotel.address if hotel else '',
+            'star_rating': hotel.star_rating if hotel else None,
+        })
+    return rows
+
+
+def _season_dates(season):
+    if season.start_date and season.end_date:
+        return season.date_range_display
+    return f"{season.get_start_month_display()} to {season.get_end_month_display()}"
+
+
+def brochure_context(tour, hotels=None):
+    """Everything printed in a tour brochure, as plain values"""
+    if hotels is None:
+        hotels = load_hotels([tour])
+    destinations = list(tour.destinations.all())
+    destination_names = {str(destination.id): destination.name for destination in destinations}
+    destination_names.setdefault(str(tour.primary_destination_id), tour.primary_destination.name)
+    pricings = sorted(
+        tour.seasonal_pricings.all(),
+        key=lambda pricing: (pricing.season.start_date is None, pricing.season.start_date, pricing.season.start_month)
+    )
+    vehicle = tour.vehicle_details if isinstance(tour.vehicle_details, dict) else {}
+
+    return {
+        'id': _text(tour.id),
+        'name': tour.name,
+        'slug': tour.slug,
+        'description': tour.description,
+        'primary_destination': tour.primary_destination.name,
+        'destinations': [
+            {'name': destination.name, 'country': destination.country, 'places': destination.places}
+            for destination in sorted(destinations, key=lambda destination: destination.name)
+        ],
+        'duration_days': tour.duration_days,
+        'max_capacity': tour.max_capacity,
+        'base_price': _text(tour.base_price),
+        'child_price': _text(tour.child_price),
+        'tour_type': tour.get_tour_type_display(),
+        'category': tour.get_category_display(),
+        'difficulty': tour.get_difficulty_level_display(),
+        'available_dates': _strings(tour.available_dates),
+        'itinerary': _itinerary(tour),
+        'hotels': _hotels(tour, destination_names, hotels),
+        'vehicle': {'type': _text(vehicle.get('type')), 'note': _text(vehicle.get('note'))},
+        'pricing': [
+            {
+                'season': pricing.season.name,
+                'dates': _season_dates(pricing.season),
+                'two_sharing_price': _text(pricing.two_sharing_price or pricing.price),
+                'three_sharing_price': _text(pricing.three_sharing_price),
+                'child_price': _text(pricing.child_price),
+                'available_dates': _strings(pricing.available_dates),
+                'includes_return_air': pricing.includes_return_air,
+            }
+            for pricing in pricings if pricing.season.is_active
+        ],
+        'inclusions': _strings(tour.inclusions),
+        'exclusions': _strings(tour.exclusions),
+        'special_notes': tour.special_notes,
+    }
+
+
+def brochure_location(context):
+    """(digest, {format: absolute path}) for a tour's brochure"""
+    payload = json.dumps(
+        {'version': brochure_templates.TEMPLATE_VERSION, 'context': context},
+        sort_keys=True,
+        cls=DjangoJSONEncoder
+    )
+    digest = hashlib.sha256(payload.encode()).hexdigest()
+    directory = _cache_root() / digest[:2]
+    return digest, {output: directory / f'{digest}.{output}' for output in FORMATS}
+
+
+def _cache_root():
+    return Path(getattr(settings, 'BROCHURE_CACHE_ROOT', Path(settings.MEDIA_ROOT) / 'brochures'))
+
+
+def prune_cache(keep=()):
+    """
+    Delete cached brochures not written for BROCHURE_CACHE_MAX_AGE_DAYS,
+    except the paths in ``keep``; returns the number removed
+    """
+    return filecache.prune(_cache_root(), getattr(settings, 'BROCHURE_CACHE_MAX_AGE_DAYS', 30), keep)
+
+
+def get_brochure(tour, output):
+    """(digest, path) of the tour's brochure in ``output`` format, rendering it on a miss"""
+    context = brochure_context(tour)
+    digest, paths = brochure_location(context)
+    if not paths[output].exists():
+        # A few milliseconds of pure Python; both formats are written
+        # together so the static page never lags behind the PDF
+        brochure_templates.render_to_files(context, {key: str(path) for key, path in paths.items()})
+    return digest, paths[output]
+
+
+def serve(request, digest, path, output, filename):
+    """Return a cached brochure, answering If-None-Match with 304"""
+    etag = f'"{digest}"'
+    if request.headers.get('If-None-Match') == etag:
+        return HttpResponseNotModified()
+    response = FileResponse(
+        open(path, 'rb'),
+        content_type=FORMATS[output],
+        as_attachment=False,
+        filename=filename,
+    )
+    response['ETag'] = etag
+    response['Cache-Control'] = 'public, max-age=300'
+    return response
+
+
+def render_catalog(queryset, workers=None, force=False, chunk_size=500, chunksize=8, current=None):
+    """
+    Render the brochures of the tours in ``queryset`` that are not cached
+    yet (or all of them with ``force``) in one process pool spread across
+    cores. Tours are loaded ``chunk_size`` at a time, with a single hotel
+    lookup per chunk. Adds their paths to the ``current`` set when given.
+    Returns (rendered, already_cached).
+    """
+    rendered = cached = 0
+    pool = None
+    futures = []
+    try:
+        ids = list(queryset.order_by('id').values_list('id', flat=True))
+        for offset in range(0, len(ids), chunk_size):
+            tours = list(brochure_queryset().filter(pk__in=ids[offset:offset + chunk_size]))
+            hotels = load_hotels(tours)
+            contexts, paths = [], []
+            for tour in tours:
+                context = brochure_context(tour, hotels)
+                _, locations = brochure_location(context)
+                if current is not None:
+                    current.update(locations.values())
+                if not force and all(path.exists() for path in locations.values()):
+                    cached += 1
+                    continue
+                contexts.append(context)
+                paths.append({key: str(path) for key, path in locations.items()})
+
+            if contexts:
+                if pool is None:
+                    pool = ProcessPoolExecutor(
+                        max_workers=workers or os.cpu_count() or 1,
+                        mp_context=multiprocessing.get_context('spawn'),
+                    )
+                # Render this chunk while the next one is loaded
+                futures.append(pool.map(brochure_templates.render_to_files, contexts, paths, chunksize=chunksize))
+                rendered += len(contexts)
+        for results in futures:
+            list(results)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return rendered, cached
@@ -0,0 +1,244 @@
+"""
+Tour brochure layouts
+Pure functions from a plain brochure context dict to PDF bytes and to a
+self-contained HTML page. Like apps.payments.document_templates, this
+module must not import Django models: it runs in worker processes that do
+not set up Django.
+"""
+
+import html
+import os
+import tempfile
+
+from apps.core.pdf import PDFWriter
+
+# Bump when a layout changes so cached brochures are re-rendered
+TEMPLATE_VERSION = 1
+
+COMPANY_NAME = 'Tours & Travels'
+
+
+def _money(value):
+    return f"Rs. {value}" if value not in (None, '') else '-'
+
+
+def _facts(context):
+    return [
+        ('Duration', f"{context['duration_days']} days / {max(context['duration_days'] - 1, 0)} nights"),
+        ('Destinations', ', '.join(destination['name'] for destination in context['destinations'])
+         or context['primary_destination']),
+        ('Tour type', context['tour_type']),
+        ('Category', context['category']),
+        ('Difficulty', context['difficulty']),
+        ('Group size', f"Up to {context['max_capacity']} travelers"),
+        ('Price from', _money(context['base_price'])),
+        ('Child price', _money(context['child_price'])),
+    ]
+
+
+def _pricing_rows(context):
+    return [
+        [
+            pricing['season'],
+            pricing['dates'],
+            _money(pricing['two_sharing_price']),
+            _money(pricing['three_sharing_price']),
+            _money(pricing['child_price']),
+        ]
+        for pricing in context['pricing']
+    ]
+
+
+PRICING_HEADER = ['Season', 'Dates', 'Twin sharing', 'Triple sharing', 'Child']
+
+
+def render_pdf(context):
+    pdf = PDFWriter(title=context['name'], footer=f"{COMPANY_NAME} - {context['name']}")
+    pdf.heading(context['name'], size=20)
+    pdf.paragraph(context['primary_destination'], size=11, bold=True)
+    pdf.line()
+    pdf.spacer(6)
+
+    for label, value in _facts(context):
+        pdf.table_row([label, value or '-'], [0.25, 0.75], size=10)
+
+    if context['description']:
+        pdf.spacer(10)
+        pdf.paragraph(context['description'], size=10)
+
+    if context['itinerary']:
+        pdf.spacer(12)
+        pdf.heading('Itinerary', size=13)
+        for day in context['itinerary']:
+            pdf.spacer(4)
+            pdf.paragraph(f"Day {day['day']}: {day['title']}", size=10, bold=True)
+            if day['description']:
+                pdf.paragraph(day['description'], size=9, indent=12)
+
+    if context['hotels'] or context['vehicle']['type']:
+        pdf.spacer(12)
+        pdf.heading('Stay and transport', size=13)
+        widths = [0.22, 0.38, 0.2, 0.2]
+        if context['hotels']:
+            pdf.table_row(['Destination', 'Hotel', 'Type', 'Rating'], widths, bold=True)
+            pdf.line()
+            for hotel in context['hotels']:
+                rating = f"{hotel['star_rating']} star" if hotel['star_rating'] else ''
+                pdf.table_row([hotel['destination'], hotel['name'], hotel['hotel_type'], rating], widths)
+                if hotel['address']:
+                    pdf.paragraph(hotel['address'], size=8, indent=widths[0] * pdf.content_width)
+        if context['vehicle']['type']:
+            pdf.spacer(6)
+            pdf.paragraph(f"Transport: {context['vehicle']['type']}", size=10)
+            if context['vehicle']['note']:
+                pdf.paragraph(context['vehicle']['note'], size=9, indent=12)
+
+    if context['pricing']:
+        pdf.spacer(12)
+        pdf.heading('Seasonal prices (per person)', size=13)
+        widths = [0.2, 0.32, 0.16, 0.16, 0.16]
+        align = ['left', 'left', 'right', 'right', 'right']
+        pdf.table_row(PRICING_HEADER, widths, bold=True, align=align)
+        pdf.line()
+        for pricing, row in zip(context['pricing'], _pricing_rows(context)):
+            pdf.table_row(row, widths, align=align)
+            notes = []
+            if pricing['available_dates']:
+                notes.append(f"Departures: {', '.join(pricing['available_dates'])}")
+            notes.append('Includes return airfare' if pricing['includes_return_air'] else 'Airfare not included')
+            pdf.paragraph('; '.join(notes), size=8, indent=12)
+
+    if context['available_dates']:
+        pdf.spacer(8)
+        pdf.paragraph(f"Fixed departures: {', '.join(context['available_dates'])}", size=9)
+
+    for title, items in (('Inclusions', context['inclusions']), ('Exclusions', context['exclusions'])):
+        if items:
+            pdf.spacer(12)
+            pdf.heading(title, size=13)
+            for item in items:
+                pdf.paragraph(f"- {item}", size=9, indent=6)
+
+    if context['special_notes']:
+        pdf.spacer(12)
+        pdf.heading('Important notes', size=13)
+        pdf.paragraph(context['special_notes'], size=9)
+    return pdf.render()
+
+
+_STYLE = """
+body { font-family: Helvetica, Arial, sans-serif; color: #222; max-width: 820px; margin: 2em auto; padding: 0 1em; }
+h1 { margin-bottom: 0; } h2 { border-bottom: 1px solid #ccc; padding-bottom: .2em; margin-top: 1.6em; }
+.subtitle { color: #666; margin-top: .2em; }
+table { border-collapse: collapse; width: 100%; } th, td { text-align: left; padding: .35em .5em; vertical-align: top; }
+th { border-bottom: 1px solid #999; } td.num, th.num { text-align: right; }
+.note { color: #666; font-size: .85em; } footer { margin-top: 3em; color: #888; font-size: .8em; }
+"""
+
+
+_NUM = ' class="num"'
+
+
+def _e(value):
+    return html.escape('' if value is None else str(value))
+
+
+def _list_html(title, items):
+    if not items:
+        return ''
+    return f"<h2>{_e(title)}</h2><ul>" + ''.join(f"<li>{_e(item)}</li>" for item in items) + "</ul>"
+
+
+def render_html(context):
+    parts = [
+        '<!DOCTYPE html>\n<html lang="en"><head><meta charset="utf-8">',
+        '<meta name="viewport" content="width=device-width, initial-scale=1">',
+        f"<title>{_e(context['name'])} | {_e(COMPANY_NAME)}</title><style>{_STYLE}</style></head><body>",
+        f"<h1>{_e(context['name'])}</h1><p class=\"subtitle\">{_e(context['primary_destination'])}</p>",
+        '<table>',
+    ]
+    parts.extend(f"<tr><th>{_e(label)}</th><td>{_e(value or '-')}</td></tr>" for label, value in _facts(context))
+    parts.append('</table>')
+
+    if context['description']:
+        parts.extend(f"<p>{_e(paragraph)}</p>" for paragraph in context['description'].split('\n') if paragraph.strip())
+
+    if context['itinerary']:
+        parts.append('<h2>Itinerary</h2>')
+        for day in context['itinerary']:
+            parts.append(f"<h3>Day {_e(day['day'])}: {_e(day['title'])}</h3><p>{_e(day['description'])}</p>")
+
+    if context['hotels'] or context['vehicle']['type']:
+        parts.append('<h2>Stay and transport</h2>')
+        if context['hotels']:
+            parts.append('<table><tr><th>Destination</th><th>Hotel</th><th>Type</th><th>Rating</th></tr>')
+            for hotel in context['hotels']:
+                rating = f"{hotel['star_rating']} star" if hotel['star_rating'] else ''
+                address = f"<div class=\"note\">{_e(hotel['address'])}</div>" if hotel['address'] else ''
+                parts.append(
+                    f"<tr><td>{_e(hotel['destination'])}</td><td>{_e(hotel['name'])}{address}</td>"
+                    f"<td>{_e(hotel['hotel_type'])}</td><td>{_e(rating)}</td></tr>"
+                )
+            parts.append('</table>')
+        if context['vehicle']['type']:
+            parts.append(f"<p>Transport: {_e(context['vehicle']['type'])}</p>")
+            if context['vehicle']['note']:
+                parts.append(f"<p class=\"note\">{_e(context['vehicle']['note'])}</p>")
+
+    if context['pricing']:
+        parts.append('<h2>Seasonal prices (per person)</h2><table><tr>')
+        parts.extend(
+            f"<th{_NUM if index > 1 else ''}>{_e(label)}</th>"
+            for index, label in enumerate(PRICING_HEADER)
+        )
+        parts.append('</tr>')
+        for pricing, row in zip(context['pricing'], _pricing_rows(context)):
+            parts.append('<tr>' + ''.join(
+                f"<td{_NUM if index > 1 else ''}>{_e(cell)}</td>" for index, cell in enumerate(row)
+            ) + '</tr>')
+            notes = []
+            if pricing['available_dates']:
+                notes.append(f"Departures: {', '.join(pricing['available_dates'])}")
+            notes.append('Includes return airfare' if pricing['includes_return_air'] else 'Airfare not included')
+            parts.append(f"<tr><td></td><td colspan=\"4\" class=\"note\">{_e('; '.join(notes))}</td></tr>")
+        parts.append('</table>')
+
+    if context['available_dates']:
+        parts.append(f"<p>Fixed departures: {_e(', '.join(context['available_dates']))}</p>")
+
+    parts.append(_list_html('Inclusions', context['inclusions']))
+    parts.append(_list_html('Exclusions', context['exclusions']))
+    if context['special_notes']:
+        parts.append(f"<h2>Important notes</h2><p>{_e(context['special_notes'])}</p>")
+    parts.append(f"<footer>{_e(COMPANY_NAME)}</footer></body></html>\n")
+    return ''.join(parts).encode('utf-8')
+
+
+RENDERERS = {
+    'pdf': render_pdf,
+    'html': render_html,
+}
+
+
+def _write_atomic(path, data):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as handle:
+            handle.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def render_to_files(context, paths):
+    """
+    Render the brochure in each format of ``paths`` ({format: path}) and
+    move the files into place atomically. Runs in worker processes.
+    """
+    for output, path in paths.items():
+        _write_atomic(path, RENDERERS[output](context))
+    return paths
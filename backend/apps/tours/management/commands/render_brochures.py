@@ -0,0 +1,73 @@
+"""
+Management command to render the brochure PDF and HTML page of every tour
+Brochures whose content is unchanged are skipped; the rest are rendered in
+a process pool across all cores. Run after bulk catalog edits (season
+dates, hotel or destination changes) so visitors get cached files.
+Afterwards, cached files not written for BROCHURE_CACHE_MAX_AGE_DAYS are
+deleted, except the ones just found current.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.tours import brochure
+from apps.tours.models import Tour
+
+
+class Command(BaseCommand):
+    help = 'Render tour brochures (PDF and static HTML) for the whole catalog'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Render processes (default: number of CPUs)',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Re-render brochures that are already cached',
+        )
+        parser.add_argument(
+            '--include-inactive',
+            action='store_true',
+            help='Also render brochures for inactive tours',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Tours loaded per query batch',
+        )
+        parser.add_argument(
+            '--no-prune',
+            action='store_true',
+            help='Keep old cached files',
+        )
+
+    def handle(self, *args, **options):
+        queryset = Tour.objects.all()
+        if not options['include_inactive']:
+            queryset = queryset.filter(is_active=True)
+
+        started = time.perf_counter()
+        current = set()
+        rendered, cached = brochure.render_catalog(
+            queryset,
+            workers=options['workers'],
+            force=options['force'],
+            chunk_size=options['chunk_size'],
+            current=current,
+        )
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Brochures: {rendered:,} rendered, {cached:,} already cached in {elapsed:.2f}s"
+            + (f" ({rendered / elapsed:,.0f} tours/s)" if rendered else '')
+        ))
+
+        if not options['no_prune']:
+            removed = brochure.prune_cache(keep=current)
+            self.stdout.write(self.style.SUCCESS(f"Pruned {removed:,} old cached brochure files"))
@@ -3,11 +3,36 @@ Tours models for Tours & Travels backend
 Implements tour packages, destinations, and related functionality
 """
 
+from functools import partial
+
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.utils.text import slugify
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.conf import settings
 from apps.core.models import BaseModel
+from apps.core.planner import Annotation, requires
+from apps.core.querycache import CachedManager
+
+
+def _review_stats():
+    """Verified review count and average rating of a tour, for average_rating and review_count"""
+    from apps.reviews.models import Review
+    reviews = Review.objects.filter(tour=models.OuterRef('pk'), is_verified=True).order_by().values('tour')
+    return Annotation(
+        verified_review_count=Coalesce(
+            models.Subquery(reviews.annotate(count=models.Count('pk')).values('count')), 0
+        ),
+        verified_rating_avg=models.Subquery(
+            reviews.annotate(avg=models.Avg('rating')).values('avg'), output_field=models.FloatField()
+        ),
+    )
+
+
+def _departure_seats(relation):
+    """Seats held on a tour's or package's busiest upcoming departure, for available_capacity"""
+    from apps.bookings import capacity
+    return Annotation(busiest_departure_seats=Coalesce(capacity.busiest_departure_seats(relation), 0))
 
 
 class Season(BaseModel):
@@ -36,6 +61,9 @@ class Season(BaseModel):
     description = models.TextField(blank=True)
     is_active = models.BooleanField(default=True)
 
+    # Small reference tables read on most requests: cached through apps.core.querycache
+    objects = CachedManager(cache_all=True)
+
     class Meta:
         db_table = 'tours_season'
         ordering = ['start_month']
@@ -48,6 +76,7 @@ class Season(BaseModel):
         return self.name
 
     @property
+    @requires('start_date', 'end_date')
     def date_range_display(self):
         """Display date range in readable format"""
         if self.start_date and self.end_date:
@@ -180,6 +209,8 @@ class Destination(BaseModel):
     country = models.CharField(max_length=100, blank=True)
     is_active = models.BooleanField(default=True)
 
+    objects = CachedManager(cache_all=True)
+
     class Meta:
         db_table = 'tours_destination'
         ordering = ['name']
@@ -369,8 +400,11 @@ class Tour(BaseModel):
         return self.name
 
     @property
+    @requires(_review_stats)
     def average_rating(self):
         """Calculate average rating from reviews"""
+        if hasattr(self, 'verified_rating_avg'):
+            return self.verified_rating_avg or 0
         reviews = self.reviews.filter(is_verified=True)
         if reviews.exists():
             return reviews.aggregate(
@@ -379,22 +413,24 @@ class Tour(BaseModel):
         return 0
 
     @property
+    @requires(_review_stats)
     def review_count(self):
         """Get total number of verified reviews"""
+        if hasattr(self, 'verified_review_count'):
+            return self.verified_review_count
         return self.reviews.filter(is_verified=True).count()
 
     @property
+    @requires(partial(_departure_seats, 'tour'), 'max_capacity')
     def available_capacity(self):
-        """Calculate available capacity based on confirmed bookings"""
-        from apps.bookings.models import Booking
-        confirmed_bookings = Booking.objects.filter(
-            tour=self,
-            status='CONFIRMED'
-        ).aggregate(
-            total_participants=models.Sum('travelers_count')
-        )['total_participants'] or 0
-        
-        return max(0, self.max_capacity - confirmed_bookings)
+        """
+        Seats left on the busiest upcoming departure: the fewest left on any
+        departure that already has bookings (see apps.bookings.capacity)
+        """
+        if hasattr(self, 'busiest_departure_seats'):
+            return max(0, self.max_capacity - self.busiest_departure_seats)
+        from apps.bookings import capacity
+        return max(0, self.max_capacity - capacity.busiest_departure('tour', self))
 
     def get_current_price(self, season=None):
         """Get current price based on season or return base price"""
@@ -411,6 +447,7 @@ class Tour(BaseModel):
         return self.seasonal_pricings.select_related('season').all()
 
     @property
+    @requires('destinations')
     def destination_names(self):
         """Get comma-separated list of destination names"""
         return ", ".join([dest.name for dest in self.destinations.all()])
@@ -477,22 +514,19 @@ class TourPackage(BaseModel):
         return f"{self.tour.name} - {self.name}"
 
     @property
+    @requires('tour__base_price', 'price_modifier')
     def total_price(self):
         """Calculate total price including base price and modifier"""
         return self.tour.base_price + self.price_modifier
 
     @property
+    @requires(partial(_departure_seats, 'package'), 'max_participants')
     def available_capacity(self):
-        """Calculate available capacity for this package"""
-        from apps.bookings.models import Booking
-        confirmed_bookings = Booking.objects.filter(
-            package=self,
-            status='CONFIRMED'
-        ).aggregate(
-            total_participants=models.Sum('travelers_count')
-        )['total_participants'] or 0
-        
-        return max(0, self.max_participants - confirmed_bookings)
+        """Seats left for this package on its busiest upcoming departure"""
+        if hasattr(self, 'busiest_departure_seats'):
+            return max(0, self.max_participants - self.busiest_departure_seats)
+        from apps.bookings import capacity
+        return max(0, self.max_participants - capacity.busiest_departure('package', self))
 
 
 class Hotel(BaseModel):
@@ -519,6 +553,8 @@ class Hotel(BaseModel):
     )
     is_active = models.BooleanField(default=True)
 
+    objects = CachedManager(cache_all=True)
+
     class Meta:
         db_table = 'tours_hotel'
         ordering = ['name']
@@ -568,6 +604,8 @@ class Vehicle(BaseModel):
     vehicle_type = models.CharField(max_length=50, blank=True)
     is_active = models.BooleanField(default=True)
 
+    objects = CachedManager(cache_all=True)
+
     class Meta:
         db_table = 'tours_vehicle'
         ordering = ['name']
@@ -620,6 +658,8 @@ class Offer(BaseModel):
         blank=True
     )
 
+    objects = CachedManager()
+
     class Meta:
         db_table = 'tours_offer'
         ordering = ['-start_date']
@@ -792,6 +832,7 @@ class CustomPackage(BaseModel):
             return f"Custom Package #{self.id} (Anonymous)"
 
     @property
+    @requires('customer', 'customer_name')
     def customer_display_name(self):
         """Get customer display name"""
         if self.customer:
@@ -799,6 +840,7 @@ class CustomPackage(BaseModel):
         return self.customer_name or "Anonymous"
 
     @property
+    @requires('customer', 'customer_email')
     def customer_display_email(self):
         """Get customer display email"""
         if self.customer:
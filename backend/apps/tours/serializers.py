@@ -4,6 +4,10 @@ Serializers for Tours & Travels backend
 
 from rest_framework import serializers
 from django.db import models
+from apps.core import sideload
+from apps.core.fragments import FragmentCacheMixin, FragmentListSerializer
+from apps.core.planner import requires
+from apps.core.sideload import SideloadMixin
 from .models import (
     Destination, Tour, TourPackage, Hotel, Vehicle, 
     Offer, CustomPackage, Inquiry, Season, TourPricing,
@@ -31,8 +35,9 @@ class SeasonSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
-class TourPricingSerializer(serializers.ModelSerializer):
+class TourPricingSerializer(SideloadMixin, serializers.ModelSerializer):
     """Serializer for TourPricing model with detailed breakdown"""
+    sideload_fields = {'season_details': 'seasons'}
     tour_name = serializers.CharField(source='tour.name', read_only=True)
     season_details = SeasonSerializer(source='season', read_only=True)
     season_name = serializers.CharField(source='season.name', read_only=True)
@@ -111,6 +116,7 @@ class HotelSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'destination_name', 'created_at', 'updated_at']
 
+    @requires('destination__name', 'destination__country')
     def get_destination_display(self, obj):
         """Get formatted destination display"""
         if obj.destination:
@@ -246,8 +252,10 @@ class TourPackageSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
-class TourListSerializer(serializers.ModelSerializer):
+class TourListSerializer(FragmentCacheMixin, serializers.ModelSerializer):
     """Serializer for Tour list view (minimal data)"""
+    # Pricing, reviews, seasons and destinations touch the tour (see signals.py)
+    fragment_volatile = ('available_capacity',)
     primary_destination_name = serializers.CharField(source='primary_destination.name', read_only=True)
     destination_names = serializers.ReadOnlyField()
     average_rating = serializers.ReadOnlyField()
@@ -265,14 +273,17 @@ class TourListSerializer(serializers.ModelSerializer):
             'category', 'tour_type', 'average_rating', 'review_count', 'available_capacity',
             'is_active', 'created_at'
         ]
+        list_serializer_class = FragmentListSerializer
 
+    @requires('base_price')
     def get_current_price(self, obj):
         """Get current price based on season"""
         return obj.get_current_price()
 
 
-class TourDetailSerializer(serializers.ModelSerializer):
+class TourDetailSerializer(SideloadMixin, serializers.ModelSerializer):
     """Serializer for Tour detail view (complete data)"""
+    sideload_fields = {'primary_destination': 'destinations', 'destinations': 'destinations'}
     primary_destination = DestinationSerializer(read_only=True)
     destinations = DestinationSerializer(many=True, read_only=True)
     primary_destination_id = serializers.UUIDField(write_only=True)
@@ -361,13 +372,15 @@ class TourDetailSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'slug', 'created_at', 'updated_at']
 
+    @requires('base_price')
     def get_current_price(self, obj):
         """Get current price based on season"""
         return obj.get_current_price()
 
+    @requires('offers')
     def get_current_offer_ids(self, obj):
         """Get currently associated offer IDs"""
-        return list(obj.offers.values_list('id', flat=True))
+        return [offer.id for offer in obj.offers.all()]
 
     def get_active_offers(self, obj):
         """Get currently valid offers for the tour"""
@@ -379,7 +392,7 @@ class TourDetailSerializer(serializers.ModelSerializer):
             start_date__lte=today,
             end_date__gte=today,
             is_active=True
-        )
+        ).cached()
         
         # Get offers that apply to all tours (no specific tour associations)
         from .models import Offer
@@ -388,7 +401,7 @@ class TourDetailSerializer(serializers.ModelSerializer):
             end_date__gte=today,
             is_active=True,
             applicable_tours__isnull=True  # No specific tours = applies to all
-        )
+        ).cached()
         
         # Get IDs from both querysets and create a single query
         specific_ids = list(specific_offers.values_list('id', flat=True))
@@ -399,7 +412,7 @@ class TourDetailSerializer(serializers.ModelSerializer):
         
         # Get all offers with combined IDs
         if combined_ids:
-            all_offers = Offer.objects.filter(id__in=combined_ids).order_by('-start_date')
+            all_offers = Offer.objects.filter(id__in=combined_ids).order_by('-start_date').cached()
             return OfferSerializer(all_offers, many=True).data
         else:
             return []
@@ -575,6 +588,7 @@ class OfferSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
+    @requires('applicable_tours')
     def get_applicable_tours_count(self, obj):
         """Get count of applicable tours"""
         return obj.applicable_tours.count()
@@ -813,4 +827,14 @@ class TourSearchSerializer(serializers.Serializer):
                 "Maximum duration must be greater than minimum duration"
             )
         
-        return data
\ No newline at end of file
+        return data
+
+
+# Collections for ?include= (see apps.core.sideload)
+sideload.register('seasons', SeasonSerializer)
+sideload.register('destinations', DestinationSerializer, Destination.objects.prefetch_related('images', 'hotels'))
+sideload.register(
+    'tours',
+    TourListSerializer,
+    Tour.objects.select_related('primary_destination').prefetch_related('destinations', 'seasonal_pricings__season'),
+)
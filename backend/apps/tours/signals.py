@@ -0,0 +1,45 @@
+"""
+Signal handlers for tours
+Tour cards render pricing, reviews, seasons and destination names, so
+writes to those rows touch the tours they belong to (see
+apps.core.fragments); bulk writes to them must touch the tours themselves.
+"""
+
+from django.db.models import Q
+from django.db.models.signals import m2m_changed
+from django.utils import timezone
+
+from apps.core.fragments import touch
+from apps.reviews.models import Review
+from .models import Destination, Season, Tour, TourPricing
+
+
+def _touch_tours(**filters):
+    Tour.objects.filter(**filters).update(updated_at=timezone.now())
+
+
+def _tour_destinations_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        _touch_tours(pk=instance.pk)
+    elif pk_set:
+        _touch_tours(pk__in=pk_set)
+    else:
+        # Reverse clear: the destination's tours are no longer linked
+        instance.tours.update(updated_at=timezone.now())
+
+
+def connect():
+    touch(TourPricing, lambda pricing: Tour.objects.filter(pk=pricing.tour_id),
+          dispatch_uid='fragments:tourpricing-tour')
+    touch(Review, lambda review: Tour.objects.filter(pk=review.tour_id),
+          dispatch_uid='fragments:review-tour')
+    touch(Season, lambda season: Tour.objects.filter(seasonal_pricings__season=season),
+          dispatch_uid='fragments:season-tour')
+    touch(Destination, lambda destination: Tour.objects.filter(
+        Q(primary_destination=destination) | Q(destinations=destination)
+    ), dispatch_uid='fragments:destination-tour')
+    m2m_changed.connect(
+        _tour_destinations_changed, sender=Tour.destinations.through, dispatch_uid='fragments:tour-destinations'
+    )
@@ -33,6 +33,7 @@ urlpatterns = [
     path('<uuid:pk>/packages/', TourViewSet.as_view({'get': 'packages'}), name='tour-packages'),
     path('<uuid:pk>/pricing/', TourViewSet.as_view({'get': 'pricing'}), name='tour-pricing'),
     path('<uuid:pk>/destinations/', TourViewSet.as_view({'get': 'destinations'}), name='tour-destinations'),
+    path('<uuid:pk>/brochure/', TourViewSet.as_view({'get': 'brochure'}), name='tour-brochure'),
     path('<uuid:tour_pk>/packages/', TourPackageViewSet.as_view({'get': 'list', 'post': 'create'}), name='tour-packages-list'),
     path('<uuid:tour_pk>/packages/<uuid:pk>/', TourPackageViewSet.as_view({'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'}), name='tour-packages-detail'),
     path('search/', TourViewSet.as_view({'get': 'search'}), name='tour-search'),
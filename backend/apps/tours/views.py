@@ -8,6 +8,7 @@ from rest_framework.response import Response
 from django.db.models import Q, Avg
 from django.db import transaction
 from apps.core.viewsets import BaseViewSet
+from apps.core.idempotency import idempotent
 from apps.core.permissions import IsAdminUser, IsCustomerUser, IsOwnerOrAdmin
 from rest_framework.permissions import IsAuthenticated
 from apps.core.response import APIResponse
@@ -118,6 +119,9 @@ class TourViewSet(BaseViewSet):
     def get_queryset(self):
         """Filter active tours for non-admin users"""
         queryset = super().get_queryset()
+        if self.action == 'brochure':
+            from .brochure import brochure_queryset
+            queryset = brochure_queryset()
         
         # Filter active tours for non-admin users
         if not (self.request.user.is_authenticated and getattr(self.request.user, 'is_admin', False)):
@@ -244,6 +248,22 @@ class TourViewSet(BaseViewSet):
             message="Tour destinations retrieved successfully"
         )
 
+    @action(detail=True, methods=['get'])
+    def brochure(self, request, pk=None):
+        """Download the tour brochure as PDF (default) or a static HTML page (?output=html)"""
+        from . import brochure
+
+        output = request.query_params.get('output', 'pdf')
+        if output not in brochure.FORMATS:
+            return APIResponse.error(
+                message="Invalid brochure format",
+                errors={'output': [f"Choose one of: {', '.join(brochure.FORMATS)}"]},
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+        tour = self.get_object()
+        digest, path = brochure.get_brochure(tour, output)
+        return brochure.serve(request, digest, path, output, f"{tour.slug or tour.id}.{output}")
+
     def create(self, request, *args, **kwargs):
         """Create a new tour"""
         logger.debug(f"Admin {request.user.email} creating new tour")
@@ -399,7 +419,7 @@ class OfferViewSet(BaseViewSet):
             start_date__lte=today,
             end_date__gte=today,
             is_active=True
-        )
+        ).cached()
         
         serializer = self.get_serializer(offers, many=True)
         return APIResponse.success(
@@ -434,6 +454,7 @@ class CustomPackageViewSet(BaseViewSet):
         else:
             return CustomPackage.objects.none()
 
+    @idempotent
     def create(self, request, *args, **kwargs):
         """Create a new custom package request"""
         serializer = self.get_serializer(data=request.data)
@@ -3,10 +3,15 @@ User models for Tours & Travels backend
 Extends Django's AbstractUser with role-based functionality
 """
 
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager as DjangoUserManager
 from django.db import models
 from django.core.validators import EmailValidator
 from apps.core.models import BaseModel
+from apps.core.querycache import CachedManagerMixin, CachedQuerySet
+
+
+class UserManager(CachedManagerMixin, DjangoUserManager.from_queryset(CachedQuerySet)):
+    """Django's UserManager with opt-in query caching (``.cached()``)"""
 
 
 class User(AbstractUser):
@@ -36,6 +41,8 @@ class User(AbstractUser):
     )
     
     
+    objects = UserManager()
+
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
     
@@ -70,7 +77,7 @@ class User(AbstractUser):
         
         # Ensure only one admin user exists
         if self.role == 'ADMIN':
-            existing_admin = User.objects.filter(role='ADMIN').exclude(pk=self.pk).first()
+            existing_admin = User.objects.filter(role='ADMIN').exclude(pk=self.pk).cached().first()
             if existing_admin:
                 from django.core.exceptions import ValidationError
                 raise ValidationError("Only one admin user is allowed in the system.")
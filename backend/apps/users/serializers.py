@@ -5,6 +5,7 @@ User serializers for Tours & Travels backend
 from rest_framework import serializers
 from django.contrib.auth.password_validation import validate_password
 from django.contrib.auth.hashers import make_password
+from apps.core import sideload
 from apps.core.serializers import BaseSerializer
 from .models import User
 
@@ -182,4 +183,8 @@ class PasswordChangeSerializer(serializers.Serializer):
         user = self.context['request'].user
         user.set_password(self.validated_data['new_password'])
         user.save()
-        return user
\ No newline at end of file
+        return user
+
+
+# Collection for ?include= (see apps.core.sideload)
+sideload.register('users', UserProfileSerializer)
@@ -42,12 +42,15 @@ LOCAL_APPS = [
     'apps.bookings',
     'apps.payments',
     'apps.reviews',
+    'apps.dashboard',
 ]
 
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
 MIDDLEWARE = [
+    'apps.core.metrics.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'apps.core.profiling.ProfilerMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -136,13 +139,87 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',  # Changed from IsAuthenticated to AllowAny
     ],
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'apps.core.renderers.OrjsonRenderer',
+        'apps.core.renderers.MsgpackRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'apps.core.parsers.OrjsonParser',
+        'apps.core.parsers.MsgpackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 100,  # Increased from 20 to 100
     'DATETIME_FORMAT': '%Y-%m-%dT%H:%M:%S.%fZ',
 }
 
+# Render Decimal values (prices, amounts) as JSON strings instead of numbers
+API_JSON_DECIMAL_AS_STRING = os.environ.get('API_JSON_DECIMAL_AS_STRING', 'False').lower() == 'true'
+
+# Booking lifecycle (see the sweep_bookings management command)
+BOOKING_PENDING_EXPIRY_HOURS = int(os.environ.get('BOOKING_PENDING_EXPIRY_HOURS', 48))
+BOOKING_SWEEP_BATCH_SIZE = 500
+GROUP_BOOKING_MAX_SIZE = 100
+
+# Idempotency-Key support for booking, payment and custom package POSTs
+IDEMPOTENCY_KEY_TTL_HOURS = 24
+IDEMPOTENCY_WAIT_SECONDS = 10
+# In-progress claims older than this (a few request timeouts) are abandoned
+IDEMPOTENCY_CLAIM_TIMEOUT_SECONDS = 120
+
+# Two-tier cache (see apps.core.cache)
+CACHE_L1_MAX_ENTRIES = 5000
+CACHE_L1_MAX_BYTES = 32 * 1024 * 1024
+# Longest time a process may serve a value from its L1 after another process changed it
+CACHE_L1_TIMEOUT = 30
+CACHE_LOCK_TIMEOUT = 10
+CACHE_EARLY_REFRESH_BETA = 1.0
+CACHE_INVALIDATION_CHANNEL = 'apps.core.cache.LocalChannel'
+
+# Queryset result cache for models using CachedManager (see apps.core.querycache)
+QUERY_CACHE_ENABLED = os.environ.get('QUERY_CACHE_ENABLED', 'True').lower() == 'true'
+QUERY_CACHE_TIMEOUT = 300
+
+# Per-object serializer output cache (see apps.core.fragments)
+FRAGMENT_CACHE_ENABLED = os.environ.get('FRAGMENT_CACHE_ENABLED', 'True').lower() == 'true'
+FRAGMENT_CACHE_TIMEOUT = 3600
+
+# Per-user booking summary cache (see apps.bookings.summary)
+BOOKING_SUMMARY_CACHE_TIMEOUT = 600
+
+# Invoice / voucher PDFs (see apps.payments.documents)
+DOCUMENT_CACHE_ROOT = MEDIA_ROOT / 'documents'
+DOCUMENT_RENDER_WORKERS = int(os.environ.get('DOCUMENT_RENDER_WORKERS', 2))
+DOCUMENT_RENDER_MAX_PENDING = 8
+DOCUMENT_RENDER_TIMEOUT = 10
+# prerender_documents deletes cached files not written for this long
+DOCUMENT_CACHE_MAX_AGE_DAYS = 30
+# Set to an internal nginx location to let the web server send cached files
+DOCUMENT_ACCEL_REDIRECT_PREFIX = os.environ.get('DOCUMENT_ACCEL_REDIRECT_PREFIX', '')
+
+# Tour brochure PDF / HTML files (see apps.tours.brochure)
+BROCHURE_CACHE_ROOT = MEDIA_ROOT / 'brochures'
+# render_brochures deletes cached files not written for this long
+BROCHURE_CACHE_MAX_AGE_DAYS = 30
+
+# Per-request profiling: Server-Timing headers, log lines and per-view stats (see apps.core.profiling)
+REQUEST_PROFILING = os.environ.get('REQUEST_PROFILING', 'False').lower() == 'true'
+
+# Prometheus metrics at /metrics (see apps.core.metrics)
+# Directory shared by the worker processes, emptied on server start; unset for a single process
+METRICS_MULTIPROCESS_DIR = os.environ.get('METRICS_MULTIPROCESS_DIR', '')
+METRICS_FLUSH_INTERVAL = 1
+# Bearer token required on /metrics; when unset, /metrics is only served with DEBUG on
+METRICS_AUTH_TOKEN = os.environ.get('METRICS_AUTH_TOKEN', '')
+
+# Payment gateway webhooks
+PAYMENT_WEBHOOK_SECRET = os.environ.get('PAYMENT_WEBHOOK_SECRET', '')
+PAYMENT_WEBHOOK_TOLERANCE_SECONDS = 300
+# How long events for a payment not recorded yet are retried before failing
+PAYMENT_WEBHOOK_RETRY_HOURS = 24
+# Currency payments are taken in; events in another currency are rejected
+PAYMENT_CURRENCY = 'INR'
+
 # JWT Configuration (no refresh tokens as per requirements)
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=1),
@@ -182,6 +259,11 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'idempotency-key',
+]
+
+CORS_EXPOSE_HEADERS = [
+    'idempotent-replayed',
 ]
 
 # Logging Configuration
@@ -246,5 +328,15 @@ LOGGING = {
             'level': 'WARNING',
             'propagate': False,
         },
+        'apps.dashboard': {
+            'handlers': ['file', 'console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+        'apps.core.profiling': {
+            'handlers': ['file', 'console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
 }
\ No newline at end of file
@@ -55,6 +55,10 @@ CACHES = {
     }
 }
 
+# Drop L1 entries of every worker process through Redis pub/sub
+CACHE_INVALIDATION_CHANNEL = 'apps.core.cache.RedisChannel'
+CACHE_INVALIDATION_URL = os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/1')
+
 # Production logging
 LOGGING['handlers']['file']['filename'] = '/var/log/django/tours_travels.log'
 LOGGING['handlers']['file']['level'] = 'WARNING'
@@ -4,6 +4,8 @@ from django.conf import settings
 from django.conf.urls.static import static
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
+from apps.core.metrics import metrics_view
+
 urlpatterns = [
     path("admin/", admin.site.urls),
 
@@ -13,6 +15,9 @@ urlpatterns = [
     # Auth
     path("api/token/", TokenObtainPairView.as_view()),
     path("api/token/refresh/", TokenRefreshView.as_view()),
+
+    # Prometheus scrape endpoint
+    path("metrics", metrics_view),
 ]
 
 # Serve media files during development